@@ -0,0 +1,98 @@
+import pandas as pd
+
+# Precomputed aggregate cube for the dashboard.
+#
+# Every view in app.py is a count of articles (or of article-keyword / article-institution
+# pairs) by one dimension, optionally over years or by Frascati. Instead of exploding and
+# grouping the raw records on every callback, build_cube() counts them once into a
+# few small tables ("cuboids"), each broken down by Year and Frascati so they can be filtered:
+#
+#   articles      Year, Frascati, count
+#   keywords      Year, Frascati, KeywordID, count
+#   sources       Year, Frascati, Source, count
+#   institutions  Year, Frascati, Institution, count
+#
+# Their size depends on the number of distinct combinations, not on the number of articles,
+# so the callbacks (which only sum and sort these tables) take the same time for any corpus.
+# A new view only needs a new cuboid here, never a new scan of the raw data.
+
+MISSING_YEAR = -1
+MISSING_FRASCATI = ""
+
+
+def extract_inst_name(inst):
+    if isinstance(inst, dict):
+        if inst.get("NameEng"):
+            return inst.get("NameEng")
+        return inst.get("Name")
+    return None
+
+
+def institution_names(institutions) -> list:
+    if not isinstance(institutions, list):
+        return []
+    return [name for name in map(extract_inst_name, institutions) if name]
+
+
+def _count(df: pd.DataFrame, dims: list[str]) -> pd.DataFrame:
+    return df.groupby(dims, sort=False, observed=True).size().reset_index(name="count")
+
+
+class AggregateCube:
+    def __init__(self, cuboids: dict):
+        self.cuboids = cuboids
+
+    def years(self) -> list[int]:
+        years = self.cuboids["articles"]["Year"]
+        return sorted(int(y) for y in years.unique() if y != MISSING_YEAR)
+
+    def slice(self, name: str, years=None, frascati=None, with_year=False, with_frascati=False) -> pd.DataFrame:
+        """
+        Rows of a cuboid, filtered to a (min, max) year range and/or a list of Frascati codes.
+        with_year / with_frascati drop the rows where that dimension is unknown.
+        """
+        df = self.cuboids[name]
+        mask = pd.Series(True, index=df.index)
+        if years is not None:
+            mask &= df["Year"].between(years[0], years[1])
+        elif with_year:
+            mask &= df["Year"] != MISSING_YEAR
+        if frascati:
+            mask &= df["Frascati"].isin(frascati)
+        elif with_frascati:
+            mask &= df["Frascati"] != MISSING_FRASCATI
+        return df[mask]
+
+    def totals(self, name: str, by: list[str], **filters) -> pd.Series:
+        """Counts summed over everything except `by`, largest first."""
+        return (
+            self.slice(name, **filters)
+            .groupby(by, sort=False, observed=True)["count"]
+            .sum()
+            .sort_values(ascending=False, kind="stable")
+        )
+
+    def top(self, name: str, column: str, n: int, **filters) -> pd.Series:
+        return self.totals(name, [column], **filters).head(n)
+
+
+def _expand(base: pd.DataFrame, long: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Year/Frascati of each row of a long (row, value) frame, plus the value."""
+    df = base.iloc[long["row"].to_numpy()].reset_index(drop=True)
+    df[column] = long[column].array
+    return df
+
+
+def build_cube(data) -> AggregateCube:
+    """`data` is a datastore.DataSnapshot (articles, keywords_long and institutions_long frames)."""
+    articles = data.articles
+    base = articles[["Year", "Frascati"]]
+    sources = articles[["Year", "Frascati", "Source"]].dropna(subset=["Source"])
+
+    return AggregateCube({
+        "articles": _count(base, ["Year", "Frascati"]),
+        "keywords": _count(_expand(base, data.keywords_long, "KeywordID"), ["Year", "Frascati", "KeywordID"]),
+        "sources": _count(sources, ["Year", "Frascati", "Source"]),
+        "institutions": _count(_expand(base, data.institutions_long, "Institution"),
+                               ["Year", "Frascati", "Institution"]),
+    })
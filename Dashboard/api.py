@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+from figure_cache import FigureCache
+
+# JSON API for the dashboard's numbers, served by the same Flask server as the Dash app.
+#
+#   GET /api/version                      data version, number of articles, year range
+#   GET /api/keywords?n=10                top keywords           [{id, keyword, count}]
+#   GET /api/keywords/years?n=6           top keywords per year  [{year, id, keyword, count}]  (or ids=3,17)
+#   GET /api/frascati                     Frascati distribution  [{frascati, count}]
+#   GET /api/frascati/years?n=6           Frascati codes per year
+#   GET /api/institutions?n=20            institutions with their Frascati breakdown
+#   GET /api/trends/keywords?n=50         emerging topics (trends.py), also /api/trends/frascati
+#
+# Every endpoint takes the dashboard's filters: years=2020-2023, institutions=<name> (repeatable)
+# and frascati=<code> (repeatable). The answers come from the same aggregates as the figures
+# (aggregate cube without filters, filter index with them) and are cached per data version.
+# Responses carry an ETag made of the data version and the request, so a client that sends it
+# back in If-None-Match gets a 304 without anything being computed, and bodies are gzipped when
+# the client accepts it.
+
+API_CACHE_SIZE = 512
+GZIP_MIN_SIZE = 1024  # smaller bodies are sent as they are
+DEFAULT_N = 10
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _int_arg(name: str, default: int, maximum: int = 100000) -> int:
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if not 0 < value <= maximum:
+        raise BadRequest(f"{name} must be between 1 and {maximum}")
+    return value
+
+
+def _years_arg():
+    value = request.args.get("years")
+    if not value:
+        return None
+    first, _, last = value.partition("-")
+    try:
+        years = [int(first), int(last or first)]
+    except ValueError:
+        raise BadRequest("years must look like 2020-2023") from None
+    return sorted(years)
+
+
+class DashboardAPI:
+    def __init__(self, snapshots, make_filters, views: dict, cache_size: int = API_CACHE_SIZE):
+        """
+        snapshots: reload.SnapshotManager of the app.
+        make_filters: the app's function turning filter values into filter arguments.
+        views: the app's view functions "counts", "counts_by_year", "institution_frascati" and "trends".
+        """
+        self.snapshots = snapshots
+        self.make_filters = make_filters
+        self.views = views
+        self.cache = FigureCache(lambda: snapshots.current().version, maxsize=cache_size)
+        self.endpoints = {
+            "version": self.version,
+            "keywords": self.keywords,
+            "keywords/years": self.keywords_years,
+            "frascati": self.frascati,
+            "frascati/years": self.frascati_years,
+            "institutions": self.institutions,
+            "trends/keywords": lambda filters: self.trends("keywords", filters),
+            "trends/frascati": lambda filters: self.trends("frascati", filters),
+        }
+
+    def register(self, server, prefix: str = "/api"):
+        server.add_url_rule(f"{prefix}/<path:endpoint>", "dashboard_api", self.handle, methods=["GET"])
+        return self
+
+    # endpoints: each returns the JSON-serializable data for the current snapshot and filters
+
+    def version(self, filters):
+        data = self.snapshots.current()
+        year_min, year_max = data.year_range()
+        return {"articles": data.num_rows, "years": [year_min, year_max], "keywords": len(data.keyword_terms)}
+
+    def keywords(self, filters):
+        counts = self.views["counts"]("keywords", filters, _int_arg("n", DEFAULT_N))
+        terms = self.snapshots.current().keyword_terms
+        return [{"id": int(i), "keyword": str(terms[i]), "count": int(c)} for i, c in counts.items()]
+
+    def _by_year(self, dimension: str, values, filters):
+        return self.views["counts_by_year"](dimension, values, filters).sort_values(["Year", "value"])
+
+    def keywords_years(self, filters):
+        ids = request.args.get("ids")
+        if ids:
+            try:
+                values = [int(i) for i in ids.split(",")]
+            except ValueError:
+                raise BadRequest("ids must be comma-separated keyword IDs") from None
+        else:
+            values = self.views["counts"]("keywords", filters, _int_arg("n", 6), with_year=True).index
+        terms = self.snapshots.current().keyword_terms
+        rows = self._by_year("keywords", values, filters)
+        return [{"year": int(y), "id": int(v), "keyword": str(terms[v]), "count": int(c)}
+                for y, v, c in rows.itertuples(index=False)]
+
+    def frascati(self, filters):
+        counts = self.views["counts"]("frascati", filters)
+        return [{"frascati": str(code), "count": int(c)} for code, c in counts.items()]
+
+    def frascati_years(self, filters):
+        values = self.views["counts"]("frascati", filters, _int_arg("n", 6), with_year=True).index
+        rows = self._by_year("frascati", values, filters)
+        return [{"year": int(y), "frascati": str(v), "count": int(c)} for y, v, c in rows.itertuples(index=False)]
+
+    def institutions(self, filters):
+        totals = self.views["counts"]("institutions", filters, _int_arg("n", 20))
+        pairs = self.views["institution_frascati"](filters)
+        pairs = pairs[pairs.index.get_level_values("Institution").isin(totals.index)]
+        breakdown = {name: {} for name in totals.index}
+        for (name, code), c in pairs.items():
+            breakdown[name][str(code)] = int(c)
+        return [{"institution": str(name), "count": int(c), "frascati": breakdown[name]} for name, c in totals.items()]
+
+    def trends(self, dimension: str, filters):
+        table = self.views["trends"](dimension, filters).head(_int_arg("n", 50))
+        return json.loads(table.to_json(orient="records"))
+
+    # request handling
+
+    def _etag(self, version: str, key: str) -> str:
+        return hashlib.sha1(f"{version}|{key}".encode("utf-8")).hexdigest()[:20]
+
+    def _response(self, body: bytes, status: int, etag: str = None, gzipped: bytes = None) -> Response:
+        """`gzipped` is the compressed body, sent instead when the client accepts gzip."""
+        response = Response(body, status=status, mimetype="application/json")
+        response.headers["Vary"] = "Accept-Encoding"
+        if etag:
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"  # may be stored, but revalidated with the ETag
+        if gzipped is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            response.set_data(gzipped)
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    def handle(self, endpoint: str):
+        endpoint = endpoint.strip("/")
+        build = self.endpoints.get(endpoint)
+        if build is None:
+            return self._response(json.dumps({"error": f"Unknown endpoint: {endpoint}"}).encode(), 404)
+        with self.snapshots.pinned() as data:
+            key = json.dumps([endpoint, sorted(request.args.items(multi=True))])
+            etag = self._etag(data.version, key)
+            if request.if_none_match.contains_weak(etag):
+                return self._response(b"", 304, etag)
+            cached = self.cache.get(key)
+            if cached is None:
+                try:
+                    filters = self.make_filters(_years_arg(), request.args.getlist("institutions"),
+                                                request.args.getlist("frascati"))
+                    payload = {"version": data.version, "data": build(filters)}
+                except BadRequest as e:
+                    return self._response(json.dumps({"error": str(e)}).encode(), 400)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                cached = (body, gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None)
+                self.cache.put(key, cached)  # in memory only, so the cache keeps the bytes as they are
+            return self._response(cached[0], 200, etag, cached[1])
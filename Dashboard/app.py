@@ -1,59 +1,102 @@
-from dash import Dash, dcc, html, Input, Output
+import os
+from pathlib import Path
+
+from dash import Dash, dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import pandas as pd
+import numpy as np
+
+from api import DashboardAPI
+from cooccurrence import cooccurrence, spring_layout
+from datastore import data_version, load_snapshot
+from figure_cache import FigureCache
+from reload import SnapshotManager
+from trends import rising, topic_trends
 
 # Data
 DATA_PATH = "Data/data.json"
-df_raw = pd.read_json(DATA_PATH)
-df_raw["Year"] = pd.to_numeric(df_raw["Year"], errors="coerce")
-
-# Global min/max years (for x-axis range on line charts)
-_year_nonnull = df_raw["Year"].dropna()
-if not _year_nonnull.empty:
-    YEAR_MIN = int(_year_nonnull.min())
-    YEAR_MAX = int(_year_nonnull.max())
-else:
-    YEAR_MIN = YEAR_MAX = None
-
-# Keywords is a list of strings per record
-df_keywords_global = (
-    df_raw[["Keywords"]]
-    .explode("Keywords")
-    .rename(columns={"Keywords": "Keyword"})
-    .dropna(subset=["Keyword"])
+DATA_PARQUET = "Data/data.parquet"  # columnar copy of DATA_PATH, (re)made by datastore.py when it is older
+KEYWORD_VOCAB_PATH = "Data/keyword_vocab.json"  # written by the labeling scripts; built from the data if missing
+FIGURE_CACHE_SIZE = 256
+FIGURE_CACHE_DIR = os.environ.get("DASH_FIGURE_CACHE_DIR")  # set to share cached figures between server processes
+RELOAD_INTERVAL = 30  # seconds between checks whether data.json / keyword_vocab.json changed
+
+# Nothing is read here yet: the frames and the aggregate cube (aggregates.py) are built on first use.
+# When the data files change, a new snapshot is built in the background and swapped in (reload.py).
+snapshots = SnapshotManager(
+    lambda: load_snapshot(Path(DATA_PATH), Path(DATA_PARQUET), Path(KEYWORD_VOCAB_PATH)),
+    lambda: data_version(DATA_PATH, KEYWORD_VOCAB_PATH),
+    interval=RELOAD_INTERVAL,
 )
 
-# Keywords with Year (for line chart)
-df_keywords_year = (
-    df_raw[["Year", "Keywords"]]
-    .explode("Keywords")
-    .rename(columns={"Keywords": "Keyword"})
-    .dropna(subset=["Keyword", "Year"])
-)
-df_keywords_year["YearInt"] = df_keywords_year["Year"].astype(int)
 
-# Institutions data 
-df_inst_long = df_raw[
-    ["Year", "FrascatiClassification", "Keywords", "Institutions", "Source"]
-].copy()
-df_inst_long = df_inst_long.explode("Institutions")
+def cube_sum(df, by):
+    """Sum the count column of a cube slice by `by` (a few hundred rows at most)."""
+    return df.groupby(by, observed=True)["count"].sum().reset_index()
+
+
+# Views: without filters they come from the aggregate cube, with filters from the filter index
+# (filters.py: row masks and bincounts over integer codes)
+CUBE_VIEWS = {
+    "keywords": ("keywords", "KeywordID"),
+    "sources": ("sources", "Source"),
+    "institutions": ("institutions", "Institution"),
+    "frascati": ("articles", "Frascati"),
+}
+
+
+def make_filters(years=None, institutions=None, frascati=None):
+    """Filter arguments from the filter controls, or None when nothing is filtered."""
+    year_min, year_max = snapshots.current().year_range()
+    if not years or year_min is None or (years[0] <= year_min and years[1] >= year_max):
+        years = None  # the full range also keeps the articles without a year
+    if not (years or institutions or frascati):
+        return None
+    return {"years": tuple(years) if years else None, "institutions": institutions or None,
+            "frascati": frascati or None}
+
+
+def view_counts(dimension, filters=None, n=None, with_year=False):
+    """Counts per value of a dimension, largest first (missing values left out)."""
+    if filters is None:
+        name, column = CUBE_VIEWS[dimension]
+        counts = snapshots.current().cube.totals(name, [column], with_year=with_year, with_frascati=dimension == "frascati")
+        return counts if n is None else counts.head(n)
+    index = snapshots.current().filter_index
+    return index.counts(dimension, index.mask(**filters, with_year=with_year), n)
 
 
-def extract_inst_name(inst):
-    if isinstance(inst, dict):
-        if inst.get("NameEng"):
-            return inst.get("NameEng")
-        return inst.get("Name")
-    return None
+def view_counts_by_year(dimension, values, filters=None):
+    """Year, value, count rows for some values of a dimension ("keywords" or "frascati")."""
+    if filters is None:
+        name, column = CUBE_VIEWS[dimension]
+        df = snapshots.current().cube.slice(name, with_year=True)
+        return cube_sum(df[df[column].isin(values)], ["Year", column]).set_axis(["Year", "value", "count"], axis=1)
+    index = snapshots.current().filter_index
+    return index.counts_by_year(dimension, index.mask(**filters), values)
 
 
-df_inst_long["InstitutionName"] = df_inst_long["Institutions"].apply(extract_inst_name)
-df_inst_long = df_inst_long.dropna(subset=["InstitutionName"])
+def view_institution_frascati(filters=None):
+    """Counts per (Institution, Frascati) pair, largest first."""
+    if filters is None:
+        return snapshots.current().cube.totals("institutions", ["Institution", "Frascati"], with_frascati=True)
+    index = snapshots.current().filter_index
+    return index.institution_frascati(index.mask(**filters))
+
+
+def view_trends(dimension, filters=None):
+    """
+    Trend table (trends.py) of every keyword or Frascati code, fastest rising first. The year
+    filter picks the year that is judged; the years before it are still used for comparison.
+    """
+    data = snapshots.current()
+    if filters is not None and filters["years"] is not None:
+        filters = {**filters, "years": (data.year_range()[0], filters["years"][1])}
+    if filters is None:
+        return data.trends[dimension]
+    return topic_trends(data, dimension, data.filter_index.mask(**filters))
 
-# Frascati with Year (for line chart)
-df_fras_year = df_raw[["Year", "FrascatiClassification"]].dropna()
-df_fras_year = df_fras_year[df_fras_year["Year"].notna()]
-df_fras_year["YearInt"] = df_fras_year["Year"].astype(int)
 
 # Bar charts (Window 1)
 
@@ -74,14 +117,10 @@ def style_bar_fig(fig):
     return fig
 
 
-def bar_top_10_keywords():
-    counts = (
-        df_keywords_global["Keyword"]
-        .value_counts()
-        .nlargest(10)
-        .reset_index()
-    )
-    counts.columns = ["Keyword", "count"]
+def bar_top_10_keywords(filters=None):
+    counts = view_counts("keywords", filters, 10).reset_index()
+    counts.columns = ["KeywordID", "count"]
+    counts["Keyword"] = snapshots.current().keyword_terms[counts["KeywordID"]]
     counts = counts.sort_values("count")
 
     fig = px.bar(
@@ -96,14 +135,8 @@ def bar_top_10_keywords():
     return style_bar_fig(fig)
 
 
-def bar_top_10_sources():
-    counts = (
-        df_raw["Source"]
-        .dropna()
-        .value_counts()
-        .nlargest(10)
-        .reset_index()
-    )
+def bar_top_10_sources(filters=None):
+    counts = view_counts("sources", filters, 10).reset_index()
     counts.columns = ["Source", "count"]
     counts = counts.sort_values("count")
 
@@ -119,25 +152,20 @@ def bar_top_10_sources():
     return style_bar_fig(fig)
 
 
-def bar_most_frequent_frascati_per_institution(top_n=6):
+def bar_most_frequent_frascati_per_institution(top_n=6, filters=None):
     """
     For each institution, find its most frequent Frascati classification.
     Bars: institutions (y), x-axis: count of that classification.
     Text on the bar: the classification label.
     """
-    sub = df_inst_long[["InstitutionName", "FrascatiClassification"]].dropna()
-    if sub.empty:
+    counts = view_institution_frascati(filters)
+    if counts.empty:
         fig = px.bar(title="No data for institution Frascati classifications")
         return style_bar_fig(fig)
 
-    counts = (
-        sub.groupby(["InstitutionName", "FrascatiClassification"])
-        .size()
-        .reset_index(name="count")
-    )
-
-    idx = counts.groupby("InstitutionName")["count"].idxmax()
-    top = counts.loc[idx].sort_values("count", ascending=False).head(top_n)
+    # counts are sorted, so the first row of each institution is its most frequent classification
+    top = counts.reset_index().drop_duplicates("Institution").head(top_n)
+    top.columns = ["InstitutionName", "FrascatiClassification", "count"]
     top = top.sort_values("count")
 
     fig = px.bar(
@@ -156,9 +184,10 @@ def bar_most_frequent_frascati_per_institution(top_n=6):
 
 def _apply_year_axis(fig):
     """Apply global year range and integer ticks to a line chart."""
-    if YEAR_MIN is not None and YEAR_MAX is not None:
+    year_min, year_max = snapshots.current().year_range()
+    if year_min is not None and year_max is not None:
         fig.update_xaxes(
-            range=[YEAR_MIN - 0.5, YEAR_MAX + 0.5],
+            range=[year_min - 0.5, year_max + 0.5],
             dtick=1,
             tickmode="linear",
             title_text="Year",
@@ -173,24 +202,15 @@ def _apply_year_axis(fig):
     return fig
 
 
-def keywords_over_years_top6():
+def keywords_over_years_top6(filters=None):
     """Top 6 keywords over years (line chart)."""
-    if df_keywords_year.empty:
+    top_kw = view_counts("keywords", filters, 6, with_year=True).index
+    if top_kw.empty:
         return px.line(title="No keyword data")
 
-    top_kw = (
-        df_keywords_year["Keyword"]
-        .value_counts()
-        .nlargest(6)
-        .index
-    )
-    df_top = df_keywords_year[df_keywords_year["Keyword"].isin(top_kw)]
-
-    year_counts = (
-        df_top.groupby(["YearInt", "Keyword"])
-        .size()
-        .reset_index(name="count")
-    )
+    year_counts = view_counts_by_year("keywords", top_kw, filters)
+    year_counts.columns = ["YearInt", "KeywordID", "count"]
+    year_counts["Keyword"] = snapshots.current().keyword_terms[year_counts["KeywordID"]]
 
     fig = px.line(
         year_counts,
@@ -212,24 +232,14 @@ def keywords_over_years_top6():
     return _apply_year_axis(fig)
 
 
-def frascati_over_years_top6():
+def frascati_over_years_top6(filters=None):
     """Top 6 Frascati classifications over years (line chart)."""
-    if df_fras_year.empty:
+    top_codes = view_counts("frascati", filters, 6, with_year=True).index
+    if top_codes.empty:
         return px.line(title="No Frascati data")
 
-    top_codes = (
-        df_fras_year["FrascatiClassification"]
-        .value_counts()
-        .nlargest(6)
-        .index
-    )
-    df_top = df_fras_year[df_fras_year["FrascatiClassification"].isin(top_codes)]
-
-    year_counts = (
-        df_top.groupby(["YearInt", "FrascatiClassification"])
-        .size()
-        .reset_index(name="count")
-    )
+    year_counts = view_counts_by_year("frascati", top_codes, filters)
+    year_counts.columns = ["YearInt", "FrascatiClassification", "count"]
 
     fig = px.line(
         year_counts,
@@ -251,9 +261,9 @@ def frascati_over_years_top6():
     return _apply_year_axis(fig)
 
 # Pie charts (Window 3)
-def make_pie_from_series(series, title, top_n=10):
-    s = series.dropna()
-    if s.empty:
+def make_pie_from_counts(counts, title, top_n=10):
+    """Pie of a count series sorted in descending order; the tail is merged into "Other"."""
+    if counts.empty:
         fig = px.pie(title=f"No data for {title}")
         fig.update_layout(
             template="plotly_white",
@@ -263,7 +273,6 @@ def make_pie_from_series(series, title, top_n=10):
         )
         return fig
 
-    counts = s.value_counts()
     if len(counts) > top_n:
         top = counts.iloc[:top_n]
         other = counts.iloc[top_n:].sum()
@@ -289,21 +298,156 @@ def make_pie_from_series(series, title, top_n=10):
     return fig
 
 
-def distribution_pie(metric_value: str):
+def distribution_pie(metric_value: str, filters=None):
     """Return the appropriate pie chart for window 3."""
     if metric_value in (None, "frascati"):
-        return make_pie_from_series(
-            df_raw["FrascatiClassification"], "Frascati frequency"
+        return make_pie_from_counts(
+            view_counts("frascati", filters), "Frascati frequency"
         )
     # Institutions frequency
     elif metric_value == "institution":
-        return make_pie_from_series(
-            df_inst_long["InstitutionName"], "Institutions frequency"
+        return make_pie_from_counts(
+            view_counts("institutions", filters), "Institutions frequency"
         )
     # Fallback to Frascati
-    return make_pie_from_series(
-        df_raw["FrascatiClassification"], "Frascati frequency"
+    return make_pie_from_counts(
+        view_counts("frascati", filters), "Frascati frequency"
+    )
+
+# Search (Window 4)
+
+def search_mask(value, filters=None):
+    """Rows of the articles matching a search value (search.py) that also pass the filters."""
+    data = snapshots.current()
+    mask = np.zeros(data.num_rows, dtype=bool)
+    mask[data.search_index.rows(value)] = True
+    if filters is not None:
+        mask &= data.filter_index.mask(**filters)
+    return mask
+
+
+def search_years_line(value, filters=None):
+    """Number of matching articles per year (line chart)."""
+    data = snapshots.current()
+    label = data.search_index.label(value)
+    years = data.filter_index.year[search_mask(value, filters)]
+    year_values, counts = np.unique(years[years >= 0], return_counts=True)
+    if len(year_values) == 0:
+        return px.line(title=f"No articles with a year for '{label}'")
+
+    fig = px.line(
+        pd.DataFrame({"YearInt": year_values, "count": counts}),
+        x="YearInt",
+        y="count",
+        markers=True,
+        title=f"Articles about '{label}' over years",
+    )
+    fig.update_layout(
+        template="plotly_white",
+        font=dict(family="Zilla Slab", color="black"),
+        paper_bgcolor="white",
+        plot_bgcolor="white",
+        margin=dict(l=40, r=20, t=60, b=60),
+    )
+    return _apply_year_axis(fig)
+
+
+def search_top_institutions(value, filters=None, top_n=10):
+    """Institutions with the most matching articles (bar chart)."""
+    data = snapshots.current()
+    label = data.search_index.label(value)
+    counts = data.filter_index.counts("institutions", search_mask(value, filters), top_n).reset_index()
+    counts.columns = ["InstitutionName", "count"]
+    counts = counts.sort_values("count")
+
+    fig = px.bar(
+        counts,
+        x="count",
+        y="InstitutionName",
+        orientation="h",
+        text="count",
+        title=f"Top institutions for '{label}'",
+    )
+    fig.update_traces(textposition="outside", textfont=dict(size=14))
+    return style_bar_fig(fig)
+
+
+# Emerging topics (Window 5)
+
+def rising_topics_bar(dimension="keywords", filters=None, top_n=15):
+    """Values whose share grew most above their recent years, by z-score (bar chart)."""
+    table = rising(view_trends(dimension, filters), top_n)
+    name = "keywords" if dimension == "keywords" else "Frascati classifications"
+    if table.empty:
+        return style_bar_fig(px.bar(title=f"No rising {name}"))
+
+    table = table.assign(
+        value=table["value"].astype(str),
+        label=[f"{g:+.0%} ({c} articles)" for g, c in zip(table["growth"], table["count"])],
+    ).sort_values("z")
+    fig = px.bar(
+        table,
+        x="z",
+        y="value",
+        orientation="h",
+        text="label",
+        hover_data=["count", "previous", "expected", "bursts"],
+        title=f"Fastest rising {name} in {table['year'].iloc[0]}",
+    )
+    fig.update_traces(textposition="outside", textfont=dict(size=14))
+    fig.update_layout(yaxis_title="", xaxis_title="z-score against the previous years")
+    return style_bar_fig(fig)
+
+
+# Keyword network (Window 6)
+
+def keyword_network(weight="pmi", filters=None, top_n=40, k=3):
+    """Co-occurrence graph of the most frequent keywords, k strongest edges per keyword."""
+    data = snapshots.current()
+    top = view_counts("keywords", filters, top_n)
+    mask = None if filters is None else data.filter_index.mask(**filters)
+    edges = cooccurrence(data, mask, keywords=top.index.to_numpy(), weight=weight, k=k)
+    if edges.empty:
+        return px.scatter(title="No keywords that appear together")
+
+    node_ids = top.index.to_numpy()
+    position = pd.Series(np.arange(len(node_ids)), index=node_ids)
+    a = position[edges["source_id"]].to_numpy()
+    b = position[edges["target_id"]].to_numpy()
+    pos = spring_layout(len(node_ids), a, b, edges["weight"].to_numpy())
+
+    edge_x = np.column_stack([pos[a, 0], pos[b, 0], np.full(len(a), np.nan)]).ravel()
+    edge_y = np.column_stack([pos[a, 1], pos[b, 1], np.full(len(a), np.nan)]).ravel()
+    fig = px.scatter(
+        pd.DataFrame({
+            "x": pos[:, 0],
+            "y": pos[:, 1],
+            "Keyword": data.keyword_terms[node_ids],
+            "count": top.to_numpy(),
+        }),
+        x="x",
+        y="y",
+        size="count",
+        text="Keyword",
+        hover_data={"x": False, "y": False, "count": True},
+        title=f"Keywords that appear together (top {len(node_ids)} keywords, {weight})",
     )
+    fig.add_scatter(x=edge_x, y=edge_y, mode="lines", line=dict(width=1, color="#bbbbbb"),
+                    hoverinfo="skip", showlegend=False)
+    fig.data = fig.data[::-1]  # edges below the nodes
+    fig.update_traces(textposition="top center", selector=dict(mode="markers+text"))
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False)
+    fig.update_layout(
+        template="plotly_white",
+        font=dict(family="Zilla Slab", color="black"),
+        paper_bgcolor="white",
+        plot_bgcolor="white",
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=700,
+    )
+    return fig
+
 
 # Dash app setup
 
@@ -314,6 +458,10 @@ external_stylesheets = [
 app = Dash(__name__, external_stylesheets=external_stylesheets)
 app.title = "Project Dashboard"
 
+# Figures only change with the inputs and the data, so repeated views are served from the cache.
+# Every callback is pinned to one data snapshot, so a reload can't change the data halfway through.
+figure_cache = FigureCache(lambda: snapshots.current().version, maxsize=FIGURE_CACHE_SIZE, disk_dir=FIGURE_CACHE_DIR)
+
 # Window 1 
 METRIC_OPTIONS_W1 = [
     {"label": "Top 10 most frequent keywords", "value": "top_keywords"},
@@ -336,9 +484,87 @@ METRIC_OPTIONS_W3 = [
     {"label": "Institutions frequency", "value": "institution"},
 ]
 
+# Window 5
+METRIC_OPTIONS_W5 = [
+    {"label": "Fastest rising keywords", "value": "keywords"},
+    {"label": "Fastest rising Frascati classifications", "value": "frascati"},
+]
+
+# Window 6
+METRIC_OPTIONS_W6 = [
+    {"label": "Pointwise mutual information", "value": "pmi"},
+    {"label": "Jaccard similarity", "value": "jaccard"},
+    {"label": "Number of articles together", "value": "count"},
+]
+
 
 # Layout blocks
 
+FILTER_INPUTS = [
+    Input("filter-years", "value"),
+    Input("filter-institutions", "value"),
+    Input("filter-frascati", "value"),
+]
+
+
+def make_filter_window():
+    """Filters that apply to every window below."""
+    year_min, year_max = snapshots.current().year_range()
+    if year_min is None:
+        year_min = year_max = 0
+    label_style = {"display": "block", "marginBottom": "4px"}
+    return html.Div(
+        className="filter-window",
+        style={
+            "display": "flex",
+            "flexDirection": "row",
+            "gap": "24px",
+            "marginBottom": "40px",
+        },
+        children=[
+            html.Div(
+                style={"flex": "2", "minWidth": "260px"},
+                children=[
+                    html.Label("Years", style=label_style),
+                    dcc.RangeSlider(
+                        id="filter-years",
+                        min=year_min,
+                        max=year_max,
+                        step=1,
+                        value=[year_min, year_max],
+                        marks={y: str(y) for y in range(year_min, year_max + 1)},
+                        disabled=year_min == year_max,
+                    ),
+                ],
+            ),
+            html.Div(
+                style={"flex": "2", "minWidth": "260px"},
+                children=[
+                    html.Label("Institutions", style=label_style),
+                    dcc.Dropdown(
+                        id="filter-institutions",
+                        options=[str(name) for name in view_counts("institutions").index],
+                        multi=True,
+                        placeholder="All institutions",
+                    ),
+                ],
+            ),
+            html.Div(
+                style={"flex": "1", "minWidth": "180px"},
+                children=[
+                    html.Label("Frascati", style=label_style),
+                    dcc.Dropdown(
+                        id="filter-frascati",
+                        options=sorted(str(code) for code in view_counts("frascati").index),
+                        multi=True,
+                        placeholder="All fields",
+                    ),
+                ],
+            ),
+        ],
+    )
+
+
 def make_first_plot_window():
     return html.Div(
         className="plot-window",
@@ -491,60 +717,210 @@ def make_third_plot_window():
     )
 
 
+def make_search_window():
+    return html.Div(
+        className="plot-window",
+        style={"marginBottom": "40px"},
+        children=[
+            html.H2(
+                "Search",
+                style={"fontFamily": "Zilla Slab, serif", "marginBottom": "12px"},
+            ),
+            dcc.Dropdown(
+                id="search",
+                options=[],
+                placeholder="Type a keyword or a word from article titles",
+                searchable=True,
+            ),
+            html.Div(
+                style={"display": "flex", "flexDirection": "row", "gap": "24px"},
+                children=[
+                    dcc.Graph(id="search-years-graph", style={"flex": "1", "height": "500px"}),
+                    dcc.Graph(id="search-inst-graph", style={"flex": "1", "height": "600px"}),
+                ],
+            ),
+        ],
+    )
+
+
+def make_fifth_plot_window():
+    return html.Div(
+        className="plot-window",
+        style={
+            "display": "flex",
+            "flexDirection": "row",
+            "alignItems": "stretch",
+            "gap": "24px",
+            "marginBottom": "40px",
+        },
+        children=[
+            html.Div(
+                className="controls",
+                style={"width": "25%", "minWidth": "260px"},
+                children=[
+                    html.H2(
+                        "Emerging topics",
+                        style={"fontFamily": "Zilla Slab, serif", "marginBottom": "12px"},
+                    ),
+                    html.H3(
+                        "Choices",
+                        style={
+                            "fontFamily": "Zilla Slab, serif",
+                            "fontSize": "18px",
+                            "marginBottom": "8px",
+                        },
+                    ),
+                    html.Label("Select view"),
+                    dcc.Dropdown(
+                        id="w5-metric",
+                        options=METRIC_OPTIONS_W5,
+                        value="keywords",  # default: rising keywords
+                        clearable=False,
+                    ),
+                    html.Button(
+                        "Download table (CSV)",
+                        id="w5-download-button",
+                        style={"marginTop": "16px"},
+                    ),
+                    dcc.Download(id="w5-download"),
+                ],
+            ),
+            html.Div(
+                className="plot-area",
+                style={"flex": "1"},
+                children=[
+                    dcc.Graph(
+                        id="w5-graph",
+                        style={"height": "600px"},
+                        config={"modeBarButtonsToRemove": ["select2d", "lasso2d"]},
+                    )
+                ],
+            ),
+        ],
+    )
+
+
+def make_sixth_plot_window():
+    return html.Div(
+        className="plot-window",
+        style={
+            "display": "flex",
+            "flexDirection": "row",
+            "alignItems": "stretch",
+            "gap": "24px",
+            "marginBottom": "40px",
+        },
+        children=[
+            html.Div(
+                className="controls",
+                style={"width": "25%", "minWidth": "260px"},
+                children=[
+                    html.H2(
+                        "Keyword network",
+                        style={"fontFamily": "Zilla Slab, serif", "marginBottom": "12px"},
+                    ),
+                    html.H3(
+                        "Choices",
+                        style={
+                            "fontFamily": "Zilla Slab, serif",
+                            "fontSize": "18px",
+                            "marginBottom": "8px",
+                        },
+                    ),
+                    html.Label("Edge weight"),
+                    dcc.Dropdown(
+                        id="w6-metric",
+                        options=METRIC_OPTIONS_W6,
+                        value="pmi",  # default: PMI
+                        clearable=False,
+                    ),
+                ],
+            ),
+            html.Div(
+                className="plot-area",
+                style={"flex": "1"},
+                children=[
+                    dcc.Graph(
+                        id="w6-graph",
+                        style={"height": "700px"},
+                    )
+                ],
+            ),
+        ],
+    )
+
+
 # App layout
 
-app.layout = html.Div(
-    style={
-        "fontFamily": "Zilla Slab, serif",
-        "backgroundColor": "white",
-        "color": "black",
-        "minHeight": "100vh",
-    },
-    children=[
-        html.Div(
-            style={
-                "maxWidth": "1200px",
-                "margin": "0 auto",
-                "padding": "24px 16px 40px 16px",
-            },
-            children=[
-                html.H1(
-                    "Estonian Resarch Trends",
-                    style={
-                        "fontFamily": "Zilla Slab, serif",
-                        "fontWeight": "700",
-                        "marginBottom": "8px",
-                    },
-                ),
-                html.H2(
-                    "Introduction",
-                    style={
-                        "fontFamily": "Zilla Slab, serif",
-                        "fontWeight": "400",
-                        "fontSize": "22px",
-                        "marginBottom": "8px",
-                    },
-                ),
-                html.P(
-                    """
-                    The aim of this project was to gain an overview of the most popular trends in Estonian scientific research over the last 5 years. 
-                    For this, we used data from ETIS (Estonian Research Information System) and the data extraction was done with the help of a LLM.
-                    The plots below demonstrate different aspects of the data we extracted. 
-                    """,
-                    style={
-                        "fontSize": "16px",
-                        "lineHeight": "1.5",
-                        "marginBottom": "24px",
-                    },
-                ),
-                html.Hr(),
-                make_first_plot_window(),
-                make_second_plot_window(),
-                make_third_plot_window(),
-            ],
-        )
-    ],
-)
+def serve_layout():
+    # a function, so that the filter options are only built when the page is first requested
+    return html.Div(
+        style={
+            "fontFamily": "Zilla Slab, serif",
+            "backgroundColor": "white",
+            "color": "black",
+            "minHeight": "100vh",
+        },
+        children=[
+            html.Div(
+                style={
+                    "maxWidth": "1200px",
+                    "margin": "0 auto",
+                    "padding": "24px 16px 40px 16px",
+                },
+                children=[
+                    html.H1(
+                        "Estonian Resarch Trends",
+                        style={
+                            "fontFamily": "Zilla Slab, serif",
+                            "fontWeight": "700",
+                            "marginBottom": "8px",
+                        },
+                    ),
+                    html.H2(
+                        "Introduction",
+                        style={
+                            "fontFamily": "Zilla Slab, serif",
+                            "fontWeight": "400",
+                            "fontSize": "22px",
+                            "marginBottom": "8px",
+                        },
+                    ),
+                    html.P(
+                        """
+                        The aim of this project was to gain an overview of the most popular trends in Estonian scientific research over the last 5 years. 
+                        For this, we used data from ETIS (Estonian Research Information System) and the data extraction was done with the help of a LLM.
+                        The plots below demonstrate different aspects of the data we extracted. 
+                        """,
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.5",
+                            "marginBottom": "24px",
+                        },
+                    ),
+                    html.Hr(),
+                    make_filter_window(),
+                    make_first_plot_window(),
+                    make_second_plot_window(),
+                    make_third_plot_window(),
+                    make_search_window(),
+                    make_fifth_plot_window(),
+                    make_sixth_plot_window(),
+                ],
+            )
+        ],
+    )
+
+
+app.layout = snapshots.pin(serve_layout)
+
+# JSON API with the same numbers on the same server, e.g. /api/keywords?n=20&years=2021-2023 (api.py)
+api = DashboardAPI(snapshots, make_filters, {
+    "counts": view_counts,
+    "counts_by_year": view_counts_by_year,
+    "institution_frascati": view_institution_frascati,
+    "trends": view_trends,
+}).register(app.server)
 
 # Callbacks
 
@@ -552,14 +928,18 @@ app.layout = html.Div(
 @app.callback(
     Output("w1-graph", "figure"),
     Input("w1-metric", "value"),
+    *FILTER_INPUTS,
 )
-def update_w1_graph(metric_value):
+@snapshots.pin
+@figure_cache.memoize
+def update_w1_graph(metric_value, years=None, institutions=None, frascati=None):
+    filters = make_filters(years, institutions, frascati)
     if metric_value == "top_keywords":
-        return bar_top_10_keywords()
+        return bar_top_10_keywords(filters)
     elif metric_value == "top_sources":
-        return bar_top_10_sources()
+        return bar_top_10_sources(filters)
     elif metric_value == "inst_top_frascati":
-        return bar_most_frequent_frascati_per_institution(top_n=6)
+        return bar_most_frequent_frascati_per_institution(top_n=6, filters=filters)
 
     fig = px.bar(title="No metric selected")
     return style_bar_fig(fig)
@@ -569,22 +949,115 @@ def update_w1_graph(metric_value):
 @app.callback(
     Output("w2-graph", "figure"),
     Input("w2-metric", "value"),
+    *FILTER_INPUTS,
 )
-def update_w2_graph(metric_value):
+@snapshots.pin
+@figure_cache.memoize
+def update_w2_graph(metric_value, years=None, institutions=None, frascati=None):
+    filters = make_filters(years, institutions, frascati)
     if metric_value == "keyword":
-        return keywords_over_years_top6()
+        return keywords_over_years_top6(filters)
     elif metric_value == "frascati":
-        return frascati_over_years_top6()
-    return keywords_over_years_top6()
+        return frascati_over_years_top6(filters)
+    return keywords_over_years_top6(filters)
 
 
 # Window 3
 @app.callback(
     Output("w3-graph", "figure"),
     Input("w3-metric", "value"),
+    *FILTER_INPUTS,
 )
-def update_w3_graph(metric_value):
-    return distribution_pie(metric_value)
+@snapshots.pin
+@figure_cache.memoize
+def update_w3_graph(metric_value, years=None, institutions=None, frascati=None):
+    filters = make_filters(years, institutions, frascati)
+    return distribution_pie(metric_value, filters)
+
+# Window 4
+@app.callback(
+    Output("search", "options"),
+    Input("search", "search_value"),
+    State("search", "value"),
+)
+@snapshots.pin
+def update_search_options(search_value, value):
+    if not search_value:
+        raise PreventUpdate
+    index = snapshots.current().search_index
+    options = index.suggest(search_value)
+    # the selected value has to stay among the options, or the dropdown clears it
+    if value and all(o["value"] != value for o in options):
+        options.append({"label": index.label(value), "value": value})
+    return options
+
+
+@app.callback(
+    Output("search-years-graph", "figure"),
+    Input("search", "value"),
+    *FILTER_INPUTS,
+)
+@snapshots.pin
+@figure_cache.memoize
+def update_search_years_graph(value, years=None, institutions=None, frascati=None):
+    if not value:
+        return px.line(title="Search for a keyword to see its trend")
+    return search_years_line(value, make_filters(years, institutions, frascati))
+
+
+@app.callback(
+    Output("search-inst-graph", "figure"),
+    Input("search", "value"),
+    *FILTER_INPUTS,
+)
+@snapshots.pin
+@figure_cache.memoize
+def update_search_inst_graph(value, years=None, institutions=None, frascati=None):
+    if not value:
+        return style_bar_fig(px.bar(title="Search for a keyword to see its top institutions"))
+    return search_top_institutions(value, make_filters(years, institutions, frascati))
+
+
+# Window 5
+@app.callback(
+    Output("w5-graph", "figure"),
+    Input("w5-metric", "value"),
+    *FILTER_INPUTS,
+)
+@snapshots.pin
+@figure_cache.memoize
+def update_w5_graph(metric_value, years=None, institutions=None, frascati=None):
+    return rising_topics_bar(metric_value or "keywords", make_filters(years, institutions, frascati))
+
+
+@app.callback(
+    Output("w5-download", "data"),
+    Input("w5-download-button", "n_clicks"),
+    State("w5-metric", "value"),
+    State("filter-years", "value"),
+    State("filter-institutions", "value"),
+    State("filter-frascati", "value"),
+    prevent_initial_call=True,
+)
+@snapshots.pin
+def download_w5_table(n_clicks, metric_value, years=None, institutions=None, frascati=None):
+    dimension = metric_value or "keywords"
+    table = view_trends(dimension, make_filters(years, institutions, frascati))
+    return dcc.send_data_frame(table.to_csv, f"rising_{dimension}.csv", index=False)
+
+
+# Window 6
+@app.callback(
+    Output("w6-graph", "figure"),
+    Input("w6-metric", "value"),
+    *FILTER_INPUTS,
+)
+@snapshots.pin
+@figure_cache.memoize
+def update_w6_graph(metric_value, years=None, institutions=None, frascati=None):
+    return keyword_network(metric_value or "pmi", make_filters(years, institutions, frascati))
+
 
 if __name__ == "__main__":
+    snapshots.start()
     app.run(debug=True)
@@ -0,0 +1,355 @@
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Benchmark and load test for the dashboard.
+#
+#   python benchmark.py --articles 200000 --users 50 --out report.json
+#   python benchmark.py --articles 200000 --baseline report.json     # compare with an earlier run
+#
+# 1. Generates a synthetic data.json with the schema of the real data (Year, Keywords,
+#    FrascatiClassification, Institutions, Source, ...) in a work folder; keyword and source
+#    frequencies are Zipf-distributed like in the real data.
+# 2. Startup: starts the app in a fresh process twice, first with only data.json (conversion
+#    included) and then with the converted files in place, and reports the time to import the app
+#    and to build all tables and indexes, plus the memory (RSS) of that process.
+# 3. Callbacks: calls every figure callback with every dropdown value under a few filter
+#    combinations, both without the figure cache (the figure is drawn) and with it.
+# 4. HTTP: serves the app (or uses --url) and lets --users threads post --requests callback
+#    requests each to /_dash-update-component, with random filter values.
+#
+# All latencies are reported as p50/p95/p99 in milliseconds. With --baseline the run is compared
+# with an earlier report, and the exit code is 1 if a p95 got more than REGRESSION_FACTOR slower.
+
+REGRESSION_FACTOR = 1.25
+FRASCATI_CODES = [f"{field}.{sub}" for field, n in ((1, 7), (2, 11), (3, 5), (4, 5), (5, 9), (6, 5))
+                  for sub in range(1, n + 1)]
+WORDS = ("analysis model data study effect system method climate cell protein energy learning network "
+         "estonian language health water forest soil history education policy quantum material").split()
+
+
+def generate_data(path: Path, n_articles: int, n_keywords: int = None, n_institutions: int = 200, seed: int = 0):
+    """Write a synthetic data.json of n_articles records."""
+    rng = np.random.default_rng(seed)
+    rnd = random.Random(seed)
+    n_keywords = n_keywords or max(100, n_articles // 4)
+    n_sources = max(10, n_articles // 50)
+    keywords = [f"{rnd.choice(WORDS)} {i}" for i in range(n_keywords)]
+    institutions = [{"Name": f"Asutus {i}", "NameEng": f"Institution {i}" if i % 3 else None}
+                    for i in range(n_institutions)]
+    n_per_article = rng.integers(0, 9, n_articles)
+    keyword_ids = (rng.zipf(1.3, n_per_article.sum()) - 1) % n_keywords
+    source_ids = (rng.zipf(1.5, n_articles) - 1) % n_sources
+    offsets = np.r_[0, np.cumsum(n_per_article)]
+    years = rng.integers(2015, 2025, n_articles)
+    records = []
+    for i in range(n_articles):
+        records.append({
+            "GUID": f"bench-{i}",
+            "Title": " ".join(rnd.choices(WORDS, k=rnd.randint(4, 12))).capitalize(),
+            "Year": int(years[i]) if i % 20 else None,
+            "FrascatiClassification": FRASCATI_CODES[rng.integers(len(FRASCATI_CODES))] if i % 25 else None,
+            "Keywords": [keywords[k] for k in keyword_ids[offsets[i]:offsets[i + 1]]],
+            "Institutions": [institutions[j] for j in rng.integers(0, n_institutions, rnd.randint(0, 3))],
+            "Source": f"Journal {source_ids[i]}" if i % 10 else None,
+        })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(records, f)
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB (peak if the current value is not available)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latency_stats(seconds: list) -> dict:
+    ms = np.asarray(seconds) * 1000
+    if len(ms) == 0:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "mean": round(float(ms.mean()), 2), "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2), "p99": round(float(p99), 2), "max": round(float(ms.max()), 2)}
+
+
+# Startup
+
+def startup_only():
+    """Run in a fresh process (with the work folder as cwd): import the app, warm it, print timings."""
+    start = time.perf_counter()
+    dashboard = importlib.import_module("app")
+    imported = time.perf_counter()
+    dashboard.snapshots.current().warm()
+    warmed = time.perf_counter()
+    print(json.dumps({"import_s": round(imported - start, 3), "warm_s": round(warmed - imported, 3),
+                      "total_s": round(warmed - start, 3), "rss_mb": round(rss_mb(), 1)}))
+
+
+def measure_startup(workdir: Path) -> dict:
+    # the converted files of an earlier run (--workdir) would make the first start a warm one
+    (workdir / "Data" / "data.parquet").unlink(missing_ok=True)
+    shutil.rmtree(workdir / "Data" / "data_arrow", ignore_errors=True)
+    results = {}
+    for name in ("cold", "warm"):  # cold converts data.json; warm finds the converted files
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-only"], cwd=workdir,
+                             env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))},
+                             capture_output=True, text=True, check=True)
+        results[name] = json.loads(out.stdout.strip().splitlines()[-1])
+    return results
+
+
+# Callbacks
+
+def filter_scenarios(dashboard) -> dict:
+    data = dashboard.snapshots.current()
+    year_min, year_max = data.year_range()
+    institutions = list(dashboard.view_counts("institutions", None, 3).index)
+    frascati = list(dashboard.view_counts("frascati", None, 2).index)
+    years = [max(year_min, year_max - 2), year_max] if year_min is not None else None
+    return {
+        "none": (None, None, None),
+        "years": (years, None, None),
+        "institutions": (None, institutions, None),
+        "frascati": (None, None, frascati),
+        "all": (years, institutions[:1], frascati[:1]),
+    }
+
+
+# callback name, its output graph and its first (dropdown) input, next to the filter inputs
+FIGURE_CALLBACKS = [
+    ("update_w1_graph", "w1-graph", "w1-metric"),
+    ("update_w2_graph", "w2-graph", "w2-metric"),
+    ("update_w3_graph", "w3-graph", "w3-metric"),
+    ("update_w5_graph", "w5-graph", "w5-metric"),
+    ("update_w6_graph", "w6-graph", "w6-metric"),
+    ("update_search_years_graph", "search-years-graph", "search"),
+    ("update_search_inst_graph", "search-inst-graph", "search"),
+]
+
+
+def dropdown_values(dashboard, input_id: str) -> list:
+    if input_id == "search":
+        return [o["value"] for o in dashboard.snapshots.current().search_index.suggest("a", 3)]
+    options = getattr(dashboard, "METRIC_OPTIONS_" + input_id.split("-")[0].upper())
+    return [o["value"] for o in options]
+
+
+def measure_callbacks(dashboard, repeat: int) -> dict:
+    results = {}
+    scenarios = filter_scenarios(dashboard)
+    for name, _, input_id in FIGURE_CALLBACKS:
+        callback, values = getattr(dashboard, name), dropdown_values(dashboard, input_id)
+        draw = callback.__wrapped__.__wrapped__  # without the snapshot pin and the figure cache
+        uncached, cached = [], []
+        for _ in range(repeat):
+            for value in values:
+                for filters in scenarios.values():
+                    with dashboard.snapshots.pinned():
+                        start = time.perf_counter()
+                        draw(value, *filters).to_json()
+                        uncached.append(time.perf_counter() - start)
+                    callback(value, *filters)
+                    start = time.perf_counter()
+                    callback(value, *filters)
+                    cached.append(time.perf_counter() - start)
+        results[name] = {"uncached": latency_stats(uncached), "cached": latency_stats(cached)}
+
+    index = dashboard.snapshots.current().search_index
+    typed = []
+    for _ in range(repeat):
+        for prefix in ("a", "an", "ana", "pro", "qu", "e", "wat", "x"):
+            start = time.perf_counter()
+            dashboard.update_search_options(prefix, None)
+            typed.append(time.perf_counter() - start)
+    results["update_search_options"] = {"uncached": latency_stats(typed), "n_keywords": len(index.keyword_terms)}
+    return results
+
+
+# HTTP load
+
+def dash_requests(dashboard) -> list:
+    """(output, first input, value) for /_dash-update-component, per figure callback and dropdown value."""
+    return [(output, input_id, value) for _, output, input_id in FIGURE_CALLBACKS
+            for value in dropdown_values(dashboard, input_id)]
+
+
+def _request_body(target: tuple, filters: tuple) -> bytes:
+    (output, first_id, first_value), (years, institutions, frascati) = target, filters
+    body = {
+        "output": f"{output}.figure",
+        "outputs": {"id": output, "property": "figure"},
+        "inputs": [
+            {"id": first_id, "property": "value", "value": first_value},
+            {"id": "filter-years", "property": "value", "value": years},
+            {"id": "filter-institutions", "property": "value", "value": institutions},
+            {"id": "filter-frascati", "property": "value", "value": frascati},
+        ],
+        "changedPropIds": [f"{first_id}.value"],
+        "state": [],
+    }
+    return json.dumps(body).encode("utf-8")
+
+
+def measure_http(dashboard, url: str, users: int, requests_per_user: int, seed: int = 0) -> dict:
+    templates = dash_requests(dashboard)
+    scenarios = list(filter_scenarios(dashboard).values())
+    year_min, year_max = dashboard.snapshots.current().year_range()
+    endpoint = url.rstrip("/") + "/_dash-update-component"
+
+    def user(n: int):
+        rnd = random.Random(seed + n)
+        latencies, errors = [], 0
+        for _ in range(requests_per_user):
+            years, institutions, frascati = rnd.choice(scenarios)
+            if year_min is not None and rnd.random() < 0.5:  # many different year ranges, like users dragging the slider
+                first = rnd.randint(year_min, year_max)
+                years = [first, rnd.randint(first, year_max)]
+            body = _request_body(rnd.choice(templates), (years, institutions, frascati))
+            request = urllib.request.Request(endpoint, data=body, headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    response.read()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(user, range(users)))
+    elapsed = time.perf_counter() - start
+    latencies = [t for ts, _ in results for t in ts]
+    return {**latency_stats(latencies), "errors": sum(e for _, e in results), "users": users,
+            "seconds": round(elapsed, 2), "requests_per_s": round(len(latencies) / elapsed, 1)}
+
+
+def serve_in_thread(dashboard):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no log line per request
+    server = make_server("127.0.0.1", 0, dashboard.app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# Report
+
+def compare(report: dict, baseline: dict) -> list:
+    """(name, old p95, new p95) of the latencies whose p95 got more than REGRESSION_FACTOR slower."""
+    def p95s(r):
+        out = {f"callback {name} {kind}": s["p95"] for name, kinds in r.get("callbacks", {}).items()
+               for kind, s in kinds.items() if isinstance(s, dict) and "p95" in s}
+        if "p95" in r.get("http", {}):
+            out["http"] = r["http"]["p95"]
+        for kind, s in r.get("startup", {}).items():
+            out[f"startup {kind}"] = s["total_s"] * 1000
+        return out
+
+    old, new = p95s(baseline), p95s(report)
+    print(f"\n{'compared with baseline':50} {'old':>10} {'new':>10}")
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        slower = new[name] > old[name] * REGRESSION_FACTOR and new[name] - old[name] > 1  # ignore sub-ms noise
+        print(f"{name:50} {old[name]:10.1f} {new[name]:10.1f}{'  SLOWER' if slower else ''}")
+        if slower:
+            regressions.append((name, old[name], new[name]))
+    return regressions
+
+
+def print_report(report: dict):
+    for kind, s in report.get("startup", {}).items():
+        print(f"startup {kind:5}  import {s['import_s']:.2f} s, warm {s['warm_s']:.2f} s, RSS {s['rss_mb']:.0f} MB")
+    print(f"\n{'callback (ms)':40} {'p50':>8} {'p95':>8} {'p99':>8} {'cached p95':>11}")
+    for name, kinds in report.get("callbacks", {}).items():
+        s, cached = kinds["uncached"], kinds.get("cached", {})
+        print(f"{name:40} {s['p50']:8.1f} {s['p95']:8.1f} {s['p99']:8.1f} {cached.get('p95', float('nan')):11.2f}")
+    http = report.get("http")
+    if http:
+        print(f"\nHTTP, {http['users']} users: p50 {http.get('p50', 0):.1f} ms, p95 {http.get('p95', 0):.1f} ms, "
+              f"p99 {http.get('p99', 0):.1f} ms, {http['requests_per_s']} requests/s, {http['errors']} errors")
+    print(f"\nmemory: {report['memory']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard on synthetic data.")
+    parser.add_argument("--articles", type=int, default=20000, help="size of the synthetic data.json")
+    parser.add_argument("--keywords", type=int, default=None, help="distinct keywords (default: articles / 4)")
+    parser.add_argument("--workdir", default=None, help="folder for Data/ (default: a temporary folder)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of every callback call")
+    parser.add_argument("--users", type=int, default=50, help="concurrent HTTP users (0: no HTTP test)")
+    parser.add_argument("--requests", type=int, default=20, help="requests per HTTP user")
+    parser.add_argument("--url", default=None, help="test a running server instead of one started here")
+    parser.add_argument("--no-figure-cache", action="store_true", help="draw every figure in the HTTP test")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare with")
+    parser.add_argument("--startup-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.startup_only:
+        return startup_only()
+
+    out_path = Path(args.out).resolve() if args.out else None
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="dashboard-bench-")).resolve()
+    data_path = workdir / "Data" / "data.json"
+    if not data_path.exists():
+        start = time.perf_counter()
+        generate_data(data_path, args.articles, args.keywords)
+        print(f"Generated {args.articles} articles in {data_path} ({time.perf_counter() - start:.1f} s)")
+    report = {"config": {k: v for k, v in vars(args).items() if k != "startup_only"}, "memory": {}}
+
+    report["startup"] = measure_startup(workdir)
+    os.chdir(workdir)
+    dashboard = importlib.import_module("app")
+    dashboard.snapshots.current().warm()
+    report["memory"]["after_startup_mb"] = round(rss_mb(), 1)
+
+    report["callbacks"] = measure_callbacks(dashboard, args.repeat)
+    report["memory"]["after_callbacks_mb"] = round(rss_mb(), 1)
+
+    if args.users > 0:
+        server = None
+        url = args.url
+        if url is None:
+            if args.no_figure_cache:
+                dashboard.figure_cache.maxsize = 0
+            server, url = serve_in_thread(dashboard)
+        report["http"] = measure_http(dashboard, url, args.users, args.requests)
+        report["memory"]["after_http_mb"] = round(rss_mb(), 1)
+        if server is not None:
+            server.shutdown()
+    report["memory"]["peak_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    print_report(report)
+    if out_path:
+        out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if baseline_path:
+        regressions = compare(report, json.loads(baseline_path.read_text(encoding="utf-8")))
+        if regressions:
+            print(f"\n{len(regressions)} latencies are more than {REGRESSION_FACTOR:.2f}x slower than the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
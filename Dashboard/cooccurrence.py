@@ -0,0 +1,166 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Keyword co-occurrence network for the dashboard.
+#
+# The keyword links of the selected articles form a sparse binary article x keyword matrix K
+# (rows sorted by article, one entry per keyword of an article). The pair counts K^T K are
+# taken straight from it: within each article every keyword is paired with the keywords after
+# it, one vectorized step per distance, so only pairs that actually occur are ever created and
+# memory grows with the number of pairs, not with keywords^2. The pairs are then counted with
+# np.bincount when the node set is small enough for a dense table, otherwise with np.unique.
+#
+# Each pair gets a weight (WEIGHTS):
+#   pmi      log(n_ab * N / (n_a * n_b)), how much more often they co-occur than by chance
+#   jaccard  n_ab / (n_a + n_b - n_ab)
+#   count    n_ab
+# and only the k strongest edges of every keyword are kept.
+#
+#   python cooccurrence.py [data.parquet] [out.csv] [pmi|jaccard|count] [k]    # export all edges
+
+WEIGHTS = ("pmi", "jaccard", "count")
+TOP_K = 5
+MIN_PAIR_COUNT = 3
+DENSE_LIMIT = 1 << 24  # node pairs up to which pairs are counted in a dense table
+COLUMNS = ["source", "target", "source_id", "target_id", "count", "weight"]
+
+
+def keyword_pairs(rows: np.ndarray, nodes: np.ndarray):
+    """
+    (a, b) node pairs with a < b for every article, from (article row, node) links.
+    Returns the pairs and the number of articles of every node.
+    """
+    order = np.lexsort((nodes, rows))
+    rows, nodes = rows[order], nodes[order]
+    first = np.ones(len(rows), dtype=bool)  # drop a keyword that is listed twice for an article
+    first[1:] = (rows[1:] != rows[:-1]) | (nodes[1:] != nodes[:-1])
+    rows, nodes = rows[first], nodes[first]
+
+    a_parts, b_parts = [], []
+    distance = 1
+    while distance < len(rows):
+        same = np.flatnonzero(rows[distance:] == rows[:-distance])
+        if len(same) == 0:  # no article has more keywords than this
+            break
+        a_parts.append(nodes[same])
+        b_parts.append(nodes[same + distance])
+        distance += 1
+    empty = np.empty(0, dtype=nodes.dtype)
+    a = np.concatenate(a_parts) if a_parts else empty
+    b = np.concatenate(b_parts) if b_parts else empty
+    return a, b, nodes
+
+
+def count_pairs(a: np.ndarray, b: np.ndarray, n_nodes: int, min_count: int = MIN_PAIR_COUNT):
+    """(a, b, count) of the pairs that occur at least min_count times."""
+    keys = a.astype(np.int64) * n_nodes + b
+    if n_nodes * n_nodes <= DENSE_LIMIT:
+        counts = np.bincount(keys, minlength=n_nodes * n_nodes)
+        keys = np.flatnonzero(counts >= min_count)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+        keys, counts = keys[counts >= min_count], counts[counts >= min_count]
+    return keys // n_nodes, keys % n_nodes, counts
+
+
+def pair_weights(counts, n_a, n_b, n_articles: int, weight: str) -> np.ndarray:
+    counts = counts.astype(np.float64)
+    if weight == "pmi":
+        return np.log(counts * n_articles / (n_a.astype(np.float64) * n_b))
+    if weight == "jaccard":
+        return counts / (n_a + n_b - counts)
+    if weight == "count":
+        return counts
+    raise ValueError(f"Unknown weight: {weight}")
+
+
+def top_k_edges(a: np.ndarray, b: np.ndarray, weights: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the edges that are among the k heaviest of at least one of their two nodes."""
+    edge = np.concatenate([np.arange(len(a)), np.arange(len(a))])
+    node = np.concatenate([a, b])
+    order = np.lexsort((-np.concatenate([weights, weights]), node))
+    node = node[order]
+    group_start = np.flatnonzero(np.r_[True, node[1:] != node[:-1]])
+    rank = np.arange(len(node)) - np.repeat(group_start, np.diff(np.r_[group_start, len(node)]))
+    return np.unique(edge[order][rank < k])
+
+
+def cooccurrence(data, mask=None, keywords=None, weight: str = "pmi", k: int = TOP_K,
+                 min_count: int = MIN_PAIR_COUNT) -> pd.DataFrame:
+    """
+    Keyword pairs of a datastore.DataSnapshot with their count and weight, strongest first:
+    the k strongest edges of every keyword, over the article rows in `mask` (all when None) and
+    only between the keyword IDs in `keywords` (all when None). Edges with a weight <= 0 (pairs
+    that co-occur less often than by chance) are left out.
+    """
+    index = data.filter_index
+    links = np.ones(len(index.kw_rows), dtype=bool) if mask is None else mask[index.kw_rows]
+    n_articles = np.count_nonzero(np.bincount(index.kw_rows[links], minlength=index.n_rows))
+    if keywords is not None:
+        links &= np.isin(index.kw_ids, np.asarray(keywords))
+    keyword_ids, nodes = np.unique(index.kw_ids[links], return_inverse=True)
+
+    a, b, nodes = keyword_pairs(index.kw_rows[links], nodes.astype(np.int64))
+    n_articles_of = np.bincount(nodes, minlength=len(keyword_ids))
+    a, b, counts = count_pairs(a, b, len(keyword_ids), min_count)
+    weights = pair_weights(counts, n_articles_of[a], n_articles_of[b], n_articles, weight)
+    positive = weights > 0
+    a, b, counts, weights = a[positive], b[positive], counts[positive], weights[positive]
+    kept = top_k_edges(a, b, weights, k)
+    a, b, counts, weights = a[kept], b[kept], counts[kept], weights[kept]
+
+    terms = data.keyword_terms
+    edges = pd.DataFrame({
+        "source": np.asarray(terms)[keyword_ids[a]],
+        "target": np.asarray(terms)[keyword_ids[b]],
+        "source_id": keyword_ids[a],
+        "target_id": keyword_ids[b],
+        "count": counts,
+        "weight": weights.round(4),
+    }, columns=COLUMNS)
+    return edges.sort_values(["weight", "count"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+def spring_layout(n_nodes: int, a: np.ndarray, b: np.ndarray, weights: np.ndarray,
+                  iterations: int = 200, seed: int = 0) -> np.ndarray:
+    """Force-directed (Fruchterman-Reingold) node positions for a small graph, shape (n_nodes, 2)."""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, (n_nodes, 2))
+    if n_nodes < 2:
+        return pos
+    k = 1 / np.sqrt(n_nodes)
+    strength = weights / weights.max() if len(weights) else weights
+    step = 0.1
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        disp = (delta * (k * k / dist ** 2)[:, :, None]).sum(axis=1)  # every pair repels
+        d = pos[a] - pos[b]
+        pull = d * (np.linalg.norm(d, axis=1) / k * strength)[:, None]  # edges attract
+        np.add.at(disp, a, -pull)
+        np.add.at(disp, b, pull)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)[:, None]
+        pos += disp / length * np.minimum(length, step)
+        step *= 0.98
+    return pos
+
+
+def main():
+    from datastore import DataSnapshot  # datastore imports this module's neighbours; import here
+
+    parquet_path = Path(sys.argv[1] if len(sys.argv) > 1 else "Data/data.parquet")
+    out_path = Path(sys.argv[2] if len(sys.argv) > 2 else "Data/keyword_network.csv")
+    weight = sys.argv[3] if len(sys.argv) > 3 else "pmi"
+    k = int(sys.argv[4]) if len(sys.argv) > 4 else TOP_K
+    edges = cooccurrence(DataSnapshot(parquet_path), weight=weight, k=k)
+    edges.to_csv(out_path, index=False)
+    print(f"{len(edges)} edges written to {out_path}; strongest:")
+    print(edges.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import json
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for classification.keyword_vocab
+from classification.keyword_vocab import KeywordVocab
+from aggregates import MISSING_FRASCATI, MISSING_YEAR, build_cube, institution_names
+from filters import FilterIndex
+from search import SearchIndex
+from trends import topic_trends
+
+# libraries needed: python -m pip install pyarrow
+#
+# Columnar data store for the dashboard. data.json is converted once into a Parquet file with
+# compact, already-cleaned columns:
+#
+#   GUID, Title      string
+#   Year             int16 (MISSING_YEAR when unknown)
+#   Frascati, Source dictionary-encoded strings (pandas categoricals)
+#   KeywordIDs       list<int32>, IDs of the canonical keywords (the terms are stored in the file's metadata)
+#   Institutions     list<string>, institution names
+#
+# The app opens a DataSnapshot, which reads nothing up front; every frame (and the aggregate
+# cube) is built the first time it is used, and only from the columns it needs. The list columns
+# are flattened by pyarrow, so no per-row Python objects are created.
+#
+# The frames themselves are also written once as uncompressed Arrow files (data_arrow/<version>/
+# next to the Parquet file) and memory-mapped from there. Their integer columns are numpy views of the
+# mapped file, so several server processes share one copy in the OS page cache (see serve.py).
+#
+#   python datastore.py [data.json] [data.parquet] [keyword_vocab.json]    # convert and report
+
+ROW_GROUP_SIZE = 50000
+FRAMES = ("articles", "keywords_long", "institutions_long")
+KEEP_ARROW_VERSIONS = 2   # older versions are deleted; processes that still map them keep their pages
+
+
+def data_version(*paths):
+    """Stamp of the data files (modification time and size); it changes whenever a file is replaced."""
+    parts = []
+    for path in map(Path, paths):
+        if path.exists():
+            st = path.stat()
+            parts.append(f"{st.st_mtime_ns:x}-{st.st_size:x}")
+    return "_".join(parts)
+
+
+def _missing(value) -> bool:
+    """None, "" and NaN (how the column-oriented JSON fills cells a record doesn't have)."""
+    return pd.api.types.is_scalar(value) and (pd.isna(value) or value == "")
+
+
+def _year(value) -> int:
+    if _missing(value):
+        return MISSING_YEAR
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return MISSING_YEAR
+
+
+def _text(value):
+    return None if _missing(value) else str(value)
+
+
+def _records(data) -> list:
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        # pandas' column orientation {column: {row: value}}
+        return pd.DataFrame(data).to_dict("records")
+    raise ValueError("Unsupported JSON format")
+
+
+def convert_to_parquet(json_path: Path, parquet_path: Path, vocab_path: Path = None):
+    with Path(json_path).open("r", encoding="utf-8") as f:
+        records = _records(json.load(f))
+
+    vocab = KeywordVocab.load(vocab_path) if vocab_path and Path(vocab_path).exists() else KeywordVocab()
+    vocab.update(r.get("Keywords") for r in records)
+
+    frascati = [r.get("FrascatiClassification") for r in records]
+    table = pa.table({
+        "GUID": pa.array([_text(r.get("GUID")) for r in records], type=pa.string()),
+        "Title": pa.array([_text(r.get("Title")) for r in records], type=pa.string()),
+        "Year": pa.array([_year(r.get("Year")) for r in records], type=pa.int16()),
+        "Frascati": pa.array([MISSING_FRASCATI if _missing(f) else str(f) for f in frascati]).dictionary_encode(),
+        "Source": pa.array([_text(r.get("Source")) for r in records], type=pa.string()).dictionary_encode(),
+        "KeywordIDs": pa.array([vocab.ids(r.get("Keywords")) for r in records], type=pa.list_(pa.int32())),
+        "Institutions": pa.array([institution_names(r.get("Institutions")) for r in records],
+                                 type=pa.list_(pa.string())),
+    })
+    table = table.replace_schema_metadata({"keyword_terms": json.dumps(vocab.terms, ensure_ascii=False)})
+    tmp = Path(parquet_path).with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    tmp.replace(parquet_path)
+    return table.num_rows
+
+
+def ensure_parquet(json_path: Path, parquet_path: Path, vocab_path: Path = None) -> Path:
+    """Convert json_path to parquet_path unless an up-to-date conversion already exists."""
+    json_path, parquet_path = Path(json_path), Path(parquet_path)
+    sources = [p for p in (json_path, vocab_path) if p and Path(p).exists()]
+    if parquet_path.exists() and all(parquet_path.stat().st_mtime >= Path(p).stat().st_mtime for p in sources):
+        return parquet_path
+    if not json_path.exists():
+        if parquet_path.exists():
+            return parquet_path
+        raise FileNotFoundError(json_path)
+    n = convert_to_parquet(json_path, parquet_path, vocab_path)
+    print(f"Converted {n} records from {json_path} to {parquet_path}")
+    return parquet_path
+
+
+def _categorical(array: pa.ChunkedArray) -> pd.Series:
+    if not pa.types.is_dictionary(array.type):
+        array = array.dictionary_encode()
+    return array.to_pandas()
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    """DataFrame over an Arrow table: dictionary columns become categoricals, integer columns stay zero-copy."""
+    columns = {}
+    for name in table.column_names:
+        column = table[name]
+        if pa.types.is_dictionary(column.type):
+            columns[name] = _categorical(column)
+        else:
+            columns[name] = column.combine_chunks().to_numpy(zero_copy_only=column.null_count == 0)
+    return pd.DataFrame(columns, copy=False)
+
+
+def arrow_dir(parquet_path: Path) -> Path:
+    parquet_path = Path(parquet_path)
+    return parquet_path.with_name(parquet_path.stem + "_arrow")
+
+
+def _write_arrow(table: pa.Table, path: Path):
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table.unify_dictionaries().combine_chunks())
+    tmp.replace(path)
+
+
+def _read_arrow(path: Path) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+class DataSnapshot:
+    """
+    Read-only view of one version of the dashboard data. Frames are built lazily and cached on
+    the snapshot, so a snapshot that is never asked for keywords never reads them. With
+    `shared_dir` the frames are memory-mapped from the Arrow files there (see export_arrow);
+    the Parquet file stays open, so it can be replaced on disk while the snapshot is in use.
+    """
+
+    def __init__(self, parquet_path: Path, shared_dir: Path = None):
+        self.path = Path(parquet_path)
+        self.version = data_version(self.path)
+        self.shared_dir = Path(shared_dir) if shared_dir else None
+        self._file = pq.ParquetFile(self.path, read_dictionary=["Frascati", "Source"])
+        self.num_rows = self._file.metadata.num_rows
+        self._lock = threading.RLock()
+        self._cache = {}
+
+    def _lazy(self, name: str, build):
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = build()
+            return self._cache[name]
+
+    def _read(self, columns: list[str]) -> pa.Table:
+        return self._file.read(columns=columns)
+
+    @property
+    def keyword_terms(self) -> pd.Index:
+        def build():
+            terms = (self._file.schema_arrow.metadata or {}).get(b"keyword_terms", b"[]")
+            return pd.Index(json.loads(terms))
+        return self._lazy("keyword_terms", build)
+
+    def column(self, name: str) -> pa.ChunkedArray:
+        """One column straight from the Parquet file (e.g. Title, which no frame keeps)."""
+        return self._read([name])[name]
+
+    def _long_table(self, column: str, value_name: str, dictionary: bool) -> pa.Table:
+        lists = self._read([column])[column].combine_chunks()
+        values = pc.list_flatten(lists)
+        return pa.table({
+            "row": pc.list_parent_indices(lists).cast(pa.int32()),
+            value_name: values.dictionary_encode() if dictionary else values,
+        })
+
+    def frame_table(self, name: str) -> pa.Table:
+        """The Arrow table behind one of FRAMES, built from the Parquet file."""
+        if name == "articles":
+            return self._read(["Year", "Frascati", "Source"])
+        if name == "keywords_long":
+            return self._long_table("KeywordIDs", "KeywordID", False)
+        if name == "institutions_long":
+            return self._long_table("Institutions", "Institution", True)
+        raise ValueError(f"Unknown frame: {name}")
+
+    def _frame(self, name: str) -> pd.DataFrame:
+        def build():
+            if self.shared_dir is not None:
+                return _to_frame(_read_arrow(self.shared_dir / f"{name}.arrow"))
+            return _to_frame(self.frame_table(name))
+        return self._lazy(name, build)
+
+    @property
+    def articles(self) -> pd.DataFrame:
+        """One row per article: Year (int16), Frascati and Source (categoricals)."""
+        return self._frame("articles")
+
+    @property
+    def keywords_long(self) -> pd.DataFrame:
+        """One row per (article row, keyword ID)."""
+        return self._frame("keywords_long")
+
+    @property
+    def institutions_long(self) -> pd.DataFrame:
+        """One row per (article row, institution name)."""
+        return self._frame("institutions_long")
+
+    @property
+    def cube(self):
+        return self._lazy("cube", lambda: build_cube(self))
+
+    @property
+    def filter_index(self) -> FilterIndex:
+        return self._lazy("filter_index", lambda: FilterIndex(self))
+
+    @property
+    def search_index(self) -> SearchIndex:
+        return self._lazy("search_index", lambda: SearchIndex(self))
+
+    @property
+    def trends(self) -> dict:
+        """Trend tables (trends.py) of all keywords and Frascati codes, unfiltered."""
+        return self._lazy("trends", lambda: {d: topic_trends(self, d) for d in ("keywords", "frascati")})
+
+    def year_range(self):
+        years = self.cube.years()
+        return (years[0], years[-1]) if years else (None, None)
+
+    def warm(self):
+        """Build everything now, e.g. in a server's master process before it forks its workers."""
+        for name in ("keyword_terms", *FRAMES, "cube", "filter_index", "search_index", "trends"):
+            getattr(self, name)
+        return self
+
+
+def export_arrow(snapshot: DataSnapshot) -> Path:
+    """Write the frames of a snapshot as Arrow files into a folder of its version (once per version)."""
+    root = arrow_dir(snapshot.path)
+    out = root / snapshot.version
+    paths = [out / f"{name}.arrow" for name in FRAMES]
+    if all(p.exists() for p in paths):
+        return out
+    out.mkdir(parents=True, exist_ok=True)
+    for name, path in zip(FRAMES, paths):
+        _write_arrow(snapshot.frame_table(name), path)
+
+    versions = sorted((d for d in root.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime, reverse=True)
+    for old in versions[KEEP_ARROW_VERSIONS:]:
+        if old != out:
+            shutil.rmtree(old, ignore_errors=True)
+    return out
+
+
+def load_snapshot(json_path: Path, parquet_path: Path, vocab_path: Path = None, shared: bool = True) -> DataSnapshot:
+    snapshot = DataSnapshot(ensure_parquet(json_path, parquet_path, vocab_path))
+    if shared:
+        snapshot.shared_dir = export_arrow(snapshot)
+    return snapshot
+
+
+def main():
+    json_path = Path(sys.argv[1] if len(sys.argv) > 1 else "Data/data.json")
+    parquet_path = Path(sys.argv[2] if len(sys.argv) > 2 else json_path.with_suffix(".parquet"))
+    vocab_path = Path(sys.argv[3] if len(sys.argv) > 3 else json_path.with_name("keyword_vocab.json"))
+    n = convert_to_parquet(json_path, parquet_path, vocab_path)
+    print(f"Converted {n} records: {json_path} ({json_path.stat().st_size / 1e6:.1f} MB) -> "
+          f"{parquet_path} ({parquet_path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import html
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from plotly.offline import get_plotlyjs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import app as dashboard  # noqa: E402
+
+# Static export of the dashboard.
+#
+# Every view of the dashboard is a function of a few dropdown values and the data, so all of
+# them can be drawn in advance. This script renders every option of the plot windows for every
+# filter preset to a figure JSON file (with the same callbacks the live app uses) and writes a
+# plain index.html that switches between them in the browser with plotly.js:
+#
+#   <out>/index.html
+#   <out>/plotly.min.js
+#   <out>/figures/<window>/<option>/<preset>.json
+#   <out>/tables/rising_<keywords|frascati>_<preset>.csv     (the emerging-topic tables)
+#
+# The folder can be served by any static web server, so viewing it costs no server CPU. The
+# free-text search window needs the live app and is not exported.
+#
+#   python export_static.py [out_dir] [presets.json]
+#
+# presets.json (optional) maps a preset name to filters, e.g.
+#   {"ict-2022": {"label": "ICT 2022", "years": [2022, 2022], "frascati": ["1.2"]}}
+# By default the presets are all data, the last three years and every single year.
+
+WINDOWS = [
+    ("w1", "Frequency bar plots", dashboard.METRIC_OPTIONS_W1, dashboard.update_w1_graph),
+    ("w2", "Trends over years", dashboard.METRIC_OPTIONS_W2, dashboard.update_w2_graph),
+    ("w3", "Distributions", dashboard.METRIC_OPTIONS_W3, dashboard.update_w3_graph),
+    ("w5", "Emerging topics", dashboard.METRIC_OPTIONS_W5, dashboard.update_w5_graph),
+    ("w6", "Keyword network", dashboard.METRIC_OPTIONS_W6, dashboard.update_w6_graph),
+]
+
+
+def default_presets() -> dict:
+    year_min, year_max = dashboard.snapshots.current().year_range()
+    presets = {"all": {"label": "All data"}}
+    if year_min is None:
+        return presets
+    if year_max - year_min >= 3:
+        presets["last-3-years"] = {"label": f"{year_max - 2}-{year_max}", "years": [year_max - 2, year_max]}
+    for year in range(year_max, year_min - 1, -1):
+        presets[str(year)] = {"label": str(year), "years": [year, year]}
+    return presets
+
+
+def _file_name(text: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(text)).strip("_") or "_"
+
+
+def export_figures(out_dir: Path, presets: dict) -> int:
+    n = 0
+    for window, _, options, callback in WINDOWS:
+        for option in options:
+            folder = out_dir / "figures" / window / _file_name(option["value"])
+            folder.mkdir(parents=True, exist_ok=True)
+            for name, preset in presets.items():
+                figure = callback(option["value"], preset.get("years"), preset.get("institutions"),
+                                  preset.get("frascati"))
+                (folder / f"{_file_name(name)}.json").write_text(json.dumps(figure), encoding="utf-8")
+                n += 1
+    return n
+
+
+def export_tables(out_dir: Path, presets: dict):
+    (out_dir / "tables").mkdir(parents=True, exist_ok=True)
+    for name, preset in presets.items():
+        filters = dashboard.make_filters(preset.get("years"), preset.get("institutions"), preset.get("frascati"))
+        for dimension in ("keywords", "frascati"):
+            table = dashboard.view_trends(dimension, filters)
+            table.to_csv(out_dir / "tables" / f"rising_{dimension}_{_file_name(name)}.csv", index=False)
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Zilla+Slab:wght@300;400;500;700&display=swap">
+<script src="plotly.min.js"></script>
+<style>
+  body {{ font-family: "Zilla Slab", serif; background: white; color: black; margin: 0; }}
+  main {{ max-width: 1200px; margin: 0 auto; padding: 24px 16px 40px 16px; }}
+  .plot-window {{ display: flex; flex-direction: row; align-items: stretch; gap: 24px; margin-bottom: 40px; }}
+  .controls {{ width: 25%; min-width: 260px; }}
+  .plot-area {{ flex: 1; min-height: 500px; }}
+  select {{ width: 100%; padding: 6px; font: inherit; }}
+</style>
+</head>
+<body>
+<main>
+<h1>{title}</h1>
+<p>Data version {version}, exported {exported}.</p>
+<hr>
+<label>Filter preset</label>
+<select id="preset">{preset_options}</select>
+<p id="tables"></p>
+{windows}
+</main>
+<script>
+const WINDOWS = {window_ids};
+const FILES = {file_names};
+
+function show(id) {{
+  const option = document.getElementById(id + "-metric").value;
+  const preset = document.getElementById("preset").value;
+  fetch(`figures/${{id}}/${{FILES[option]}}/${{FILES[preset]}}.json`)
+    .then(response => response.json())
+    .then(figure => Plotly.react(id + "-graph", figure.data, figure.layout, {{responsive: true}}));
+}}
+
+function showTables() {{
+  const preset = FILES[document.getElementById("preset").value];
+  document.getElementById("tables").innerHTML =
+    `Emerging-topic tables: <a href="tables/rising_keywords_${{preset}}.csv">keywords</a>, ` +
+    `<a href="tables/rising_frascati_${{preset}}.csv">Frascati classifications</a> (CSV)`;
+}}
+
+WINDOWS.forEach(id => {{
+  document.getElementById(id + "-metric").addEventListener("change", () => show(id));
+  show(id);
+}});
+document.getElementById("preset").addEventListener("change", () => {{ WINDOWS.forEach(show); showTables(); }});
+showTables();
+</script>
+</body>
+</html>
+"""
+
+WINDOW = """<div class="plot-window">
+  <div class="controls">
+    <h2>{title}</h2>
+    <label>Select view</label>
+    <select id="{window}-metric">{options}</select>
+  </div>
+  <div class="plot-area" id="{window}-graph"></div>
+</div>"""
+
+
+def _options(values_labels) -> str:
+    return "".join(f'<option value="{html.escape(str(v))}">{html.escape(str(label))}</option>'
+                   for v, label in values_labels)
+
+
+def export_page(out_dir: Path, presets: dict):
+    windows = "\n".join(
+        WINDOW.format(title=html.escape(title), window=window,
+                      options=_options((o["value"], o["label"]) for o in options))
+        for window, title, options, _ in WINDOWS
+    )
+    names = [o["value"] for _, _, options, _ in WINDOWS for o in options] + list(presets)
+    page = PAGE.format(
+        title=html.escape(dashboard.app.title),
+        version=html.escape(dashboard.snapshots.current().version),
+        exported=time.strftime("%Y-%m-%d %H:%M"),
+        preset_options=_options((name, p.get("label", name)) for name, p in presets.items()),
+        windows=windows,
+        window_ids=json.dumps([w[0] for w in WINDOWS]),
+        file_names=json.dumps({str(name): _file_name(name) for name in names}),
+    )
+    (out_dir / "index.html").write_text(page, encoding="utf-8")
+    (out_dir / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+
+
+def main():
+    out_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "Data/static")
+    presets_path = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+    start = time.perf_counter()
+    with dashboard.snapshots.pinned():
+        if presets_path:
+            presets = json.loads(presets_path.read_text(encoding="utf-8"))
+        else:
+            presets = default_presets()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        n = export_figures(out_dir, presets)
+        export_tables(out_dir, presets)
+        export_page(out_dir, presets)
+    print(f"Exported {n} figures for {len(presets)} filter presets to {out_dir} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
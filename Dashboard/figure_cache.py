@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Memoized figures for the Dash callbacks.
+#
+# A callback's figure only depends on its inputs (a few dropdown values) and on the data, so the
+# figure JSON is cached under (callback name, inputs, data version). The in-memory cache is an
+# LRU of at most `maxsize` figures. With `disk_dir` set, figures are also written there (one JSON
+# file per key, in a subfolder per data version), so several server processes share them.
+# When the data version changes, the memory cache is emptied and the folders of older versions are
+# removed, so stale figures are never served.
+
+
+class FigureCache:
+    def __init__(self, version, maxsize: int = 256, disk_dir=None):
+        """`version` is a function returning the current data version stamp (a string)."""
+        self.version = version
+        self.maxsize = maxsize
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._lock = threading.Lock()
+        self._figures = OrderedDict()
+        self._version = None
+        self.hits = self.misses = self.disk_hits = 0
+
+    def _check_version(self, version: str):
+        if version == self._version:
+            return
+        self._figures.clear()
+        self._version = version
+        if self.disk_dir is not None:
+            current = self.disk_dir / version
+            current.mkdir(parents=True, exist_ok=True)
+            created = current.stat().st_mtime
+            for old in self.disk_dir.iterdir():
+                # a process that is still on an older version must not remove a newer one's figures
+                if old.is_dir() and old != current and old.stat().st_mtime < created:
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def _disk_path(self, version: str, key: str) -> Path:
+        return self.disk_dir / version / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key: str):
+        version = self.version()
+        with self._lock:
+            self._check_version(version)
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+        if self.disk_dir is not None:
+            path = self._disk_path(version, key)
+            try:
+                figure = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                figure = None
+            if figure is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put(key, figure)
+                return figure
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put(self, key: str, figure: dict):
+        self._figures[key] = figure
+        self._figures.move_to_end(key)
+        while len(self._figures) > self.maxsize:
+            self._figures.popitem(last=False)
+
+    def put(self, key: str, figure: dict):
+        version = self.version()
+        with self._lock:
+            self._check_version(version)
+            self._put(key, figure)
+        if self.disk_dir is not None:
+            path = self._disk_path(version, key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(figure), encoding="utf-8")
+            tmp.replace(path)
+
+    def memoize(self, fn):
+        """Decorator for a callback that returns a Plotly figure; the cached figure is returned as a dict."""
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = json.dumps([fn.__name__, args], default=str)
+            figure = self.get(key)
+            if figure is None:
+                figure = json.loads(fn(*args).to_json())
+                self.put(key, figure)
+            return figure
+        return wrapper
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._figures), "hits": self.hits, "disk_hits": self.disk_hits,
+                    "misses": self.misses, "version": self._version}
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import MISSING_FRASCATI, MISSING_YEAR
+
+# Cross-filtering for the dashboard (year range, institutions, Frascati codes).
+#
+# FilterIndex keeps every dimension as an integer-coded numpy array over the article rows, plus
+# a precomputed row index per institution and per Frascati code (rows sorted by value, with
+# offsets, so "all rows of these values" is one slice per value). A filter combination becomes
+# a boolean row mask built from a few vectorized comparisons and one AND per filter, and each
+# view is a np.bincount over the masked codes. Nothing is re-exploded or grouped in pandas.
+
+
+class RowIndex:
+    """Row numbers grouped by an integer code: rows_for([c1, c2]) returns the rows having c1 or c2."""
+
+    def __init__(self, codes: np.ndarray, rows: np.ndarray, n_values: int):
+        order = np.argsort(codes, kind="stable")
+        self.rows = rows[order].astype(np.int32)
+        self.offsets = np.searchsorted(codes[order], np.arange(n_values + 1))
+
+    def rows_for(self, codes) -> np.ndarray:
+        parts = [self.rows[self.offsets[c]:self.offsets[c + 1]] for c in codes if 0 <= c < len(self.offsets) - 1]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+
+
+def _top(counts: np.ndarray, labels, n=None) -> pd.Series:
+    """Non-zero counts as a Series indexed by label, largest first (only the n largest if n is given)."""
+    nonzero = np.flatnonzero(counts)
+    if n is not None and len(nonzero) > n:
+        nonzero = nonzero[np.argpartition(counts[nonzero], -n)[-n:]]
+    nonzero = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+    return pd.Series(counts[nonzero], index=pd.Index(np.asarray(labels)[nonzero]), name="count")
+
+
+class FilterIndex:
+    def __init__(self, data):
+        """`data` is a datastore.DataSnapshot."""
+        articles = data.articles
+        self.n_rows = len(articles)
+        self.year = articles["Year"].to_numpy()
+        self.frascati = articles["Frascati"].cat.codes.to_numpy()
+        self.frascati_labels = articles["Frascati"].cat.categories
+        self.source = articles["Source"].cat.codes.to_numpy()
+        self.source_labels = articles["Source"].cat.categories
+        self.missing_frascati = self.frascati_labels.get_indexer([MISSING_FRASCATI])[0]
+
+        keywords = data.keywords_long
+        self.kw_rows = keywords["row"].to_numpy()
+        self.kw_ids = keywords["KeywordID"].to_numpy()
+        self.n_keywords = len(data.keyword_terms)
+
+        institutions = data.institutions_long
+        self.inst_rows = institutions["row"].to_numpy()
+        self.inst_codes = institutions["Institution"].cat.codes.to_numpy()
+        self.inst_labels = institutions["Institution"].cat.categories
+
+        self.by_institution = RowIndex(self.inst_codes, self.inst_rows, len(self.inst_labels))
+        self.by_frascati = RowIndex(self.frascati, np.arange(self.n_rows), len(self.frascati_labels))
+
+    def mask(self, years=None, institutions=None, frascati=None, with_year=False, with_frascati=False):
+        """Boolean mask of the article rows that pass all filters (None when nothing is filtered)."""
+        mask = None
+
+        def _and(m):
+            nonlocal mask
+            mask = m if mask is None else mask & m
+
+        if years is not None:
+            _and((self.year >= years[0]) & (self.year <= years[1]))
+        elif with_year:
+            _and(self.year != MISSING_YEAR)
+        if frascati:
+            m = np.zeros(self.n_rows, dtype=bool)
+            m[self.by_frascati.rows_for(self.frascati_labels.get_indexer(frascati))] = True
+            _and(m)
+        elif with_frascati and self.missing_frascati >= 0:
+            _and(self.frascati != self.missing_frascati)
+        if institutions:
+            m = np.zeros(self.n_rows, dtype=bool)
+            m[self.by_institution.rows_for(self.inst_labels.get_indexer(institutions))] = True
+            _and(m)
+        return mask
+
+    def _codes(self, dimension: str, mask):
+        """(codes, labels) of one dimension for the rows in mask; pair dimensions keep one code per pair."""
+        if dimension == "keywords":
+            codes, labels = self.kw_ids, np.arange(self.n_keywords)
+            return (codes if mask is None else codes[mask[self.kw_rows]]), labels
+        if dimension == "institutions":
+            codes = self.inst_codes if mask is None else self.inst_codes[mask[self.inst_rows]]
+            return codes, self.inst_labels
+        if dimension == "sources":
+            codes = self.source if mask is None else self.source[mask]
+            return codes[codes >= 0], self.source_labels
+        if dimension == "frascati":
+            codes = self.frascati if mask is None else self.frascati[mask]
+            if self.missing_frascati >= 0:
+                codes = codes[codes != self.missing_frascati]
+            return codes, self.frascati_labels
+        raise ValueError(f"Unknown dimension: {dimension}")
+
+    def counts(self, dimension: str, mask, n=None) -> pd.Series:
+        codes, labels = self._codes(dimension, mask)
+        return _top(np.bincount(codes, minlength=len(labels)), labels, n)
+
+    def counts_by_year(self, dimension: str, mask, values) -> pd.DataFrame:
+        """Year, value, count for the given values of a dimension (rows without a year are left out)."""
+        mask = (self.year != MISSING_YEAR) if mask is None else mask & (self.year != MISSING_YEAR)
+        if dimension == "keywords":
+            keep = mask[self.kw_rows]
+            codes, years, labels = self.kw_ids[keep], self.year[self.kw_rows[keep]], np.arange(self.n_keywords)
+        elif dimension == "frascati":
+            codes, years, labels = self.frascati[mask], self.year[mask], self.frascati_labels
+        else:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        wanted = pd.Index(labels).get_indexer(list(values))
+        wanted = wanted[wanted >= 0]
+        position = np.full(len(labels), -1)
+        position[wanted] = np.arange(len(wanted))
+        pos = position[codes]
+        keep = pos >= 0
+        year_values, year_pos = np.unique(years[keep], return_inverse=True)
+        grid = np.bincount(year_pos * len(wanted) + pos[keep], minlength=len(year_values) * len(wanted))
+        grid = grid.reshape(len(year_values), len(wanted))
+        y, v = np.nonzero(grid)
+        return pd.DataFrame({"Year": year_values[y], "value": np.asarray(labels)[wanted[v]], "count": grid[y, v]})
+
+    def institution_frascati(self, mask) -> pd.Series:
+        """Counts per (Institution, Frascati) pair, largest first; rows without a Frascati code are left out."""
+        keep = np.ones(len(self.inst_rows), dtype=bool) if mask is None else mask[self.inst_rows]
+        fr = self.frascati[self.inst_rows[keep]]
+        inst = self.inst_codes[keep]
+        if self.missing_frascati >= 0:
+            inst, fr = inst[fr != self.missing_frascati], fr[fr != self.missing_frascati]
+        n_fr = len(self.frascati_labels)
+        counts = np.bincount(inst.astype(np.int64) * n_fr + fr, minlength=len(self.inst_labels) * n_fr)
+        nonzero = np.flatnonzero(counts)
+        nonzero = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+        index = pd.MultiIndex.from_arrays(
+            [self.inst_labels[nonzero // n_fr], self.frascati_labels[nonzero % n_fr]],
+            names=["Institution", "Frascati"],
+        )
+        return pd.Series(counts[nonzero], index=index, name="count")
@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+import signal
+
+# gunicorn -c gunicorn.conf.py   (run from the Dashboard folder, see serve.py)
+
+wsgi_app = "serve:server"
+bind = os.environ.get("DASH_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("DASH_WORKERS", multiprocessing.cpu_count()))
+preload_app = True  # load the data once in the master, workers share it after the fork
+timeout = 120
+
+
+def when_ready(server):
+    # Only the master watches the data files. It converts and warms a new version once (Parquet,
+    # Arrow files, counts), then a HUP makes gunicorn fork new workers from it and retire the old
+    # ones, so all workers always serve one version from shared memory. Threads don't survive the
+    # fork, so the workers never run a watcher of their own.
+    import serve
+    serve.dashboard.snapshots.start(on_reload=lambda: os.kill(os.getpid(), signal.SIGHUP))
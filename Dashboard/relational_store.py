@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregates import MISSING_FRASCATI, MISSING_YEAR
+from datastore import DataSnapshot, ensure_parquet
+
+# Normalized SQLite copy of the dashboard data, for notebooks and other analytics tools.
+#
+#   articles             (id, guid, title, year, frascati, source)   id = row of the article in data.parquet
+#   institutions         (id, name)
+#   keywords             (id, term)                                   the IDs of keyword_vocab.json
+#   article_institution  (article_id, institution_id)
+#   article_keyword      (article_id, keyword_id)
+#   meta                 (key, value)                                 data version of the build
+#
+# The tables are filled from the columnar snapshot (datastore.py), whose keyword and institution
+# lists are already flattened by pyarrow, so nothing is exploded in pandas. Both link tables are
+# keyed in both directions, so "articles of a keyword" and "keywords of an article" are index
+# lookups. For example, the keywords of one institution per year:
+#
+#   SELECT a.year, k.term, COUNT(*) AS n
+#   FROM institutions i
+#   JOIN article_institution ai ON ai.institution_id = i.id
+#   JOIN articles a ON a.id = ai.article_id
+#   JOIN article_keyword ak ON ak.article_id = a.id
+#   JOIN keywords k ON k.id = ak.keyword_id
+#   WHERE i.name = ? GROUP BY a.year, k.term ORDER BY n DESC
+#
+#   python relational_store.py [data.json] [data.sqlite] [keyword_vocab.json]    # build (if outdated)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE articles (
+    id INTEGER PRIMARY KEY,
+    guid TEXT,
+    title TEXT,
+    year INTEGER,
+    frascati TEXT,
+    source TEXT
+);
+CREATE TABLE institutions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE keywords (id INTEGER PRIMARY KEY, term TEXT NOT NULL);
+CREATE TABLE article_institution (
+    article_id INTEGER NOT NULL REFERENCES articles (id),
+    institution_id INTEGER NOT NULL REFERENCES institutions (id),
+    PRIMARY KEY (article_id, institution_id)
+) WITHOUT ROWID;
+CREATE TABLE article_keyword (
+    article_id INTEGER NOT NULL REFERENCES articles (id),
+    keyword_id INTEGER NOT NULL REFERENCES keywords (id),
+    PRIMARY KEY (article_id, keyword_id)
+) WITHOUT ROWID;
+"""
+
+# created after the tables are filled, which is much faster than keeping them up to date row by row
+INDEXES = """
+CREATE INDEX articles_year ON articles (year);
+CREATE INDEX articles_frascati ON articles (frascati);
+CREATE INDEX articles_source ON articles (source);
+CREATE UNIQUE INDEX article_institution_reverse ON article_institution (institution_id, article_id);
+CREATE UNIQUE INDEX article_keyword_reverse ON article_keyword (keyword_id, article_id);
+"""
+
+
+def _links(rows: np.ndarray, ids: np.ndarray):
+    """Distinct (row, id) pairs, sorted, as Python ints for executemany."""
+    pairs = np.unique(np.column_stack([rows.astype(np.int64), ids.astype(np.int64)]), axis=0)
+    return pairs.tolist()
+
+
+def _nullable(values: list, missing) -> list:
+    return [None if v == missing else v for v in values]
+
+
+def build_store(data: DataSnapshot, db_path: Path) -> dict:
+    """Write the snapshot into a new SQLite file (replacing db_path at the end); returns the table sizes."""
+    db_path = Path(db_path)
+    tmp = db_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp))
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        articles = zip(
+            range(data.num_rows),
+            data.column("GUID").to_pylist(),
+            data.column("Title").to_pylist(),
+            _nullable(data.column("Year").to_pylist(), MISSING_YEAR),
+            _nullable(data.column("Frascati").cast("string").to_pylist(), MISSING_FRASCATI),
+            data.column("Source").cast("string").to_pylist(),
+        )
+        conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?)", articles)
+
+        conn.executemany("INSERT INTO keywords VALUES (?, ?)", enumerate(map(str, data.keyword_terms)))
+        keywords = data.keywords_long
+        conn.executemany("INSERT INTO article_keyword VALUES (?, ?)",
+                         _links(keywords["row"].to_numpy(), keywords["KeywordID"].to_numpy()))
+
+        institutions = data.institutions_long["Institution"]
+        conn.executemany("INSERT INTO institutions VALUES (?, ?)", enumerate(map(str, institutions.cat.categories)))
+        conn.executemany("INSERT INTO article_institution VALUES (?, ?)",
+                         _links(data.institutions_long["row"].to_numpy(), institutions.cat.codes.to_numpy()))
+
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (data.version,))
+        conn.executescript(INDEXES)
+        conn.commit()
+        conn.execute("ANALYZE")
+        sizes = {name: conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                 for name in ("articles", "institutions", "keywords", "article_institution", "article_keyword")}
+    finally:
+        conn.close()
+    tmp.replace(db_path)
+    return sizes
+
+
+def store_version(db_path: Path):
+    """Data version the store was built from, or None if there is no (readable) store."""
+    try:
+        with closing(connect(db_path)) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+    except (sqlite3.Error, TypeError):
+        return None
+
+
+def ensure_store(json_path: Path, parquet_path: Path, db_path: Path, vocab_path: Path = None) -> Path:
+    """Build db_path from the data unless it was already built from the current data version."""
+    data = DataSnapshot(ensure_parquet(json_path, parquet_path, vocab_path))
+    if not Path(db_path).exists() or store_version(db_path) != data.version:
+        start = time.perf_counter()
+        sizes = build_store(data, db_path)
+        print(f"Built {db_path} in {time.perf_counter() - start:.1f} s: "
+              + ", ".join(f"{n} {name}" for name, n in sizes.items()))
+    return Path(db_path)
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Read-only connection to the store."""
+    if not Path(db_path).exists():
+        raise FileNotFoundError(db_path)
+    return sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+
+def query(db_path: Path, sql: str, params=()) -> pd.DataFrame:
+    """Run a query on the store and return the result as a DataFrame (e.g. in a notebook)."""
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def main():
+    json_path = Path(sys.argv[1] if len(sys.argv) > 1 else "Data/data.json")
+    db_path = Path(sys.argv[2] if len(sys.argv) > 2 else json_path.with_suffix(".sqlite"))
+    vocab_path = Path(sys.argv[3] if len(sys.argv) > 3 else json_path.with_name("keyword_vocab.json"))
+    ensure_store(json_path, json_path.with_suffix(".parquet"), db_path, vocab_path)
+    print(query(db_path, """
+        SELECT k.term, COUNT(*) AS articles
+        FROM article_keyword ak JOIN keywords k ON k.id = ak.keyword_id
+        GROUP BY k.id ORDER BY articles DESC LIMIT 10
+    """).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
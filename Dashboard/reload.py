@@ -0,0 +1,87 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Hot data reload for the dashboard.
+#
+# SnapshotManager holds the current DataSnapshot. A background thread checks the version stamp
+# of the source files every `interval` seconds; when they change it loads and warms a new
+# snapshot (conversion, frames, cube, filter index) while requests keep being served from the
+# old one, and then swaps the reference in one assignment. A callback pins the snapshot it
+# started with (pin decorator), so a request that is running during the swap finishes on the
+# old data and never mixes the two versions.
+#
+# Under gunicorn only the master process watches the files (gunicorn.conf.py): it converts and
+# warms the new version once and then has gunicorn replace its workers with fresh forks, which
+# share the new data the same way the first workers shared the old one.
+
+
+class SnapshotManager:
+    def __init__(self, load, source_version, interval: float = 30.0):
+        """
+        load: function returning a new DataSnapshot.
+        source_version: function returning the version stamp of the files `load` reads.
+        """
+        self._load = load
+        self._source_version = source_version
+        self.interval = interval
+        self._watched = source_version()
+        self._snapshot = load()
+        self._local = threading.local()
+        self._reload_lock = threading.Lock()
+        self._thread = None
+        self._on_reload = None
+        self.reloads = 0
+
+    def current(self):
+        """The snapshot pinned by the running callback, otherwise the newest one."""
+        return getattr(self._local, "snapshot", None) or self._snapshot
+
+    @contextmanager
+    def pinned(self):
+        outer = getattr(self._local, "snapshot", None)
+        self._local.snapshot = outer or self._snapshot
+        try:
+            yield self._local.snapshot
+        finally:
+            self._local.snapshot = outer
+
+    def pin(self, fn):
+        """Decorator: the whole call sees one snapshot."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.pinned():
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def check(self) -> bool:
+        """Reload if the source files changed; returns True if a new snapshot was swapped in."""
+        with self._reload_lock:
+            watched = self._source_version()
+            if watched == self._watched:
+                return False
+            snapshot = self._load().warm()
+            self._snapshot = snapshot
+            self._watched = watched
+            self.reloads += 1
+            return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self.check():
+                    print(f"Data reloaded, version {self._snapshot.version}")
+                    if self._on_reload is not None:
+                        self._on_reload()
+            except Exception as e:  # keep serving the old data; try again on the next check
+                print(f"Data reload failed: {e}")
+
+    def start(self, on_reload=None):
+        """Start the watcher thread; on_reload() is called after every swap (e.g. to restart server workers)."""
+        self._on_reload = on_reload
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="data-reload", daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,129 @@
+import bisect
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from filters import RowIndex
+
+# Keyword and title search for the dashboard.
+#
+# SearchIndex is an inverted index built once per data snapshot: for every keyword ID and every
+# title word the sorted article rows it occurs in (RowIndex, the same postings layout the filters
+# use). Titles are lower-cased and split into words by pyarrow, without a Python loop per title.
+# Typeahead uses a sorted list of keyword texts (also starting at every word of a keyword, so
+# "learn" finds "machine learning") and title words; a prefix is two binary searches, and the
+# matches are ranked by the number of articles they occur in.
+
+MIN_TITLE_WORD = 3
+TITLE_STOPWORDS = {"the", "and", "for", "with", "from", "into", "its", "their", "ning", "kui", "või", "ehk"}
+
+
+class PrefixIndex:
+    """Sorted texts for prefix lookups, each with an (id, weight)."""
+
+    def __init__(self, texts: list[str], ids: np.ndarray, weights: np.ndarray):
+        order = sorted(range(len(texts)), key=texts.__getitem__)
+        self.texts = [texts[i] for i in order]
+        self.ids = np.asarray(ids)[order]
+        self.weights = np.asarray(weights)[order]
+
+    def lookup(self, prefix: str, limit: int) -> list[tuple[int, int]]:
+        """(id, weight) of the heaviest entries starting with `prefix`, one per id."""
+        if limit <= 0:
+            return []
+        lo = bisect.bisect_left(self.texts, prefix)
+        hi = bisect.bisect_left(self.texts, prefix + "\U0010ffff", lo)
+        if lo == hi:
+            return []
+        weights = self.weights[lo:hi]
+        k = min(len(weights), 4 * limit)  # extra room for ids that match on several words
+        best = np.argpartition(-weights, k - 1)[:k] if k < len(weights) else np.arange(len(weights))
+        best = best[np.argsort(-weights[best], kind="stable")]
+        out, seen = [], set()
+        for i in best:
+            tid = int(self.ids[lo + i])
+            if tid not in seen:
+                seen.add(tid)
+                out.append((tid, int(weights[i])))
+                if len(out) == limit:
+                    break
+        return out
+
+
+def _word_starts(text: str):
+    """The text from each of its words on: "machine learning" -> "machine learning", "learning"."""
+    yield text
+    for i, ch in enumerate(text):
+        if ch == " " and i + 1 < len(text):
+            yield text[i + 1:]
+
+
+class SearchIndex:
+    def __init__(self, data):
+        """`data` is a datastore.DataSnapshot."""
+        self.n_rows = data.num_rows
+
+        # keywords: term ID -> article rows
+        keywords = data.keywords_long
+        terms = data.keyword_terms
+        self.keyword_terms = terms
+        self.keyword_postings = RowIndex(keywords["KeywordID"].to_numpy(), keywords["row"].to_numpy(), len(terms))
+        keyword_df = np.diff(self.keyword_postings.offsets)
+        texts, ids = [], []
+        for tid in np.flatnonzero(keyword_df):
+            for text in _word_starts(str(terms[tid]).casefold()):
+                texts.append(text)
+                ids.append(tid)
+        self.keyword_prefixes = PrefixIndex(texts, np.array(ids, dtype=np.int64), keyword_df[ids])
+
+        # title words: word ID -> article rows
+        titles = pc.utf8_lower(data.column("Title").combine_chunks())
+        words = pc.split_pattern_regex(pc.fill_null(titles, ""), r"[^\w]+")
+        flat = pc.list_flatten(words)
+        rows = pc.list_parent_indices(words).to_numpy()
+        keep = pc.greater_equal(pc.utf8_length(flat), MIN_TITLE_WORD).to_numpy(zero_copy_only=False)
+        encoded = flat.filter(pa.array(keep)).dictionary_encode()
+        vocabulary = encoded.dictionary.to_pylist()
+        codes = encoded.indices.to_numpy().astype(np.int64)
+        rows = rows[keep]
+        # one posting per (word, article), also when a title repeats a word
+        pairs = np.unique(codes * self.n_rows + rows)
+        self.title_words = vocabulary
+        self.title_word_ids = {w: i for i, w in enumerate(vocabulary)}
+        self.title_postings = RowIndex(pairs // self.n_rows, pairs % self.n_rows, len(vocabulary))
+        title_df = np.diff(self.title_postings.offsets)
+        usable = [i for i, w in enumerate(vocabulary) if w not in TITLE_STOPWORDS and not w.isdigit()]
+        self.title_prefixes = PrefixIndex([vocabulary[i] for i in usable], np.array(usable, dtype=np.int64),
+                                          title_df[usable])
+
+    def suggest(self, text: str, limit: int = 10) -> list[dict]:
+        """Typeahead options: keywords first, then title words, each with its number of articles."""
+        prefix = " ".join(str(text).casefold().split())
+        if not prefix:
+            return []
+        options = []
+        for tid, n in self.keyword_prefixes.lookup(prefix, limit):
+            options.append({"label": f"{self.keyword_terms[tid]} (keyword, {n})", "value": f"k:{tid}"})
+        for wid, n in self.title_prefixes.lookup(prefix, max(0, limit - len(options))):
+            word = self.title_words[wid]
+            options.append({"label": f"{word} (in titles, {n})", "value": f"t:{word}"})
+        return options
+
+    def label(self, value: str) -> str:
+        kind, _, key = str(value).partition(":")
+        if kind == "k" and key.isdigit() and int(key) < len(self.keyword_terms):
+            return str(self.keyword_terms[int(key)])
+        return key if kind == "t" else str(value)
+
+    def rows(self, value: str) -> np.ndarray:
+        """
+        Sorted article rows of a typeahead value: "k:<keyword ID>" (IDs are stable across data
+        versions) or "t:<title word>".
+        """
+        kind, _, key = str(value).partition(":")
+        if kind == "k" and key.isdigit():
+            return self.keyword_postings.rows_for([int(key)])
+        if kind == "t" and key in self.title_word_ids:
+            return self.title_postings.rows_for([self.title_word_ids[key]])
+        return np.empty(0, dtype=np.int32)
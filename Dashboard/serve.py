@@ -0,0 +1,30 @@
+import os
+import sys
+
+# Production serving of the dashboard with several worker processes (Linux/macOS):
+#
+#   cd Dashboard
+#   python -m pip install gunicorn
+#   gunicorn -c gunicorn.conf.py
+#
+# gunicorn imports this module once in its master process (preload_app) and then forks the
+# workers. Everything is loaded and built here, before the fork: the frames are memory-mapped
+# Arrow files (datastore.py), so all workers read the same pages of the OS page cache, and the
+# aggregate cube and filter index are numpy arrays that the workers share copy-on-write.
+# Figures are cached on disk as well, so a figure drawn by one worker is reused by the others.
+# New data is loaded by the master as well: it watches the data files (reload.py, started in
+# gunicorn.conf.py's when_ready hook), builds the new version once and then restarts the workers
+# gracefully with a HUP, so they are forked again with the new data.
+#
+# "python serve.py [port]" serves the same app from a single process without the debugger.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DASH_FIGURE_CACHE_DIR", os.path.join("Data", "figure_cache"))
+
+import app as dashboard  # noqa: E402
+
+dashboard.snapshots.current().warm()
+server = dashboard.app.server
+
+if __name__ == "__main__":
+    dashboard.app.run(host="0.0.0.0", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8050, debug=False)
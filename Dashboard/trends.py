@@ -0,0 +1,140 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregates import MISSING_YEAR
+
+# Emerging-topic detection for the dashboard.
+#
+# For every keyword (or Frascati code) the articles are counted into a year x value matrix with
+# one bincount; only the values that occur at all get a column. All statistics are computed on
+# the whole matrix at once, per year:
+#
+#   share     count / number of articles in that year (so a half-finished year is comparable)
+#   expected  mean share over the previous WINDOW years x number of articles in the year
+#   z         (count - expected) / sqrt(expected + SMOOTHING), a Poisson-style z-score
+#   growth    change of the share compared to the year before (smoothed, +1.0 = doubled)
+#   burst     a year with z >= BURST_Z and at least MIN_COUNT articles
+#
+# The table describes the latest year of the data (or of the year filter), sorted by z.
+#
+#   python trends.py [data.parquet] [out.csv] [keywords|frascati]    # export the table
+
+WINDOW = 3
+SMOOTHING = 1.0
+BURST_Z = 2.0
+MIN_COUNT = 5
+COLUMNS = ["value", "year", "count", "previous", "expected", "growth", "z", "total", "bursts", "burst_since"]
+
+
+def year_matrix(years: np.ndarray, codes: np.ndarray, n_values: int):
+    """(year_values, columns, matrix): counts per year (rows) and per value that occurs (columns)."""
+    present = np.flatnonzero(np.bincount(codes, minlength=n_values))
+    position = np.full(n_values, -1, dtype=np.int64)
+    position[present] = np.arange(len(present))
+    year_values, year_pos = np.unique(years, return_inverse=True)
+    matrix = np.bincount(year_pos.astype(np.int64) * len(present) + position[codes],
+                         minlength=len(year_values) * len(present))
+    return year_values, present, matrix.reshape(len(year_values), len(present))
+
+
+def trend_table(matrix: np.ndarray, year_totals: np.ndarray, year_values: np.ndarray, labels,
+                window: int = WINDOW, min_count: int = MIN_COUNT) -> pd.DataFrame:
+    """Trend statistics of the last year for every column of a year x value count matrix."""
+    n_years = len(year_values)
+    if n_years == 0 or matrix.shape[1] == 0:
+        return pd.DataFrame(columns=COLUMNS)
+    counts = matrix.astype(np.float64)
+    totals = np.maximum(year_totals, 1).astype(np.float64)[:, None]
+    shares = counts / totals
+
+    # mean share over (up to) `window` previous years, from a cumulative sum over the years
+    cumulative = np.vstack([np.zeros((1, counts.shape[1])), np.cumsum(shares, axis=0)])
+    t = np.arange(n_years)
+    start = np.maximum(t - window, 0)
+    n_previous = (t - start)[:, None]
+    expected = (cumulative[t] - cumulative[start]) / np.maximum(n_previous, 1) * totals
+    z = np.where(n_previous > 0, (counts - expected) / np.sqrt(expected + SMOOTHING), 0.0)
+
+    bursts = (z >= BURST_Z) & (counts >= min_count)
+    run = np.zeros(counts.shape[1], dtype=np.int64)  # length of the burst that is still going on
+    going = np.ones(counts.shape[1], dtype=bool)
+    for year in range(n_years - 1, -1, -1):
+        going &= bursts[year]
+        run += going
+
+    last = counts[-1]
+    if n_years > 1:
+        previous = counts[-2]
+        growth = (last + SMOOTHING) / (previous * totals[-1, 0] / totals[-2, 0] + SMOOTHING) - 1
+    else:
+        previous = np.zeros_like(last)
+        growth = np.zeros_like(last)
+
+    table = pd.DataFrame({
+        "value": np.asarray(labels),
+        "year": int(year_values[-1]),
+        "count": last.astype(np.int64),
+        "previous": previous.astype(np.int64),
+        "expected": expected[-1].round(1),
+        "growth": growth.round(3),
+        "z": z[-1].round(2),
+        "total": matrix.sum(axis=0),
+        "bursts": bursts.sum(axis=0),
+        "burst_since": np.where(run > 0, year_values[n_years - run.clip(1)], MISSING_YEAR),
+    })
+    return table.sort_values(["z", "count"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+def topic_trends(data, dimension: str, mask=None, window: int = WINDOW) -> pd.DataFrame:
+    """
+    Trend table of every keyword ("keywords") or Frascati code ("frascati") of a
+    datastore.DataSnapshot, for the article rows in `mask` (all rows when None).
+    """
+    index = data.filter_index
+    articles = index.year != MISSING_YEAR
+    if mask is not None:
+        articles &= mask
+    year_values, year_totals = np.unique(index.year[articles], return_counts=True)
+
+    if dimension == "keywords":
+        keep = articles[index.kw_rows]
+        years, codes, n_values = index.year[index.kw_rows[keep]], index.kw_ids[keep], len(data.keyword_terms)
+        labels = data.keyword_terms
+    elif dimension == "frascati":
+        keep = articles
+        if index.missing_frascati >= 0:
+            keep = keep & (index.frascati != index.missing_frascati)
+        years, codes, n_values = index.year[keep], index.frascati[keep].astype(np.int64), len(index.frascati_labels)
+        labels = index.frascati_labels
+    else:
+        raise ValueError(f"Unknown dimension: {dimension}")
+
+    matrix_years, columns, matrix = year_matrix(years, codes, n_values)
+    # years in which articles exist but none of them has a value still count as zero rows
+    full = np.zeros((len(year_values), len(columns)), dtype=matrix.dtype)
+    full[np.searchsorted(year_values, matrix_years)] = matrix
+    return trend_table(full, year_totals, year_values, np.asarray(labels)[columns], window)
+
+
+def rising(table: pd.DataFrame, n: int = 15, min_count: int = MIN_COUNT) -> pd.DataFrame:
+    """The fastest rising values of a trend table: highest z among those with enough articles."""
+    return table[(table["count"] >= min_count) & (table["z"] > 0)].head(n)
+
+
+def main():
+    from datastore import DataSnapshot  # datastore imports this module's neighbours; import here
+
+    parquet_path = Path(sys.argv[1] if len(sys.argv) > 1 else "Data/data.parquet")
+    out_path = Path(sys.argv[2] if len(sys.argv) > 2 else "Data/rising_topics.csv")
+    dimension = sys.argv[3] if len(sys.argv) > 3 else "keywords"
+    table = topic_trends(DataSnapshot(parquet_path), dimension)
+    table.to_csv(out_path, index=False)
+    print(f"{len(table)} {dimension} written to {out_path}; fastest rising:")
+    print(rising(table, 20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
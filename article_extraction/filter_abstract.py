@@ -1,7 +1,15 @@
 import json
+import sys
 from pathlib import Path
 from openai import AzureOpenAI
 
+import prefilter
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for llm_client
+from llm_client import telemetry
+from llm_client.adaptive import format_metrics, run_concurrently
+from llm_client.pool import make_llm
+
 file = open(r"C:\Users\ekkeg\OneDrive - Tartu Ülikool\Dokumendid\OPENAI_API_KEY.txt", "r")
 OPENAI_API_KEY = file.read().strip()
 
@@ -15,6 +23,10 @@ client = AzureOpenAI(
 INPUT_JSONL  = r"article_extraction\ar_clean_rest.jsonl"
 OUTPUT_JSONL = r"article_extraction\articles_filtered.jsonl"
 MODEL_NAME   = "IDS2025-Gross-gpt-4o-mini"
+USE_PREFILTER = True   # decide obvious snippets locally, see prefilter.py
+ENDPOINTS_JSON = "endpoints.json"   # optional list of deployments to spread requests over, see llm_client/pool.py
+
+llm = make_llm(ENDPOINTS_JSON, client, MODEL_NAME)
 
 
 INSTRUCTIONS = """
@@ -48,7 +60,7 @@ Remember: respond ONLY with a JSON object like:
 {{"keep": true, "reason": "..."}} or {{"keep": false, "reason": "..."}}
 """
 
-    completion = client.chat.completions.create(
+    completion = llm.chat(
         model=MODEL_NAME,
         messages=[
             {"role": "system", "content": INSTRUCTIONS},
@@ -66,6 +78,7 @@ Remember: respond ONLY with a JSON object like:
     except json.JSONDecodeError:
         print("Warning: model returned non-JSON, treating as keep=False:")
         print(content)
+        telemetry.record_parse_failure("non-JSON", content)
         return False
 
     keep = bool(data.get("keep", False))
@@ -77,37 +90,66 @@ def main():
     in_path = Path(INPUT_JSONL)
     out_path = Path(OUTPUT_JSONL)
 
+    model = prefilter.load_model(Path(prefilter.MODEL_JSON)) if USE_PREFILTER else None
+    if USE_PREFILTER and model is None:
+        print(f"No prefilter model at {prefilter.MODEL_JSON} (run prefilter.py), sending every snippet to the LLM")
+
     kept = 0
     total = 0
+    decided_locally = 0
+    sent_to_llm = 0
 
     with in_path.open("r", encoding="utf-8") as f_in, \
-         out_path.open("w", encoding="utf-8") as f_out:
-
-        for line in f_in:
-            line = line.strip()
-            if not line:
-                continue
-
-            total += 1
-            obj = json.loads(line)
-            text = obj.get("text", "").strip()
-            if not text:
-                continue
-
-            try:
-                keep = classify_text(text)
-            except Exception as e:
-                print(f"Error on row {total}: {e}")
+         out_path.open("w", encoding="utf-8") as f_out, \
+         Path(prefilter.DECISIONS_JSONL).open("a", encoding="utf-8") as f_log:
+
+        def llm_rows():
+            """Rows the prefilter can't decide; the rest is handled here directly."""
+            nonlocal total, kept, decided_locally
+            for line in f_in:
+                line = line.strip()
+                if not line:
+                    continue
+
+                total += 1
+                obj = json.loads(line)
+                text = obj.get("text", "").strip()
+                if not text:
+                    continue
+
+                keep = prefilter.decide(text, model)
+                if keep is None:
+                    yield obj
+                    continue
+                decided_locally += 1
+                if keep:
+                    f_out.write(json.dumps(obj, ensure_ascii=False) + "\n")
+                    kept += 1
+
+        def classify_row(obj):
+            telemetry.set_article(obj.get("id"))
+            return classify_text(obj["text"].strip())
+
+        for obj, keep in run_concurrently(classify_row, llm_rows()):
+            if isinstance(keep, Exception):
+                print(f"Error on id {obj.get('id')}: {keep}")
                 continue
+            sent_to_llm += 1
+            # only LLM decisions are logged, they are the training data for prefilter.py
+            f_log.write(json.dumps({"id": obj.get("id"), "keep": keep}) + "\n")
 
             if keep:
                 f_out.write(json.dumps(obj, ensure_ascii=False) + "\n")
                 kept += 1
 
-            if total % 50 == 0:
-                print(f"Processed {total} rows, kept {kept}")
+            if sent_to_llm % 50 == 0:
+                print(f"Processed {total} rows, kept {kept}, decided locally {decided_locally}")
+                print(f"  {format_metrics(llm.metrics())}")
 
+    decided = decided_locally + sent_to_llm
     print(f"Done. Total rows: {total}, kept: {kept}")
+    if decided:
+        print(f"Decided locally: {decided_locally} ({100 * decided_locally / decided:.1f}%), sent to LLM: {sent_to_llm}")
     print(f"Filtered file written to: {out_path}")
 
 
@@ -0,0 +1,234 @@
+import json
+import math
+import random
+import re
+from pathlib import Path
+
+# CONFIG
+INPUT_JSONL     = r"article_extraction\ar_clean_rest.jsonl"      # snippets that were sent to the LLM filter
+KEPT_JSONL      = r"article_extraction\articles_filtered.jsonl"  # snippets the LLM kept
+DECISIONS_JSONL = r"article_extraction\llm_decisions.jsonl"      # keep/reject decisions logged by filter_abstract.py
+MODEL_JSON      = r"article_extraction\prefilter_model.json"
+
+ACCEPT_THRESHOLD = 0.9   # score >= this -> keep without asking the LLM
+REJECT_THRESHOLD = 0.1   # score <= this -> reject without asking the LLM
+HOLDOUT_FRACTION = 0.2
+
+BOILERPLATE_PATTERNS = [
+    r"©", r"\bcopyright\b", r"all rights reserved", r"\bissn\b", r"\bisbn\b",
+    r"table of contents", r"\bcontents\b", r"\breferences\b", r"\bbibliography\b",
+    r"\bdoi\b", r"\bet al\.", r"\bvol\.", r"\bpp\.", r"\bpublished by\b",
+    r"\bsisukord\b", r"\bkasutatud kirjandus\b", r"\bautoriõigus\b",
+]
+ABSTRACT_CUES = [
+    r"\babstract\b", r"\bwe\b", r"\bthis (study|paper|article|thesis)\b", r"\bresults?\b",
+    r"\bmethods?\b", r"\baim\b", r"\bfindings\b", r"\bpurpose\b", r"\bconclu",
+    r"\bkokkuvõte\b", r"\buuring", r"\bartikli", r"\beesmärk", r"\btulemus",
+]
+_BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS), flags=re.IGNORECASE)
+_ABSTRACT_RE = re.compile("|".join(ABSTRACT_CUES), flags=re.IGNORECASE)
+_REFERENCE_LINE_RE = re.compile(r"^\s*(\[\d+\]|\d+\.\s+[A-ZÄÖÜÕ][a-zäöüõ]+,|.*\(\d{4}\)[.,])")
+
+FEATURE_NAMES = [
+    "log_words", "sentences_per_100_words", "mean_sentence_words",
+    "boilerplate_per_100_words", "abstract_cues_per_100_words", "reference_line_ratio",
+    "short_line_ratio", "dot_leader_ratio", "digit_ratio", "upper_ratio", "alpha_ratio",
+]
+
+def extract_features(text: str) -> list[float]:
+    """Cheap surface features that separate abstracts from metadata, TOCs and reference lists."""
+    words = text.split()
+    n_words = max(len(words), 1)
+    n_chars = max(len(text), 1)
+    lines = [l for l in text.splitlines() if l.strip()] or [text]
+
+    sentences = [s for s in re.split(r"[.!?]+(?:\s|$)", text) if len(s.split()) >= 3]
+    mean_sentence = (sum(len(s.split()) for s in sentences) / len(sentences)) if sentences else 0.0
+
+    return [
+        math.log1p(len(words)),
+        100.0 * len(sentences) / n_words,
+        min(mean_sentence, 60.0),
+        100.0 * len(_BOILERPLATE_RE.findall(text)) / n_words,
+        100.0 * len(_ABSTRACT_RE.findall(text)) / n_words,
+        sum(1 for l in lines if _REFERENCE_LINE_RE.match(l)) / len(lines),
+        sum(1 for l in lines if len(l.split()) <= 3) / len(lines),
+        sum(1 for l in lines if "....." in l or "…" in l) / len(lines),
+        sum(c.isdigit() for c in text) / n_chars,
+        sum(c.isupper() for c in text) / n_chars,
+        sum(c.isalpha() for c in text) / n_chars,
+    ]
+
+
+def _sigmoid(x: float) -> float:
+    if x < -30:
+        return 0.0
+    if x > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+def score(text: str, model: dict) -> float:
+    """Probability-like score that the LLM would keep this snippet."""
+    feats = extract_features(text)
+    z = model["bias"]
+    for x, m, s, w in zip(feats, model["mean"], model["std"], model["weights"]):
+        z += w * (x - m) / s
+    return _sigmoid(z)
+
+
+def decide(text: str,
+           model: dict = None,
+           accept: float = ACCEPT_THRESHOLD,
+           reject: float = REJECT_THRESHOLD):
+    """
+    Return True/False when the local score is confident enough,
+    or None when the snippet falls in the uncertain band and should go to the LLM.
+    Without a trained model (model is None) nothing is decided locally.
+    """
+    if model is None:
+        return None
+    if not text or len(text.split()) < 4:
+        return False
+    p = score(text, model)
+    if p >= accept:
+        return True
+    if p <= reject:
+        return False
+    return None
+
+
+def train_model(texts: list[str], labels: list[bool],
+                epochs: int = 300, lr: float = 0.1, l2: float = 1e-3) -> dict:
+    """Fit a logistic regression on standardised features with plain batch gradient descent."""
+    X = [extract_features(t) for t in texts]
+    y = [1.0 if l else 0.0 for l in labels]
+    n, d = len(X), len(FEATURE_NAMES)
+    if n == 0:
+        raise ValueError("No LLM decisions to train on")
+
+    mean = [sum(row[j] for row in X) / n for j in range(d)]
+    std = []
+    for j in range(d):
+        var = sum((row[j] - mean[j]) ** 2 for row in X) / n
+        std.append(math.sqrt(var) or 1.0)
+    Z = [[(row[j] - mean[j]) / std[j] for j in range(d)] for row in X]
+
+    w = [0.0] * d
+    b = 0.0
+    for _ in range(epochs):
+        grad_w = [0.0] * d
+        grad_b = 0.0
+        for row, target in zip(Z, y):
+            err = _sigmoid(b + sum(wj * xj for wj, xj in zip(w, row))) - target
+            grad_b += err
+            for j in range(d):
+                grad_w[j] += err * row[j]
+        b -= lr * grad_b / n
+        w = [wj - lr * (gj / n + l2 * wj) for wj, gj in zip(w, grad_w)]
+
+    return {"mean": mean, "std": std, "weights": w, "bias": b}
+
+
+def load_model(path: Path):
+    """The trained model, or None if none has been trained yet (then everything goes to the LLM)."""
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_model(model: dict, path: Path):
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(model, f, indent=2)
+
+
+def load_training_data(input_path: Path, kept_path: Path, decisions_path: Path):
+    """
+    Past LLM decisions as (texts, labels).
+
+    Prefers the decision log written by filter_abstract.py, because once the prefilter is in use
+    the kept file also contains locally accepted snippets. Falls back to input vs. kept files.
+    """
+    texts_by_id = {}
+    with input_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            text = obj.get("text", "").strip()
+            if text:
+                texts_by_id[obj.get("id")] = text
+
+    decisions = {}
+    if decisions_path.exists():
+        with decisions_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    obj = json.loads(line)
+                    decisions[obj["id"]] = bool(obj["keep"])
+    else:
+        kept_ids = set()
+        with kept_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    kept_ids.add(json.loads(line).get("id"))
+        decisions = {doc_id: doc_id in kept_ids for doc_id in texts_by_id}
+
+    texts, labels = [], []
+    for doc_id, keep in decisions.items():
+        if doc_id in texts_by_id:
+            texts.append(texts_by_id[doc_id])
+            labels.append(keep)
+    return texts, labels
+
+
+def evaluate(model: dict, texts: list[str], labels: list[bool],
+             accept: float = ACCEPT_THRESHOLD, reject: float = REJECT_THRESHOLD) -> dict:
+    """How much a threshold pair decides locally, and how often those decisions match the LLM."""
+    decided = agreed = 0
+    for text, label in zip(texts, labels):
+        local = decide(text, model, accept, reject)
+        if local is None:
+            continue
+        decided += 1
+        agreed += local == label
+    total = len(texts)
+    return {
+        "accept": accept,
+        "reject": reject,
+        "total": total,
+        "decided_locally": decided,
+        "local_fraction": decided / total if total else 0.0,
+        "agreement": agreed / decided if decided else 0.0,
+    }
+
+
+def main():
+    texts, labels = load_training_data(Path(INPUT_JSONL), Path(KEPT_JSONL), Path(DECISIONS_JSONL))
+    print(f"Loaded {len(texts)} past LLM decisions ({sum(labels)} kept)")
+
+    rows = list(zip(texts, labels))
+    random.Random(0).shuffle(rows)
+    n_holdout = int(len(rows) * HOLDOUT_FRACTION)
+    holdout, train = rows[:n_holdout], rows[n_holdout:]
+
+    model = train_model([t for t, _ in train], [l for _, l in train])
+    hold_texts = [t for t, _ in holdout]
+    hold_labels = [l for _, l in holdout]
+
+    print("Held-out results (LLM decisions are ground truth):")
+    print(f"{'accept':>7} {'reject':>7} {'local %':>8} {'agree %':>8}")
+    for accept, reject in [(0.95, 0.05), (0.9, 0.1), (0.8, 0.2), (0.7, 0.3)]:
+        r = evaluate(model, hold_texts, hold_labels, accept, reject)
+        print(f"{accept:>7.2f} {reject:>7.2f} {100 * r['local_fraction']:>7.1f}% {100 * r['agreement']:>7.1f}%")
+
+    save_model(model, Path(MODEL_JSON))
+    print(f"Model written to: {MODEL_JSON}")
+
+
+if __name__ == "__main__":
+    main()
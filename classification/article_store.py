@@ -0,0 +1,148 @@
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# libraries needed: python -m pip install pyarrow
+#
+# The labeling scripts only need a handful of text fields per article. The input JSON is
+# converted once into a Parquet file (one string column per field, zstd compressed), and
+# afterwards articles are read lazily in record batches with only the requested columns.
+# The Parquet file sits next to its input (etis.json -> etis.parquet) and records which file it
+# was made from, so a script with a different input never reads another script's conversion.
+
+ROW_GROUP_SIZE = 10000
+BATCH_SIZE = 2048
+
+
+def _cell(value):
+    """Store falsy values as null and everything else as a string (non-strings as JSON)."""
+    if value is None or value == "" or value == [] or value == {}:
+        return None
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _columns_from_json(data) -> tuple[list, dict]:
+    """Return (guids, {field: [value per guid]}) for a list of records, {guid: fields} or columnar {field: {guid: value}}."""
+    if isinstance(data, dict) and all(isinstance(v, dict) for v in data.values()):
+        # columnar { field: { guid: value } } - read column by column, never as row dicts
+        guids = {}
+        for guid_map in data.values():
+            for guid in guid_map:
+                guids.setdefault(guid, len(guids))
+        columns = {}
+        for field_name, guid_map in data.items():
+            col = [None] * len(guids)
+            for guid, value in guid_map.items():
+                col[guids[guid]] = _cell(value)
+            columns[field_name] = col
+        return list(guids), columns
+
+    if isinstance(data, dict):
+        rows = [dict(fields, GUID=guid) if isinstance(fields, dict) else {"GUID": guid}
+                for guid, fields in data.items()]
+    elif isinstance(data, list):
+        rows = data
+    else:
+        raise ValueError("Unsupported JSON format")
+
+    guids = [r.get("GUID") or r.get("guid") or r.get("Guid") for r in rows]
+    columns = {}
+    for i, row in enumerate(rows):
+        for field_name, value in row.items():
+            if field_name in ("GUID", "guid"):
+                continue
+            if field_name not in columns:
+                columns[field_name] = [None] * len(rows)
+            columns[field_name][i] = _cell(value)
+    return guids, columns
+
+
+def convert_to_parquet(json_path: Path, parquet_path: Path, fields: list[str] = None):
+    """One-time conversion of the article JSON into a Parquet file (optionally only some fields)."""
+    with Path(json_path).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    guids, columns = _columns_from_json(data)
+    del data
+
+    if fields is not None:
+        columns = {k: v for k, v in columns.items() if k in fields}
+    table = pa.table(
+        {"GUID": pa.array([str(g) if g is not None else None for g in guids], type=pa.string()),
+         **{name: pa.array(col, type=pa.string()) for name, col in columns.items()}}
+    )
+    table = table.replace_schema_metadata({"source": json.dumps(_source_stamp(json_path))})
+    tmp = Path(parquet_path).with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    tmp.replace(parquet_path)
+    print(f"Converted {table.num_rows} articles ({table.num_columns} columns) to {parquet_path}")
+
+
+def parquet_path_for(json_path: Path) -> Path:
+    return Path(json_path).with_suffix(".parquet")
+
+
+def _source_stamp(json_path: Path) -> dict:
+    st = Path(json_path).stat()
+    return {"path": str(Path(json_path).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _converted_from(parquet_path: Path):
+    """The source stamp stored in a Parquet file by convert_to_parquet (None for older files)."""
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    try:
+        return json.loads(metadata[b"source"])
+    except (KeyError, ValueError):
+        return None
+
+
+def ensure_parquet(json_path: Path, parquet_path: Path = None) -> Path:
+    """
+    Convert json_path to parquet_path (default: next to it) unless a conversion of exactly this
+    file (same path, size and modification time) already exists.
+    """
+    json_path = Path(json_path)
+    parquet_path = Path(parquet_path) if parquet_path else parquet_path_for(json_path)
+    if parquet_path.exists() and (not json_path.exists()
+                                  or _converted_from(parquet_path) == _source_stamp(json_path)):
+        return parquet_path
+    convert_to_parquet(json_path, parquet_path)
+    return parquet_path
+
+
+def count_articles(parquet_path: Path) -> int:
+    return pq.ParquetFile(parquet_path).metadata.num_rows
+
+
+def _project(parquet_file: pq.ParquetFile, fields) -> list[str]:
+    names = parquet_file.schema_arrow.names
+    if fields is None:
+        return names
+    return ["GUID"] + [f for f in fields if f in names and f != "GUID"]
+
+
+def iter_articles(parquet_path: Path, fields: list[str] = None, batch_size: int = BATCH_SIZE):
+    """
+    Yield articles one at a time as {"GUID": ..., field: value} dicts, reading only `fields`.
+    Null fields are left out of the dict, like missing keys in the original JSON.
+    """
+    pf = pq.ParquetFile(parquet_path)
+    for batch in pf.iter_batches(batch_size=batch_size, columns=_project(pf, fields)):
+        for row in batch.to_pylist():
+            yield {k: v for k, v in row.items() if v is not None}
+
+
+def read_guids(parquet_path: Path) -> list[str]:
+    """All GUIDs in file order, reading only the GUID column."""
+    return pq.read_table(parquet_path, columns=["GUID"]).column("GUID").to_pylist()
+
+
+def read_articles(parquet_path: Path, guids: list[str], fields: list[str] = None) -> list[dict]:
+    """Fetch the given GUIDs only (filter pushed down to the Parquet reader)."""
+    pf = pq.ParquetFile(parquet_path)
+    table = pq.read_table(parquet_path, columns=_project(pf, fields), filters=[("GUID", "in", list(guids))])
+    return [{k: v for k, v in row.items() if v is not None} for row in table.to_pylist()]
@@ -0,0 +1,180 @@
+import json
+from pathlib import Path
+
+import labeler
+import frascati
+from labeler import build_article_context, open_results_store, parse_keywords, stream_articles
+from frascati import parse_frascati_code
+from keyword_vocab import update_vocab
+from llm_client import telemetry
+from llm_client.adaptive import format_metrics, run_concurrently
+
+# One request per article that returns both the keywords and the Frascati code.
+# Uses the endpoint pool of llm_setup.py, like labeler.py and frascati.py; results go to the same stores as
+# labeler.py and frascati.py, so the three scripts can be mixed freely.
+
+
+INSTRUCTIONS = labeler.KEYWORD_GUIDELINES + """
+Additionally, assign the article to exactly one Frascati Fields of Science and Technology (FOS) category:
+- Choose one code only, the most dominant field, from the list below.
+- If multiple fields appear, select the field most central to the research question or methodology.
+- Never invent codes beyond the list.
+""" + frascati.FRASCATI_LIST + """
+Output format (VERY IMPORTANT):
+- Respond with ONLY a single JSON object, no extra explanations.
+- The JSON MUST have exactly two keys:
+  - "keyword": a list of 1-3 keyword strings
+  - "frascati": the category code as a string, e.g. "1.2"
+
+Example valid response:
+{"keyword": ["electric vehicles", "transportation"], "frascati": "2.2"}
+"""
+
+
+def call_combined_model(context: str) -> tuple[list[str], str]:
+    """
+    Ask for keywords and the Frascati code in one request.
+    Returns (keywords, code); a part that is missing or malformed comes back as [] / "".
+    """
+    if not context:
+        return [], ""
+
+    prompt = f"""Below is information about a scientific article.
+Use it to generate subject keywords and the Frascati category following the instructions.
+
+ARTICLE INFORMATION:
+{context}
+
+Remember: respond ONLY with a JSON object of the form:
+{{"keyword": ["kw1", "kw2", "..."], "frascati": "x.y"}}
+"""
+
+    completion = labeler.llm.chat(
+        model=labeler.MODEL_NAME,
+        messages=[
+            {"role": "system", "content": INSTRUCTIONS},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.1,
+        max_tokens=256,
+        response_format={"type": "json_object"},
+    )
+
+    content = completion.choices[0].message.content.strip()
+
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        print("Warning: model returned non-JSON, falling back to separate calls:")
+        print(content)
+        telemetry.record_parse_failure("combined: non-JSON", content)
+        return [], ""
+    if not isinstance(data, dict):
+        telemetry.record_parse_failure("combined: non-JSON", content)
+        return [], ""
+
+    keywords = parse_keywords(data)
+    code = parse_frascati_code(str(data.get("frascati", "")))
+    if not keywords:
+        telemetry.record_parse_failure("combined: no keywords", content)
+    if not code:
+        telemetry.record_parse_failure("combined: code not in CODES", content)
+    return keywords, code
+
+
+def label_article(context: str, need_keywords: bool = True, need_frascati: bool = True):
+    """
+    Label one article, using the combined call when both parts are needed.
+    Each part that the combined call got wrong is redone with its own single-task call.
+    Returns (keywords, code, number_of_requests).
+    """
+    keywords, code = [], ""
+    requests = 0
+    if need_keywords and need_frascati:
+        keywords, code = call_combined_model(context)
+        requests += 1
+    if need_keywords and not keywords:
+        keywords = labeler.call_keyword_model(context)
+        requests += 1
+    if need_frascati and not code:
+        code = frascati.call_frascati_model(context)
+        requests += 1
+    return keywords, code, requests
+
+
+def process_article(article: dict, kw_store, fr_store, need_keywords: bool = None, need_frascati: bool = None) -> int:
+    """
+    Fill in whatever is still missing for this article in the two stores. Returns the number of requests.
+    need_keywords / need_frascati default to "not in the store" (scheduler.py passes them, since
+    its worker stores only hold that worker's labels).
+    """
+    guid = article.get("GUID") or article.get("guid")
+    telemetry.set_article(guid)
+    if need_keywords is None:
+        need_keywords = guid not in kw_store
+    if need_frascati is None:
+        need_frascati = guid not in fr_store
+
+    context = build_article_context(article)
+    if not context:
+        print(f"[GUID={guid}] No usable fields, skipping.")
+        if need_keywords:
+            kw_store.add(guid, [])
+        return 0
+
+    try:
+        keywords, code, n = label_article(context, need_keywords, need_frascati)
+    except Exception as e:
+        print(f"Error on GUID={guid}: {e}")
+        return 0
+
+    if keywords:
+        kw_store.add(guid, keywords)
+    if code:
+        fr_store.add(guid, code)
+    return n
+
+
+def main():
+    in_path = Path(labeler.INPUT_JSON)
+    kw_out = Path(labeler.OUTPUT_JSON)
+    fr_out = Path(frascati.OUTPUT_JSON)
+
+    n_articles, articles = stream_articles(in_path)
+    print(f"Found {n_articles} articles in {in_path}")
+
+    kw_store = open_results_store(Path(labeler.RESULTS_JSONL), kw_out, "keywords")
+    fr_store = open_results_store(Path(frascati.RESULTS_JSONL), fr_out, "frascati")
+
+    processed = 0
+    requests = 0
+    fallbacks = 0
+    def todo():
+        for article in articles:
+            guid = article.get("GUID") or article.get("guid")
+            if guid in kw_store and guid in fr_store:
+                continue
+            yield article, guid not in kw_store and guid not in fr_store
+
+    for (article, both_needed), n in run_concurrently(lambda t: process_article(t[0], kw_store, fr_store), todo()):
+        processed += 1
+        requests += n
+        if both_needed and n > 1:
+            fallbacks += 1
+
+        if processed % 20 == 0:
+            print(f"Processed {processed} articles, {requests} requests, {fallbacks} with fallbacks. "
+                  f"{format_metrics(labeler.llm.metrics())}")
+
+    kw_store.export_keywords(kw_out, update_vocab(kw_store))
+    fr_store.export_frascati(fr_out)
+    kw_store.close()
+    fr_store.close()
+
+    print(f"Done. Processed {processed} articles with {requests} requests ({fallbacks} needed a fallback call).")
+    print(f"Keyword file written to: {kw_out}")
+    print(f"Frascati file written to: {fr_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import re
+import sys
+from itertools import islice
+from pathlib import Path
+
+# Helpers that keep the prompts of labeler.py / frascati.py / combined.py small:
+# token counting with a local tokenizer, boilerplate stripping and detection of an
+# Estonian/English abstract pair that says the same thing.
+#
+# Run this file to compare the average prompt size with and without compression:
+#   python context_compression.py [number of articles]
+
+TOKENIZER_ENCODING = "o200k_base"   # gpt-4o / gpt-4o-mini
+REPORT_SAMPLE = 2000
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """tiktoken encoding, or None if tiktoken (or its encoding file) isn't available."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"tiktoken not available ({e}), estimating token counts")
+            _encoding = None
+    return _encoding
+
+
+_APPROX_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # roughly what BPE does with mixed English/Estonian text: ~4 characters per token
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    text = text.strip()
+    if max_tokens <= 0:
+        return ""
+    enc = _get_encoding()
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        if len(ids) <= max_tokens:
+            return text
+        return enc.decode(ids[:max_tokens]) + "..."
+    pieces = list(islice(_APPROX_TOKEN_RE.finditer(text), max_tokens + 1))
+    if len(pieces) <= max_tokens:
+        return text
+    end = pieces[max_tokens - 1].end()
+    end += len(re.match(r"\w*", text[end:]).group())   # don't cut inside a word
+    return text[:end] + "..."
+
+
+_BOILERPLATE_RE = re.compile(
+    r"©|\bcopyright\b|all rights reserved|\bpublished by\b|\blicen[cs]ed under\b|creative commons|"
+    r"\bissn\b|\bisbn\b|^\s*(doi|https?://)\S*|\bautoriõigus\b|kõik õigused kaitstud",
+    flags=re.IGNORECASE,
+)
+_REFERENCES_HEADING_RE = re.compile(
+    r"\n\s*(references|bibliography|literature cited|kasutatud kirjandus|viited)\s*:?\s*\n.*",
+    flags=re.IGNORECASE | re.DOTALL,
+)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+_REFERENCE_FRAGMENT_RE = re.compile(
+    r"^\s*(\[\d+\]|\d+\.)\s+[A-ZÄÖÜÕŠŽ][\w'-]+,\s+[A-Z]\..*\(?\d{4}\)?", flags=re.MULTILINE
+)
+
+
+def strip_boilerplate(text: str) -> str:
+    """Drop copyright/licence/ISSN sentences, a trailing reference list and loose reference entries."""
+    text = _REFERENCES_HEADING_RE.sub("", "\n" + text).strip()
+    lines = []
+    for line in text.splitlines():
+        if _REFERENCE_FRAGMENT_RE.match(line):
+            continue
+        # boilerplate is often glued to the end of the abstract, so drop it sentence by sentence
+        sentences = [sent for sent in _SENTENCE_SPLIT_RE.split(line) if not _BOILERPLATE_RE.search(sent)]
+        if sentences or not line.strip():
+            lines.append(" ".join(sentences))
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+_ANCHOR_RE = re.compile(r"\b(\d+(?:[.,]\d+)?%?|[A-Z]{2,}[\w-]*|[A-Z][a-z]+[A-Z]\w*)\b")
+
+
+def _anchors(text: str) -> set[str]:
+    """Numbers, acronyms and CamelCase names - they survive translation unchanged."""
+    return {a.replace(",", ".") for a in _ANCHOR_RE.findall(text)}
+
+
+def abstracts_overlap(first: str, second: str) -> bool:
+    """
+    True if `second` looks like a translation of `first` (or adds little to it).
+    Translations are about the same length and share their numbers, acronyms and names;
+    a second abstract that is much longer than the first is assumed to add content.
+    """
+    n1, n2 = count_tokens(first), count_tokens(second)
+    if n1 == 0 or n2 == 0:
+        return False
+    if n2 > 2 * n1:
+        return False
+    a1, a2 = _anchors(first), _anchors(second)
+    if a1 and a2:
+        return len(a1 & a2) / len(a1 | a2) >= 0.3
+    return n2 <= 1.5 * n1
+
+
+def main():
+    import labeler
+
+    sample = int(sys.argv[1]) if len(sys.argv) > 1 else REPORT_SAMPLE
+    _, articles = labeler.stream_articles(Path(labeler.INPUT_JSON))
+
+    n = before = after = 0
+    for article in islice(articles, sample):
+        plain = labeler.build_article_context(article, compress=False)
+        if not plain:
+            continue
+        n += 1
+        before += count_tokens(plain)
+        after += count_tokens(labeler.build_article_context(article))
+
+    if n == 0:
+        print("No articles with context")
+        return
+    print(f"Articles: {n}")
+    print(f"Average context tokens without compression: {before / n:.1f}")
+    print(f"Average context tokens with compression   : {after / n:.1f}")
+    print(f"Saved: {100 * (before - after) / before:.1f}% of context tokens")
+
+
+if __name__ == "__main__":
+    main()
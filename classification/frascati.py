@@ -1,121 +1,13 @@
-from labeler import build_article_context, load_articles, save
-import json
+from labeler import build_article_context, open_results_store, stream_articles
+from results_store import ResultsStore
+from llm_client import telemetry
+from llm_client.adaptive import format_metrics, run_concurrently
+from llm_setup import MODEL_NAME, llm  # the same endpoint pool as labeler.py
+# settings (input/output files, local model, source cache) and the prompt are in frascati_common.py
+from frascati_common import (CODES, FRASCATI_LIST, INPUT_JSON, INSTRUCTIONS, LOCAL_LABELS_JSONL, LOCAL_MODEL,
+                             OUTPUT_JSON, RESULTS_JSONL, USE_LOCAL_MODEL, USE_SOURCE_CACHE)
 
 from pathlib import Path
-from openai import OpenAI, AzureOpenAI
-import atexit
-
-
-INPUT_JSON = "" # data file from s
-OUTPUT_JSON = ""
-
-OPENAI_API_KEY = ""
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-
-MODEL_NAME  = "gpt-4o-mini"
-
-
-
-INSTRUCTIONS = """
-            You are an expert classifier trained to assign research publications to the correct Frascati category
-            Frascati Fields of Science and Technology (FOS) category.
-            Task Requirements
-
-Input: You will receive any combination of:
-
-Title
-Abstract
-Keywords
-Article body text
-Author-assigned classifications
-Journal scope
-
-Output the the categorization number only, no text or other outputs is allowed.
-
-Rules:
-Choose one code only — the most dominant field.
-If multiple fields appear, select the field most central to the research question or methodology.
-If uncertain, choose the closest higher-level match rather than guessing.
-Never invent codes beyond the official FOS list.
-Do not output explanations unless explicitly asked.
-Behavior:
-    - Be strict, consistent, and deterministic.
-    - Resolve ambiguity in favor of the methodological or disciplinary core.
-    - Ignore journal marketing language; rely on article content.
-            Frascati categorization list:
-            1. Natural Sciences
-                1.1 Mathematics
-                1.2 Computer and information sciences
-                1.3 Physical sciences
-                1.4 Chemical sciences
-                1.5 Earth and related environmental sciences
-                1.6 Biological sciences
-                1.7 Other natural sciences
-            2. Engineering and technology 
-                2.1 Civil engineering
-                2.2 Electrical engineering, electronic engineering, information engineering
-                2.3 Mechanical engineering
-                2.4 Chemical engineering
-                2.5 Materials engineering
-                2.6 Medical engineering
-                2.7 Environmental engineering
-                2.8 Environmental biotechnology
-                2.9 Industrial biotechnology
-                2.10 Nano-technology
-                2.11 Other engineering and technologies
-            3. Medical and health sciences 
-                3.1 Basic medicine
-                3.2 Clinical medicine
-                3.3 Health sciences
-                3.4 Medical biotechnology
-                3.5 Other medical science
-            4. Agricultural and veterinary sciences 
-                4.1 Agriculture, forestry, and fisheries
-                4.2 Animal and dairy science
-                4.3 Veterinary science
-                4.4 Agricultural biotechnology
-                4.5 Other agricultural sciences
-            5. Social Sciences
-                5.1 Psychology and cognitive sciences
-                5.2 Economics and business
-                5.3 Education
-                5.4 Sociology
-                5.5 Law
-                5.6 Political science
-                5.7 Social and economic geography
-                5.8 Media and communications
-                5.9 Other social sciences
-            6. Humanities and the arts 
-                6.1 History and archaeology
-                6.2 Languages and literature
-                6.3 Philosophy, ethics and religion
-                6.4 Arts (arts, history of arts, performing arts, music)
-                6.5 Other humanities
-"""
-CODES = [
-    "1.1","1.2",
-    "1.3", "1.4", "1.5", "1.6", "1.7",
-    "2.1", "2.2","2.3","2.4","2.5","2.6","2.7","2.8","2.9",
-    "2.10","4.1", "4.2", "4.3", "4.4", "4.5",
-    "2.11","3.1","3.3","3.2","3.5","3.4",
-    "5.1","5.2","5.3","5.4","5.5",
-    "5.6","5.7","5.8","5.9","6.1",
-    "6.2","6.3","6.4","6.5"
-]
-
-
-def add_to_old(old:dict, new:dict):
-    old_keys = set(old.keys())
-    new_keys = set(new.keys())
-    diff_guids = new_keys.difference(old_keys) 
-    for guid in diff_guids:
-        old[guid] = new[guid]
-    return old
-
-
 
 
 def call_frascati_model(context: str) -> str:
@@ -124,70 +16,144 @@ def call_frascati_model(context: str) -> str:
 
     prompt = context
 
-    response = client.responses.create(
+    # chat completions rather than the responses API, so Azure deployments can share the load
+    completion = llm.chat(
         model=MODEL_NAME,
-        input=[
+        messages=[
             {"role": "system", "content": INSTRUCTIONS},
             {"role": "user", "content": prompt},
         ],
         temperature=0.1,
-        max_output_tokens=256,
+        max_tokens=256,
     )
 
     
-    content = response.output_text
+    content = completion.choices[0].message.content
+    code = parse_frascati_code(content)
+    if not code:
+        telemetry.record_parse_failure("code not in CODES", content)
+    return code
+
+
+def parse_frascati_code(content) -> str:
+    """Return the code if it is one of CODES, otherwise ""."""
+    if not isinstance(content, str): return ""
+    content = content.strip()
     if content not in CODES: return ""
     return content
 
 
+def process_article(article: dict, store: ResultsStore):
+    """Classify one article and record the code; failed or invalid answers are not recorded."""
+    guid = article.get("GUID") or article.get("guid")
+    telemetry.set_article(guid)
+    context = build_article_context(article)
+    if not context:
+        print(f"[GUID={guid}] No usable fields, skipping.")
+        return
+    try:
+        frascati = call_frascati_model(context)
+    except Exception as e:
+        print(f"Error on GUID={guid}: {e}")
+        frascati = ""
+    if frascati == "": return
+    store.add(guid, frascati)
+
+
+def load_local_model():
+    """The local classifier from local_frascati.py, or None if it hasn't been trained."""
+    if not (USE_LOCAL_MODEL and Path(LOCAL_MODEL).exists()):
+        return None
+    import local_frascati
+    print(f"Using local Frascati model {LOCAL_MODEL} (threshold {local_frascati.CONFIDENCE_THRESHOLD})")
+    return local_frascati.load_model(Path(LOCAL_MODEL))
+
+
+def needs_llm(articles, store: ResultsStore, local_model, stats: dict):
+    """
+    Yield the articles the local model is not confident about. The confident ones are
+    labeled locally, in vectorized batches, and recorded in store; stats["local"] counts them.
+    """
+    if local_model is None:
+        yield from articles
+        return
+    import local_frascati
+    pending = []
+    for article in articles:
+        pending.append(article)
+        if len(pending) >= local_frascati.PREDICT_BATCH:
+            remaining, n = local_frascati.classify_locally(local_model, pending, store)
+            stats["local"] = stats.get("local", 0) + n
+            yield from remaining
+            pending = []
+    remaining, n = local_frascati.classify_locally(local_model, pending, store)
+    stats["local"] = stats.get("local", 0) + n
+    yield from remaining
+
+
+def assign_by_source(articles, store: ResultsStore, sources, stats: dict):
+    """Yield the articles whose Source has no dominant code; the others get that code directly."""
+    if sources is None:
+        yield from articles
+        return
+    import source_cache
+    log = ResultsStore(Path(source_cache.SOURCE_LABELS_JSONL))
+    try:
+        for article in articles:
+            code = sources.lookup(article.get("Source"))
+            if code is None:
+                yield article
+                continue
+            guid = article.get("GUID") or article.get("guid")
+            store.add(guid, code)
+            log.add(guid, code)
+            stats["source"] = stats.get("source", 0) + 1
+    finally:
+        log.close()
+
+
+def prelabel(articles, store: ResultsStore, sources, local_model, stats: dict):
+    """Source cache first, then the local model; yields what is left for the LLM."""
+    return needs_llm(assign_by_source(articles, store, sources, stats), store, local_model, stats)
+
+
 def main():
     in_path = Path(INPUT_JSON)
     out_path = Path(OUTPUT_JSON)
 
-    articles = load_articles(in_path)
-    print(f"Loaded {len(articles)} articles from {in_path}")
+    n_articles, articles = stream_articles(in_path)
+    print(f"Found {n_articles} articles in {in_path}")
 
-    results = {}
-    skip = []
+    store = open_results_store(Path(RESULTS_JSONL), out_path, "frascati")
     processed = 0
-    atexit.register(save, results)
-    for article in articles:
-
-        guid = article.get("GUID") or article.get("guid")
-        if guid in skip:
-            continue
+    stats = {"local": 0, "source": 0}
+    sources = None
+    if USE_SOURCE_CACHE:
+        import source_cache
+        sources = source_cache.load_or_build()
+    todo = (a for a in articles if (a.get("GUID") or a.get("guid")) not in store)
+    todo = prelabel(todo, store, sources, load_local_model(), stats)
+    for article, _ in run_concurrently(lambda a: process_article(a, store), todo):
         processed += 1
-        context = build_article_context(article)
-        if not context:
-            print(f"[GUID={guid}] No usable fields, skipping.")
-            continue
-        try:
-            frascati = call_frascati_model(context)
-        except Exception as e:
-            print(f"Error on GUID={guid}: {e}")
-            frascati
-            frascati = ""
-        if frascati == "": continue
-        results[guid] = frascati
+        code = store.get(article.get("GUID") or article.get("guid"))
+        if sources is not None and code:
+            sources.update(article.get("Source"), code)
 
         if processed % 20 == 0:
-            print(f"Processed {processed} articles.")
-    if out_path.exists():
-        with out_path.open("r", encoding="utf-8") as f:
-            d = json.load(f)
-        results = add_to_old(d, results)
-    with out_path.open("w", encoding="utf-8") as f_out:
-        json.dump(results, f_out, ensure_ascii=False, indent=2)
-
-    print(f"Done. Processed {processed} articles.")
+            print(f"Processed {processed} articles. {format_metrics(llm.metrics())}")
+
+    store.export_frascati(out_path)
+    store.close()
+    if sources is not None:
+        sources.save(Path(source_cache.SOURCE_CACHE_JSON))
+
+    saved = stats["local"] + stats["source"]
+    print(f"Done. Processed {processed} articles with the LLM, {stats['source']} from the source cache, "
+          f"{stats['local']} with the local model.")
+    if processed + saved:
+        print(f"LLM calls saved: {100 * saved / (processed + saved):.1f}%")
     print(f"Frascati file written to: {out_path}")
 
 
-def save(results):
-    path = Path("./emergency_dump_f.json")
-    with path.open("w", encoding="utf-8") as f_out:
-        json.dump(results, f_out, ensure_ascii=False, indent=2)
-
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,103 @@
+# Settings, prompt and code list of the Frascati classification. They live in their own module so
+# that local_frascati.py and source_cache.py can use them without importing frascati.py, which
+# imports those two modules in turn.
+
+INPUT_JSON = "" # data file from s
+OUTPUT_JSON = ""
+RESULTS_JSONL = "frascati_results.jsonl"   # append-only store, OUTPUT_JSON is exported from it
+LOCAL_MODEL = "frascati_local.joblib"      # trained by local_frascati.py; used when the file exists
+LOCAL_LABELS_JSONL = "frascati_local_labels.jsonl"   # GUIDs labeled by the local model, never used for training
+USE_LOCAL_MODEL = True
+USE_SOURCE_CACHE = True                    # reuse the code of single-field journals, see source_cache.py
+
+
+FRASCATI_RULES = """
+            You are an expert classifier trained to assign research publications to the correct Frascati category
+            Frascati Fields of Science and Technology (FOS) category.
+            Task Requirements
+
+Input: You will receive any combination of:
+
+Title
+Abstract
+Keywords
+Article body text
+Author-assigned classifications
+Journal scope
+
+Output the the categorization number only, no text or other outputs is allowed.
+
+Rules:
+Choose one code only — the most dominant field.
+If multiple fields appear, select the field most central to the research question or methodology.
+If uncertain, choose the closest higher-level match rather than guessing.
+Never invent codes beyond the official FOS list.
+Do not output explanations unless explicitly asked.
+Behavior:
+    - Be strict, consistent, and deterministic.
+    - Resolve ambiguity in favor of the methodological or disciplinary core.
+    - Ignore journal marketing language; rely on article content.
+"""
+
+FRASCATI_LIST = """            Frascati categorization list:
+            1. Natural Sciences
+                1.1 Mathematics
+                1.2 Computer and information sciences
+                1.3 Physical sciences
+                1.4 Chemical sciences
+                1.5 Earth and related environmental sciences
+                1.6 Biological sciences
+                1.7 Other natural sciences
+            2. Engineering and technology 
+                2.1 Civil engineering
+                2.2 Electrical engineering, electronic engineering, information engineering
+                2.3 Mechanical engineering
+                2.4 Chemical engineering
+                2.5 Materials engineering
+                2.6 Medical engineering
+                2.7 Environmental engineering
+                2.8 Environmental biotechnology
+                2.9 Industrial biotechnology
+                2.10 Nano-technology
+                2.11 Other engineering and technologies
+            3. Medical and health sciences 
+                3.1 Basic medicine
+                3.2 Clinical medicine
+                3.3 Health sciences
+                3.4 Medical biotechnology
+                3.5 Other medical science
+            4. Agricultural and veterinary sciences 
+                4.1 Agriculture, forestry, and fisheries
+                4.2 Animal and dairy science
+                4.3 Veterinary science
+                4.4 Agricultural biotechnology
+                4.5 Other agricultural sciences
+            5. Social Sciences
+                5.1 Psychology and cognitive sciences
+                5.2 Economics and business
+                5.3 Education
+                5.4 Sociology
+                5.5 Law
+                5.6 Political science
+                5.7 Social and economic geography
+                5.8 Media and communications
+                5.9 Other social sciences
+            6. Humanities and the arts 
+                6.1 History and archaeology
+                6.2 Languages and literature
+                6.3 Philosophy, ethics and religion
+                6.4 Arts (arts, history of arts, performing arts, music)
+                6.5 Other humanities
+"""
+
+INSTRUCTIONS = FRASCATI_RULES + FRASCATI_LIST
+CODES = [
+    "1.1","1.2",
+    "1.3", "1.4", "1.5", "1.6", "1.7",
+    "2.1", "2.2","2.3","2.4","2.5","2.6","2.7","2.8","2.9",
+    "2.10","4.1", "4.2", "4.3", "4.4", "4.5",
+    "2.11","3.1","3.3","3.2","3.5","3.4",
+    "5.1","5.2","5.3","5.4","5.5",
+    "5.6","5.7","5.8","5.9","6.1",
+    "6.2","6.3","6.4","6.5"
+]
@@ -0,0 +1,298 @@
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+# Keyword canonicalization and the interned keyword vocabulary.
+#
+# The model returns free-form keywords, so "machine learning", "Machine Learning" and
+# "machine-learning" would otherwise be counted separately. Every keyword is reduced to a key
+# (case-folded, punctuation and hyphens normalized, English plural of the last word removed),
+# and keys that differ only in word order / filler words, in British vs. American spelling
+# ("behaviour modelling" / "behavior modeling") or by one typo in a long word are merged into one
+# vocabulary entry. Short words are never merged by edit distance: policy/police, lesson/lesion
+# or cancer/canker are different keywords, and neither are words that only differ in an ending
+# (Estonia/Estonian). Each entry has a stable integer ID (its position in "terms"), so the
+# dashboard can aggregate integer arrays instead of strings. IDs never change once assigned;
+# new keywords are appended.
+#
+#   python keyword_vocab.py    # build/extend keyword_vocab.json from keywords_results.jsonl and report
+
+VOCAB_JSON = "keyword_vocab.json"
+RESULTS_JSONL = "keywords_results.jsonl"   # same file as labeler.RESULTS_JSONL
+MIN_EDIT_LENGTH = 10       # a word is only merged with a one-edit typo of it when both are this long
+MIN_SPELLING_LENGTH = 6    # spelling rules are only applied to words of at least this length
+BLOCK_PREFIX = 3           # edit-distance candidates must share this many leading characters
+
+_DASH_RE = re.compile(r"[\-‐-―_/]+")
+_PUNCT_RE = re.compile(r"[^\w\s+#]")
+_SPACE_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+_FILLER_WORDS = {"a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "ja"}
+_NO_PLURAL_ENDINGS = ("ss", "us", "is", "ics", "sis", "ous")
+# words ending in "s" that are not plurals (or whose singular is the same word)
+_NOT_PLURAL = {"gas", "bus", "lens", "news", "mass", "bias", "atlas", "chaos", "ethos", "canvas", "means",
+               "series", "species", "diabetes", "herpes", "rabies", "measles", "mumps", "aids"}
+# British -> American spelling, applied to both sides of a comparison
+_SPELLING_RULES = [
+    (re.compile(r"our$"), "or"),                                  # behaviour, colour
+    (re.compile(r"([iy])s(e|ed|es|ing|ation|ations)$"), r"\1z\2"),  # organise, analyse, optimisation
+    (re.compile(r"([bt])re$"), r"\1er"),                         # centre, fibre
+    (re.compile(r"ll(ed|ing|er)$"), r"l\1"),                     # modelling, labelled
+    (re.compile(r"ogue$"), "og"),                                 # catalogue, analogue
+    (re.compile(r"fence$"), "fense"),                             # defence
+    (re.compile(r"(?<=[^aeiou])[ao]e(?=[^aeiou])"), "e"),         # anaemia, paediatric, oestrogen
+]
+
+
+def _singular(word: str) -> str:
+    """English plural of a single word -> singular; leaves everything that doesn't look like one."""
+    if len(word) < 4 or word in _NOT_PLURAL or not word.isascii() or not word.endswith("s") \
+            or word.endswith(_NO_PLURAL_ENDINGS):
+        return word
+    if len(word) == 4 and word[-2] in "aeiouy":
+        return word   # "goes", "ties", "toys": too short to tell the singular
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def normalize_keyword(keyword) -> str:
+    """The comparison key of a keyword: "Machine-Learning Models" -> "machine learning model"."""
+    text = unicodedata.normalize("NFKC", str(keyword)).casefold()
+    text = _DASH_RE.sub(" ", text)
+    text = _PUNCT_RE.sub("", text)
+    words = _SPACE_RE.sub(" ", text).strip().split(" ")
+    if words and words[-1]:
+        words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def _american(word: str) -> str:
+    if len(word) < MIN_SPELLING_LENGTH or not word.isascii():
+        return word
+    for pattern, replacement in _SPELLING_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def _token_key(key: str) -> str:
+    """
+    Order-, filler- and spelling-insensitive form: "ethics of ai" and "ai ethics" -> "ai ethics",
+    "behaviour modelling" -> "behavior modeling".
+    """
+    return " ".join(sorted(_american(w) for w in key.split(" ") if w not in _FILLER_WORDS))
+
+
+def _as_list(keywords) -> list:
+    """Keyword list of one article; missing values (None, NaN) count as no keywords."""
+    return list(keywords) if isinstance(keywords, (list, tuple)) else []
+
+
+def _within_distance(a: str, b: str, max_dist: int) -> bool:
+    """Levenshtein distance <= max_dist, computed only inside the diagonal band."""
+    if abs(len(a) - len(b)) > max_dist:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [max_dist + 1] * len(b)
+        lo, hi = max(1, i - max_dist), min(len(b), i + max_dist)
+        for j in range(lo, hi + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != b[j - 1]))
+        if min(current) > max_dist:
+            return False
+        previous = current
+    return previous[-1] <= max_dist
+
+
+def _is_typo(a: str, b: str) -> bool:
+    """
+    True if two keys are the same words except for one long word that differs by a single edit
+    inside the word (not an added or removed ending) and has the same numbers.
+    """
+    words_a, words_b = a.split(" "), b.split(" ")
+    if len(words_a) != len(words_b):
+        return False
+    differing = [(x, y) for x, y in zip(words_a, words_b) if x != y]
+    if len(differing) != 1:
+        return False
+    x, y = differing[0]
+    if min(len(x), len(y)) < MIN_EDIT_LENGTH or x.startswith(y) or y.startswith(x):
+        return False
+    # "type 1 diabetes" and "type 2 diabetes" are one edit apart but different things
+    return _DIGITS_RE.findall(x) == _DIGITS_RE.findall(y) and _within_distance(x, y, 1)
+
+
+class KeywordVocab:
+    """
+    Interned keyword vocabulary.
+
+    - terms[i] is the display form of keyword i (the most frequent spelling when it was added).
+    - aliases maps every normalized key seen so far to its ID.
+    - intern(keyword) returns the ID of a keyword, adding a new entry if nothing matches.
+    - lookup(keyword) and ids(keywords) only read the vocabulary; unknown keywords have no ID.
+    """
+
+    def __init__(self):
+        self.terms = []
+        self.counts = []
+        self.aliases = {}
+        self._token_keys = {}   # token key -> id
+        self._blocks = {}       # key prefix -> [(key, id)] of the keys that started an entry
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _match(self, key: str):
+        """ID of an existing entry this key should be merged into, or None."""
+        if key in self.aliases:
+            return self.aliases[key]
+        tid = self._token_keys.get(_token_key(key))
+        if tid is not None:
+            return tid
+        for other, tid in self._blocks.get(key[:BLOCK_PREFIX], ()):
+            if _is_typo(key, other):
+                return tid
+        return None
+
+    def _add_alias(self, key: str, tid: int):
+        self.aliases[key] = tid
+        self._token_keys.setdefault(_token_key(key), tid)
+
+    def _new_term(self, key: str, display: str) -> int:
+        tid = len(self.terms)
+        self.terms.append(display)
+        self.counts.append(0)
+        self._add_alias(key, tid)
+        self._blocks.setdefault(key[:BLOCK_PREFIX], []).append((key, tid))
+        return tid
+
+    def intern(self, keyword, count: int = 1):
+        """ID of `keyword` (None for an empty keyword); unknown keywords become new entries."""
+        display = _SPACE_RE.sub(" ", str(keyword)).strip()
+        key = normalize_keyword(display)
+        if not key:
+            return None
+        tid = self._match(key)
+        if tid is None:
+            tid = self._new_term(key, display)
+        elif key not in self.aliases:
+            self._add_alias(key, tid)
+        self.counts[tid] += count
+        return tid
+
+    def lookup(self, keyword):
+        """ID of `keyword`, or None if it is empty or not in the vocabulary. Never adds an entry."""
+        key = normalize_keyword(_SPACE_RE.sub(" ", str(keyword)).strip())
+        return self._match(key) if key else None
+
+    def ids(self, keywords) -> list[int]:
+        """
+        IDs of an article's keywords, without duplicates, in their original order. Keywords that
+        are not in the vocabulary are left out, so update() the vocabulary with them first.
+        """
+        seen = []
+        for keyword in _as_list(keywords):
+            tid = self.lookup(keyword)
+            if tid is not None and tid not in seen:
+                seen.append(tid)
+        return seen
+
+    def canonical(self, keywords) -> list[str]:
+        return [self.terms[tid] for tid in self.ids(keywords)]
+
+    def update(self, keyword_lists) -> int:
+        """
+        Add the keywords of many articles; returns the number of new entries.
+        Keys are added from the most to the least frequent, so variants merge into the
+        common spelling rather than into whichever one happened to come first.
+        """
+        before = len(self.terms)
+        keys = Counter()
+        spellings = {}
+        for keywords in keyword_lists:
+            for keyword in _as_list(keywords):
+                display = _SPACE_RE.sub(" ", str(keyword)).strip()
+                key = normalize_keyword(display)
+                if key:
+                    keys[key] += 1
+                    spellings.setdefault(key, Counter())[display] += 1
+        for key, n in keys.most_common():
+            self.intern(spellings[key].most_common(1)[0][0], count=n)
+        return len(self.terms) - before
+
+    @classmethod
+    def build(cls, keyword_lists):
+        vocab = cls()
+        vocab.update(keyword_lists)
+        return vocab
+
+    def save(self, path: Path):
+        data = {"terms": self.terms, "counts": self.counts, "aliases": self.aliases}
+        tmp = Path(path).with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        vocab = cls()
+        vocab.terms = list(data["terms"])
+        vocab.counts = list(data.get("counts") or [0] * len(vocab.terms))
+        first_key = {}
+        for key, tid in data["aliases"].items():
+            vocab._add_alias(key, tid)
+            first_key.setdefault(tid, key)
+        # keys saved before a change of normalize_keyword (e.g. "data sets") still find their entry
+        for key, tid in data["aliases"].items():
+            renormalized = normalize_keyword(key)
+            if renormalized and renormalized not in vocab.aliases:
+                vocab._add_alias(renormalized, tid)
+        for tid, key in first_key.items():
+            vocab._blocks.setdefault(key[:BLOCK_PREFIX], []).append((key, tid))
+        return vocab
+
+
+def load_or_create(path: Path = Path(VOCAB_JSON)) -> KeywordVocab:
+    return KeywordVocab.load(path) if Path(path).exists() else KeywordVocab()
+
+
+def update_vocab(store, path: Path = Path(VOCAB_JSON)) -> KeywordVocab:
+    """Extend the saved vocabulary with the keywords in a ResultsStore and save it again."""
+    vocab = load_or_create(path)
+    vocab.counts = [0] * len(vocab)   # the store holds all articles, so count from scratch
+    vocab.update(store.index.values())
+    vocab.save(path)
+    return vocab
+
+
+def main():
+    from results_store import ResultsStore
+
+    store = ResultsStore(Path(RESULTS_JSONL))
+    store.close()
+    raw = {str(k).strip() for kws in store.index.values() for k in kws or []}
+    before = len(load_or_create())
+    vocab = update_vocab(store)
+    added = len(vocab) - before
+
+    print(f"Articles with keywords: {len(store)}")
+    print(f"Distinct raw keywords: {len(raw)}, vocabulary entries: {len(vocab)} ({added} new)")
+    merged = Counter()
+    for key, tid in vocab.aliases.items():
+        merged[tid] += 1
+    print("Entries with the most merged variants:")
+    for tid, n in merged.most_common(int(sys.argv[1]) if len(sys.argv) > 1 else 10):
+        variants = sorted(k for k, t in vocab.aliases.items() if t == tid)
+        print(f"  {vocab.terms[tid]!r}: {', '.join(variants[:6])}")
+    print(f"Vocabulary written to: {VOCAB_JSON}")
+
+
+if __name__ == "__main__":
+    main()
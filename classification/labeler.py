@@ -1,26 +1,26 @@
 import json
 import re
+import sys
 from pathlib import Path
-from openai import AzureOpenAI, OpenAI
-import atexit
 
+from article_store import count_articles, ensure_parquet, iter_articles
+from context_compression import abstracts_overlap, count_tokens, strip_boilerplate, truncate_tokens
+from keyword_vocab import update_vocab
+from llm_setup import MODEL_NAME, llm  # one endpoint pool for all labeling scripts
+from results_store import ResultsStore
 
-OPENAI_API_KEY = ""
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for llm_client
+from llm_client import telemetry
+from llm_client.adaptive import format_metrics, run_concurrently
 
 
-client = AzureOpenAI(
-    
-)
-
-
-
-INPUT_JSON  = "../etis.json"       #main data file
+INPUT_JSON  = "../etis.json"       #main data file; its columnar copy etis.parquet is created next to it on first run
 OUTPUT_JSON = "keywords.json"
-MODEL_NAME  = "IDS2025-Gross-gpt-4o-mini"
+RESULTS_JSONL = "keywords_results.jsonl"   # append-only store, OUTPUT_JSON is exported from it
 
 
 
-INSTRUCTIONS = """
+KEYWORD_GUIDELINES = """
 You are a bibliometrics assistant that generates BROAD subject keywords for scientific research articles.
 
 Goal:
@@ -66,7 +66,9 @@ You will receive a single combined context string that has selected fields accor
 Higher-priority fields are more important. Lower-priority fields are only included when higher-priority
 fields are absent or clearly insufficient.
 
-Output format (VERY IMPORTANT):
+"""
+
+KEYWORD_OUTPUT_FORMAT = """Output format (VERY IMPORTANT):
 - Respond with ONLY a single JSON object, no extra explanations.
 - The JSON MUST have exactly one key "keyword" whose value is a list of 1-3 keyword strings.
 
@@ -75,18 +77,13 @@ Example valid response:
 
 """
 
-
-def truncate(text: str, max_chars: int = 3000) -> str:
-    """Truncate long text to avoid huge prompts."""
-    text = text.strip()
-    if len(text) <= max_chars:
-        return text
-    return text[:max_chars] + "..."
+INSTRUCTIONS = KEYWORD_GUIDELINES + KEYWORD_OUTPUT_FORMAT
 
 
 def build_article_context(article: dict,
-                          min_chars_for_stop: int = 700,
-                          max_chars_total: int = 4000) -> str:
+                          min_tokens_for_stop: int = 175,
+                          max_tokens_total: int = 1000,
+                          compress: bool = True) -> str:
     """
     Build a context string for the article following the priority list.
 
@@ -100,68 +97,76 @@ def build_article_context(article: dict,
 
     Logic:
     - If Text exists -> use Text only (already high-quality).
-    - Otherwise, incrementally add fields in priority order until total length is
-      at least min_chars_for_stop or we run out of fields.
+    - Otherwise, incrementally add fields in priority order until the context has
+      at least min_tokens_for_stop tokens or we run out of fields.
+    - The whole context is kept within max_tokens_total tokens (local tokenizer).
+    - With compress=True, copyright/licence lines and reference fragments are stripped from
+      text and abstracts, and the English abstract is skipped when it is a translation of
+      the Estonian one.
     """
 
+    def clean(value) -> str:
+        value = str(value)
+        return strip_boilerplate(value) if compress else value.strip()
+
     context_parts = []
 
     text_field = article.get("Text") or article.get("text")
     if text_field:
-        text_field = truncate(str(text_field), max_chars_total)
-        return f"Text:\n{text_field}"
+        text_field = truncate_tokens(clean(text_field), max_tokens_total)
+        if text_field:
+            return f"Text:\n{text_field}"
 
     
 
-    total_chars = 0
+    total_tokens = 0
 
     def try_add(label: str, value: str):
-        nonlocal total_chars
+        nonlocal total_tokens
         if not value:
             return False
-        value = truncate(str(value), max_chars_total)
-        piece = f"{label}:\n{value}"
-        if total_chars + len(piece) > max_chars_total:
-            # Truncate further if we're over the global limit
-            remaining = max_chars_total - total_chars
-            if remaining <= 0:
-                return False
-            piece = piece[:remaining]
+        remaining = max_tokens_total - total_tokens
+        if remaining <= 0:
+            # no room left in the global limit
+            return False
+        piece = truncate_tokens(f"{label}:\n{value}", remaining)
         context_parts.append(piece)
-        total_chars += len(piece)
+        total_tokens += count_tokens(piece)
         return True
 
     
     abs_et = article.get("Abstract in Estonian") or article.get("abstract_et")
     abs_en = article.get("Abstract in English") or article.get("abstract_en")
+    abs_et = clean(abs_et) if abs_et else ""
+    abs_en = clean(abs_en) if abs_en else ""
 
     if abs_et:
         try_add("Abstract in Estonian", abs_et)
-    if abs_en and total_chars < min_chars_for_stop:
-        
-        try_add("Abstract in English", abs_en)
+    if abs_en and total_tokens < min_tokens_for_stop:
+        if not (compress and abs_et and abstracts_overlap(abs_et, abs_en)):
+            try_add("Abstract in English", abs_en)
 
-    if total_chars >= min_chars_for_stop:
+    if total_tokens >= min_tokens_for_stop:
         return "\n\n".join(context_parts).strip()
 
     title = article.get("Title") or article.get("title")
     if title:
         try_add("Title", title)
-    if total_chars >= min_chars_for_stop:
+    if total_tokens >= min_tokens_for_stop:
         return "\n\n".join(context_parts).strip()
 
     
     journal = article.get("Source") or article.get("Source")
     if journal:
         try_add("Source", journal)
-    if total_chars >= min_chars_for_stop:
+    if total_tokens >= min_tokens_for_stop:
         return "\n\n".join(context_parts).strip()
 
    
     related = article.get("Related projects") or article.get("related_projects")
     if related:
         try_add("Related projects", related)
-    if total_chars >= min_chars_for_stop:
+    if total_tokens >= min_tokens_for_stop:
         return "\n\n".join(context_parts).strip()
 
     
@@ -171,12 +176,31 @@ def build_article_context(article: dict,
     
     if imported_kw:
         try_add("KeywordsAsFreeText", imported_kw)
-    if author_kw and total_chars < min_chars_for_stop:
+    if author_kw and total_tokens < min_tokens_for_stop:
         try_add("UserKeywords", author_kw)
 
     return "\n\n".join(context_parts).strip()
 
 
+# Every field build_article_context can read, i.e. all the labeling scripts need from the input.
+CONTEXT_FIELDS = [
+    "Text", "text",
+    "Abstract in Estonian", "abstract_et",
+    "Abstract in English", "abstract_en",
+    "Title", "title",
+    "Source",
+    "Related projects", "related_projects",
+    "KeywordsAsFreeText", "imported_keywords",
+    "UserKeywords",
+]
+
+
+def stream_articles(json_path: Path):
+    """Return (number of articles, lazy iterator over articles with only CONTEXT_FIELDS)."""
+    parquet_path = ensure_parquet(json_path)
+    return count_articles(parquet_path), iter_articles(parquet_path, CONTEXT_FIELDS)
+
+
 def call_keyword_model(context: str) -> list[str]:
     """
     Call the Azure GPT deployment once for a single article and
@@ -195,7 +219,7 @@ Remember: respond ONLY with a JSON object of the form:
 {{"keyword": ["kw1", "kw2", "..."]}}
 """
 
-    completion = client.chat.completions.create(
+    completion = llm.chat(
         model=MODEL_NAME,
         messages=[
             {"role": "system", "content": INSTRUCTIONS},
@@ -213,8 +237,19 @@ Remember: respond ONLY with a JSON object of the form:
     except json.JSONDecodeError:
         print("Warning: model returned non-JSON, treating as no keywords:")
         print(content)
+        telemetry.record_parse_failure("non-JSON", content)
         return []
 
+    keywords = parse_keywords(data)
+    if not keywords:
+        telemetry.record_parse_failure("no keywords", content)
+    return keywords
+
+
+def parse_keywords(data: dict) -> list[str]:
+    """Pull the keyword list out of a parsed model response; tolerates a string or a list."""
+    if not isinstance(data, dict):
+        return []
     raw_kw = data.get("keyword", []) or data.get("keywords", [])
 
     
@@ -232,108 +267,57 @@ Remember: respond ONLY with a JSON object of the form:
 
     return []
 
-def transpose_article_dict(data: dict) -> list[dict]:
-    """
-    Transform input of the form:
-        { fieldName: { guid: value } }
-    Into:
-        [ { "GUID": guid, field1: value1, field2: value2, ... } ]
-    """
-    articles = {}
-
-    for field_name, guid_map in data.items():
-        if not isinstance(guid_map, dict):
-            continue
-
-        for guid, value in guid_map.items():
-            if guid not in articles:
-                articles[guid] = {"GUID": guid}
-            articles[guid][field_name] = value
-
-    return list(articles.values())
-
-def load_articles(path: Path) -> list[dict]:
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    
-    if isinstance(data, dict):
-        
-        if all(isinstance(v, dict) for v in data.values()):
-            return transpose_article_dict(data)
-
-        
-        articles = []
-        for guid, fields in data.items():
-            item = {"GUID": guid}
-            if isinstance(fields, dict):
-                item.update(fields)
-            articles.append(item)
-        return articles
-
-    
-    if isinstance(data, list):
-        return data
-
-    raise ValueError("Unsupported JSON format")
+def open_results_store(store_path: Path, legacy_path: Path, legacy_format: str) -> ResultsStore:
+    """Open the append-only store, importing the old JSON output the first time."""
+    store = ResultsStore(store_path)
+    if len(store) == 0 and legacy_path.exists():
+        if legacy_format == "keywords":
+            n = store.import_keywords_json(legacy_path)
+        else:
+            n = store.import_frascati_json(legacy_path)
+        print(f"Imported {n} existing results from {legacy_path}")
+    return store
+
+
+def process_article(article: dict, store: ResultsStore):
+    """Label one article and record the keywords; failed calls are not recorded so they are retried later."""
+    guid = article.get("GUID") or article.get("guid")
+    telemetry.set_article(guid)
+    context = build_article_context(article)
+    if not context:
+        print(f"[GUID={guid}] No usable fields, skipping.")
+        store.add(guid, [])
+        return
 
-def load_skip_articles(path:Path) -> list[str]:
-    if not (path.exists()): return []
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list): return []
-    guids = []
-    for keyword in data:
-        guids.append(keyword["GUID"])
-    return guids
+    try:
+        keywords = call_keyword_model(context)
+    except Exception as e:
+        print(f"Error on GUID={guid}: {e}")
+        keywords = []
+    if keywords == []: return
+    store.add(guid, keywords)  # list of keyword strings
 
 
 def main():
     in_path = Path(INPUT_JSON)
     out_path = Path(OUTPUT_JSON)
 
-    articles = load_articles(in_path)
-    print(f"Loaded {len(articles)} articles from {in_path}")
-    with out_path.open("r", encoding= "utf-8") as f:
-        d = json.load(f)
-    results = []
-    skip = load_skip_articles(out_path)
+    n_articles, articles = stream_articles(in_path)
+    print(f"Found {n_articles} articles in {in_path}")
+    store = open_results_store(Path(RESULTS_JSONL), out_path, "keywords")
     processed = 0
-    atexit.register(save, results)
-    for article in articles[10000:15000]:
-        
-        guid = article.get("GUID") or article.get("guid")
-        if guid in skip: continue
+    todo = (a for a in articles if (a.get("GUID") or a.get("guid")) not in store)
+    # to split the work between several processes or machines use scheduler.py
+    for article, _ in run_concurrently(lambda a: process_article(a, store), todo):
         processed += 1
-        context = build_article_context(article)
-        if not context:
-            print(f"[GUID={guid}] No usable fields, skipping.")
-            results.append({"GUID": guid, "keyword": []})
-            continue
-
-        try:
-            keywords = call_keyword_model(context)
-        except Exception as e:
-            print(f"Error on GUID={guid}: {e}")
-            keywords = []
-        if keywords == []: continue 
-        results.append({
-            "GUID": guid,
-            "keyword": keywords  # list of keyword strings
-        })
 
         if processed % 20 == 0:
-            print(f"Processed {processed} articles.")
+            print(f"Processed {processed} articles. {format_metrics(llm.metrics())}")
     
-    results.extend(d)
-    with out_path.open("w", encoding="utf-8") as f_out:
-        json.dump(results, f_out, ensure_ascii=False, indent=2)
+    store.export_keywords(out_path, update_vocab(store))
+    store.close()
     print(f"Done. Processed {processed} articles.")
     print(f"Keyword file written to: {out_path}")
-def save(results):
-    path = Path("emergency_dump.json")
-    with path.open("w", encoding="utf-8") as f_out:
-        json.dump(results, f_out, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
     main()
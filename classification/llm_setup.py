@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+from openai import AzureOpenAI
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for llm_client
+from llm_client.pool import make_llm
+
+# The model connection of labeler.py, frascati.py and combined.py. The endpoint pool is built
+# once here and imported by all of them, so a process that asks for keywords and Frascati codes
+# has one adaptive limiter, quota and failover state per endpoint, and the two kinds of requests
+# together stay within the endpoint's limit.
+
+
+OPENAI_API_KEY = ""
+
+
+client = AzureOpenAI(
+    
+)
+
+
+
+MODEL_NAME  = "IDS2025-Gross-gpt-4o-mini"
+ENDPOINTS_JSON = "../endpoints.json"   # optional list of deployments to spread requests over, see llm_client/pool.py
+
+llm = make_llm(ENDPOINTS_JSON, client, MODEL_NAME)
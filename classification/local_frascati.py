@@ -0,0 +1,139 @@
+import random
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+import frascati_common
+from labeler import build_article_context, stream_articles
+from results_store import ResultsStore
+
+# libraries needed: python -m pip install scikit-learn joblib
+#
+# A CPU-only Frascati classifier trained on the labels the LLM has already assigned
+# (frascati_results.jsonl). TF-IDF over the same context text the LLM sees, followed by a
+# multinomial logistic regression. frascati.py uses it for articles where the predicted
+# class probability is at least CONFIDENCE_THRESHOLD and sends only the rest to the LLM.
+#
+# Running this file trains the model, reports held-out accuracy against the LLM labels for
+# several thresholds together with the fraction of LLM calls saved, and saves the model.
+
+MODEL_PATH = "frascati_local.joblib"
+CONFIDENCE_THRESHOLD = 0.8
+HOLDOUT_FRACTION = 0.2
+PREDICT_BATCH = 512
+
+_local_labels = None
+
+
+def local_labels() -> ResultsStore:
+    global _local_labels
+    if _local_labels is None:
+        _local_labels = ResultsStore(Path(frascati_common.LOCAL_LABELS_JSONL))
+    return _local_labels
+
+
+def load_training_data(results_path: Path = Path(frascati_common.RESULTS_JSONL)):
+    """(contexts, codes) for every article the LLM has classified."""
+    store = ResultsStore(results_path)
+    store.close()
+    own = local_labels()
+    labels = {guid: code for guid, code in store.index.items() if code in frascati_common.CODES and guid not in own}
+
+    texts, codes = [], []
+    _, articles = stream_articles(Path(frascati_common.INPUT_JSON))
+    for article in articles:
+        code = labels.get(article.get("GUID"))
+        if code is None:
+            continue
+        context = build_article_context(article)
+        if context:
+            texts.append(context)
+            codes.append(code)
+    return texts, codes
+
+
+def train(texts: list[str], codes: list[str]):
+    model = make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=300000, sublinear_tf=True),
+        LogisticRegression(max_iter=1000, C=10.0),
+    )
+    model.fit(texts, codes)
+    return model
+
+
+def predict(model, texts: list[str]):
+    """Vectorized prediction: (codes, confidences) as numpy arrays."""
+    if not texts:
+        return np.array([], dtype=object), np.array([])
+    proba = model.predict_proba(texts)
+    best = proba.argmax(axis=1)
+    return model.classes_[best], proba[np.arange(len(texts)), best]
+
+
+def load_model(path: Path = Path(MODEL_PATH)):
+    return joblib.load(path)
+
+
+def classify_locally(model, articles: list[dict], store: ResultsStore,
+                     threshold: float = CONFIDENCE_THRESHOLD) -> tuple[list[dict], int]:
+    """
+    Label the confident part of `articles` with the local model and record them in `store`.
+    Returns (articles that still need the LLM, number labeled locally).
+    """
+    remaining = []
+    n_local = 0
+    for start in range(0, len(articles), PREDICT_BATCH):
+        batch = articles[start:start + PREDICT_BATCH]
+        contexts = [build_article_context(a) for a in batch]
+        with_context = [i for i, c in enumerate(contexts) if c]
+        codes, conf = predict(model, [contexts[i] for i in with_context])
+        confident = {i: code for i, code, p in zip(with_context, codes, conf) if p >= threshold}
+        for i, article in enumerate(batch):
+            if i in confident:
+                guid = article.get("GUID") or article.get("guid")
+                store.add(guid, str(confident[i]))
+                local_labels().add(guid, str(confident[i]))
+                n_local += 1
+            else:
+                remaining.append(article)
+    return remaining, n_local
+
+
+def main():
+    texts, codes = load_training_data()
+    print(f"Loaded {len(texts)} LLM-labeled articles")
+
+    rows = list(zip(texts, codes))
+    random.Random(0).shuffle(rows)
+    n_holdout = int(len(rows) * HOLDOUT_FRACTION)
+    if n_holdout == 0:
+        print("Not enough labeled articles to evaluate")
+        return
+    holdout, train_rows = rows[:n_holdout], rows[n_holdout:]
+
+    model = train([t for t, _ in train_rows], [c for _, c in train_rows])
+    pred, conf = predict(model, [t for t, _ in holdout])
+    truth = np.array([c for _, c in holdout], dtype=object)
+    correct = pred == truth
+
+    print(f"Held-out accuracy against the LLM labels (all predictions): {100 * correct.mean():.1f}%")
+    print(f"{'threshold':>9} {'local %':>8} {'local acc %':>11} {'overall acc %':>13}")
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.9, 0.95):
+        local = conf >= threshold
+        local_acc = correct[local].mean() if local.any() else 0.0
+        # the rest goes to the LLM, whose answer is the reference here
+        overall = (correct[local].sum() + (~local).sum()) / len(truth)
+        print(f"{threshold:>9.2f} {100 * local.mean():>7.1f}% {100 * local_acc:>10.1f}% {100 * overall:>12.1f}%")
+
+    # the saved model is trained on everything
+    model = train(texts, codes)
+    joblib.dump(model, MODEL_PATH)
+    print(f"Model written to: {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class ResultsStore:
+    """
+    Append-only JSONL file of {"GUID": guid, "value": ...} records with an in-memory GUID index.
+
+    - Every label is written (and flushed) as soon as it is produced, so a crash loses at most
+      the record that was being written; a torn last line is ignored on the next load.
+    - `guid in store` is a dict lookup, so skip checks are O(1).
+    - If the same GUID is written twice, the last record wins.
+    - export_keywords / export_frascati write the old keywords.json / frascati JSON formats;
+      with a KeywordVocab the exported keywords are canonical and get their integer IDs.
+    """
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.index = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: skipping broken line in {self.path}")
+                    continue
+                self.index[record["GUID"]] = record["value"]
+        # make sure a torn last line doesn't get glued to the next record
+        with self.path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    with self.path.open("a", encoding="utf-8") as fa:
+                        fa.write("\n")
+
+    def __contains__(self, guid) -> bool:
+        return guid in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, guid, default=None):
+        return self.index.get(guid, default)
+
+    def add(self, guid, value):
+        line = json.dumps({"GUID": guid, "value": value}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.index[guid] = value
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def merge_from(self, path: Path) -> int:
+        """Copy records for GUIDs this store doesn't have yet from another store file (e.g. a worker shard)."""
+        other = ResultsStore(path)
+        other.close()
+        added = 0
+        for guid, value in other.index.items():
+            if guid not in self:
+                self.add(guid, value)
+                added += 1
+        return added
+
+    # Import / export of the old formats
+
+    def import_keywords_json(self, path: Path) -> int:
+        """Load an old keywords.json ([{"GUID": ..., "keyword": [...]}, ...]) into the store."""
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        added = 0
+        for item in data if isinstance(data, list) else []:
+            if item.get("GUID") not in self:
+                self.add(item["GUID"], item.get("keyword", []))
+                added += 1
+        return added
+
+    def import_frascati_json(self, path: Path) -> int:
+        """Load an old Frascati output ({guid: code}) into the store."""
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        added = 0
+        for guid, code in data.items() if isinstance(data, dict) else []:
+            if guid not in self:
+                self.add(guid, code)
+                added += 1
+        return added
+
+    def export_keywords(self, path: Path, vocab=None):
+        if vocab is None:
+            results = [{"GUID": guid, "keyword": kws} for guid, kws in self.index.items()]
+        else:
+            results = []
+            for guid, kws in self.index.items():
+                ids = vocab.ids(kws)
+                results.append({"GUID": guid, "keyword": [vocab.terms[i] for i in ids], "keyword_id": ids})
+        with Path(path).open("w", encoding="utf-8") as f_out:
+            json.dump(results, f_out, ensure_ascii=False, indent=2)
+
+    def export_frascati(self, path: Path):
+        with Path(path).open("w", encoding="utf-8") as f_out:
+            json.dump(self.index, f_out, ensure_ascii=False, indent=2)
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+
+import labeler
+import frascati
+import combined
+from article_store import ensure_parquet, iter_articles, read_articles, read_guids
+from labeler import CONTEXT_FIELDS, build_article_context, open_results_store
+from keyword_vocab import update_vocab
+from llm_client.adaptive import format_metrics, run_concurrently
+from results_store import ResultsStore
+
+# Splits labeling work between any number of worker processes, on one machine or several
+# machines that share a filesystem. The queue is a SQLite file holding batches of GUIDs:
+#
+#   python scheduler.py init --task combined          # once, creates the batches
+#   python scheduler.py work --task combined          # start as many of these as you like
+#   python scheduler.py status --task combined
+#   python scheduler.py merge --task combined         # merge worker outputs, export the JSON files
+#
+# A worker leases one batch at a time. The lease has an expiry that the worker keeps renewing
+# while it works; when a worker crashes its lease runs out and another worker takes the batch.
+# A worker that fails to renew its lease stops working on that batch, so a batch is never
+# labeled by two workers at once. Each worker writes its labels to its own results file
+# (e.g. keywords_results.<worker>.jsonl) so workers on different hosts never write to the same file.
+# A batch is only marked done once every GUID in it has a label; GUIDs whose LLM call failed go
+# back into the queue, and after MAX_ATTEMPTS tries the batch is marked failed. Running init again
+# queues everything that is still unlabeled (in the merged store and in the worker files) and not
+# waiting in the queue, including the GUIDs of failed batches. Articles without any usable field
+# can never be labeled, so they are not queued and count as done in a batch. A worker only asks
+# for the labels an article doesn't have yet anywhere (merged store or any worker's file), so
+# "combined" never requests keywords again for an article that only lacks its Frascati code.
+
+QUEUE_DB = "work_queue.db"
+BATCH_SIZE = 50
+LEASE_SECONDS = 600
+POLL_SECONDS = 30
+MAX_ATTEMPTS = 3
+
+TASK_STORES = {
+    "keywords": ["keywords"],
+    "frascati": ["frascati"],
+    "combined": ["keywords", "frascati"],
+}
+STORE_PATHS = {
+    "keywords": (labeler.RESULTS_JSONL, labeler.OUTPUT_JSON),
+    "frascati": (frascati.RESULTS_JSONL, frascati.OUTPUT_JSON),
+}
+
+
+class WorkQueue:
+    """Batches of GUIDs per task in a SQLite file, handed out to workers under expiring leases."""
+
+    def __init__(self, db_path: Path):
+        # isolation_level=None: we issue BEGIN IMMEDIATE ourselves so that leasing is atomic
+        self.conn = sqlite3.connect(str(db_path), timeout=60, isolation_level=None)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                task          TEXT NOT NULL,
+                batch_id      INTEGER NOT NULL,
+                guids         TEXT NOT NULL,
+                status        TEXT NOT NULL DEFAULT 'pending',
+                worker        TEXT,
+                lease_expires REAL,
+                attempts      INTEGER NOT NULL DEFAULT 0,
+                finished_at   REAL,
+                PRIMARY KEY (task, batch_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS batches_status ON batches (task, status, lease_expires)")
+
+    def create_batches(self, task: str, guids: list[str], batch_size: int = BATCH_SIZE) -> int:
+        """Add new batches for task, numbered after the existing ones. Returns the number of batches."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            (last,) = self.conn.execute(
+                "SELECT COALESCE(MAX(batch_id), -1) FROM batches WHERE task = ?", (task,)
+            ).fetchone()
+            rows = [(task, last + 1 + i // batch_size, json.dumps(guids[i:i + batch_size]))
+                    for i in range(0, len(guids), batch_size)]
+            self.conn.executemany("INSERT INTO batches (task, batch_id, guids) VALUES (?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def queued_guids(self, task: str) -> set[str]:
+        """GUIDs in batches that are still waiting for or being worked on by a worker."""
+        guids = set()
+        for (g,) in self.conn.execute(
+            "SELECT guids FROM batches WHERE task = ? AND status IN ('pending', 'leased')", (task,)
+        ):
+            guids.update(json.loads(g))
+        return guids
+
+    def lease(self, task: str, worker: str, lease_seconds: float = LEASE_SECONDS):
+        """Take the next pending (or expired) batch. Returns (batch_id, guids) or None."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("""
+                SELECT batch_id, guids FROM batches
+                WHERE task = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY batch_id LIMIT 1
+            """, (task, now)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute("""
+                UPDATE batches SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE task = ? AND batch_id = ?
+            """, (worker, now + lease_seconds, task, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return row[0], json.loads(row[1])
+
+    def renew(self, task: str, batch_id: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend our lease. False means the lease expired and the batch now belongs to someone else."""
+        cur = self.conn.execute("""
+            UPDATE batches SET lease_expires = ?
+            WHERE task = ? AND batch_id = ? AND worker = ? AND status = 'leased' AND lease_expires >= ?
+        """, (time.time() + lease_seconds, task, batch_id, worker, time.time()))
+        return cur.rowcount == 1
+
+    def complete(self, task: str, batch_id: int, worker: str) -> bool:
+        cur = self.conn.execute("""
+            UPDATE batches SET status = 'done', finished_at = ?, lease_expires = NULL
+            WHERE task = ? AND batch_id = ? AND worker = ? AND status = 'leased'
+        """, (time.time(), task, batch_id, worker))
+        return cur.rowcount == 1
+
+    def release(self, task: str, batch_id: int, worker: str, guids: list[str]) -> str:
+        """Put the still unlabeled GUIDs of our batch back in the queue. Returns the new status."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("""
+                SELECT attempts FROM batches
+                WHERE task = ? AND batch_id = ? AND worker = ? AND status = 'leased'
+            """, (task, batch_id, worker)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return "lost"
+            status = "failed" if row[0] >= MAX_ATTEMPTS else "pending"
+            self.conn.execute("""
+                UPDATE batches SET status = ?, guids = ?, worker = NULL, lease_expires = NULL, finished_at = ?
+                WHERE task = ? AND batch_id = ?
+            """, (status, json.dumps(guids), time.time() if status == "failed" else None, task, batch_id))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def progress(self, task: str) -> dict:
+        now = time.time()
+        counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+        for status, expires, n in self.conn.execute("""
+            SELECT status, lease_expires < ?, COUNT(*) FROM batches WHERE task = ? GROUP BY 1, 2
+        """, (now, task)):
+            if status == "leased" and expires:
+                counts["expired"] += n
+            else:
+                counts[status] += n
+        return counts
+
+    def close(self):
+        self.conn.close()
+
+
+def worker_store_path(store_path: str, worker: str) -> Path:
+    p = Path(store_path)
+    return p.with_name(f"{p.stem}.{worker}{p.suffix}")
+
+
+def worker_shards(store_path: str) -> list[Path]:
+    p = Path(store_path)
+    return sorted(p.parent.glob(f"{p.stem}.*{p.suffix}"))
+
+
+def labeled_guids(name: str) -> set[str]:
+    """GUIDs with a label in the merged store or in any worker's results file."""
+    store_path, legacy = STORE_PATHS[name]
+    store = open_results_store(Path(store_path), Path(legacy), name)
+    labeled = set(store.index)
+    store.close()
+    for shard in worker_shards(store_path):
+        with ResultsStore(shard) as worker_store:
+            labeled.update(worker_store.index)
+    return labeled
+
+
+def label(task: str, article: dict, stores: dict, labeled: dict):
+    """Request only the labels the article has neither in our shard nor in `labeled` (name -> GUIDs)."""
+    guid = article["GUID"]
+    need = {name: guid not in store and guid not in labeled[name] for name, store in stores.items()}
+    if not any(need.values()):
+        return
+    if task == "keywords":
+        labeler.process_article(article, stores["keywords"])
+    elif task == "frascati":
+        frascati.process_article(article, stores["frascati"])
+    else:
+        combined.process_article(article, stores["keywords"], stores["frascati"],
+                                 need_keywords=need["keywords"], need_frascati=need["frascati"])
+
+
+def cmd_init(args):
+    parquet = ensure_parquet(Path(labeler.INPUT_JSON))
+    queue = WorkQueue(Path(args.queue))
+
+    done = None
+    for name in TASK_STORES[args.task]:
+        labeled = labeled_guids(name)
+        # for "combined" an article is only done when it has both labels
+        done = labeled if done is None else done & labeled
+
+    queued = queue.queued_guids(args.task)
+    unlabeled = {g for g in read_guids(parquet) if g not in done and g not in queued}
+    todo = [a["GUID"] for a in iter_articles(parquet, CONTEXT_FIELDS)
+            if a["GUID"] in unlabeled and build_article_context(a)]
+    n = queue.create_batches(args.task, todo, args.batch_size)
+    print(f"Queued {len(todo)} articles in {n} batches for task '{args.task}' ({len(queued)} were already queued, "
+          f"{len(unlabeled) - len(todo)} have no usable fields)")
+    queue.close()
+
+
+def cmd_work(args):
+    parquet = ensure_parquet(Path(labeler.INPUT_JSON))
+    queue = WorkQueue(Path(args.queue))
+    worker = args.worker
+    stores = {name: ResultsStore(worker_store_path(STORE_PATHS[name][0], worker))
+              for name in TASK_STORES[args.task]}
+    labeled = {name: labeled_guids(name) for name in stores}
+    local_model = frascati.load_local_model() if "frascati" in stores else None
+    sources = None
+    if "frascati" in stores and frascati.USE_SOURCE_CACHE:
+        import source_cache
+        sources = source_cache.load_or_build()
+    print(f"Worker {worker} started on task '{args.task}'")
+
+    processed = 0
+    while True:
+        leased = queue.lease(args.task, worker, args.lease_seconds)
+        if leased is None:
+            p = queue.progress(args.task)
+            if p["pending"] == 0 and p["leased"] == 0 and p["expired"] == 0:
+                break
+            # other workers still hold leases; wait in case one of them dies
+            time.sleep(POLL_SECONDS)
+            continue
+
+        batch_id, guids = leased
+        lost = False
+        renewed_at = time.time()
+        articles = read_articles(parquet, guids, CONTEXT_FIELDS)
+        by_guid = {a["GUID"]: a for a in articles}
+        if local_model is not None or sources is not None:
+            # Frascati codes from the source cache / local model; "combined" then only asks for keywords
+            todo = [a for a in articles if a["GUID"] not in stores["frascati"] and a["GUID"] not in labeled["frascati"]]
+            remaining = {a["GUID"] for a in frascati.prelabel(todo, stores["frascati"], sources, local_model, {})}
+            if args.task == "frascati":
+                articles = [a for a in articles if a["GUID"] in remaining]
+        for article, _ in run_concurrently(lambda a: label(args.task, a, stores, labeled), articles):
+            processed += 1
+            if time.time() - renewed_at > args.lease_seconds / 3:
+                if not queue.renew(args.task, batch_id, worker, args.lease_seconds):
+                    print(f"Lost lease on batch {batch_id}, leaving it to the new owner")
+                    lost = True
+                    break
+                renewed_at = time.time()
+
+        if not lost:
+            missing = [g for g in guids if not all(g in store or g in labeled[name] for name, store in stores.items())]
+            # articles that are gone from the input or have no usable fields can't get a label
+            missing = [g for g in missing if g in by_guid and build_article_context(by_guid[g])]
+            if not missing:
+                queue.complete(args.task, batch_id, worker)
+                print(f"Worker {worker} finished batch {batch_id} ({processed} articles so far). "
+                      f"{format_metrics(labeler.llm.metrics())}")
+            else:
+                status = queue.release(args.task, batch_id, worker, missing)
+                print(f"Worker {worker}: {len(missing)} articles of batch {batch_id} have no label yet, "
+                      f"batch is {status}")
+
+    for store in stores.values():
+        store.close()
+    queue.close()
+    print(f"Worker {worker} done. Processed {processed} articles.")
+
+
+def cmd_status(args):
+    queue = WorkQueue(Path(args.queue))
+    p = queue.progress(args.task)
+    total = sum(p.values())
+    print(f"Task '{args.task}': {p['done']}/{total} batches done, {p['leased']} leased, "
+          f"{p['expired']} with expired leases, {p['pending']} pending, {p['failed']} failed")
+    queue.close()
+
+
+def cmd_merge(args):
+    for name in TASK_STORES[args.task]:
+        store_path, legacy = STORE_PATHS[name]
+        store = open_results_store(Path(store_path), Path(legacy), name)
+        for shard in worker_shards(store_path):
+            n = store.merge_from(shard)
+            print(f"Merged {n} labels from {shard}")
+        if name == "keywords":
+            store.export_keywords(Path(legacy), update_vocab(store))
+        else:
+            store.export_frascati(Path(legacy))
+        print(f"{name} file written to: {legacy}")
+        store.close()
+        if name == "frascati" and frascati.USE_SOURCE_CACHE:
+            import source_cache
+            source_cache.load_or_build()  # rebuilt, since the merged labels are newer than the cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share labeling work between several worker processes.")
+    parser.add_argument("command", choices=["init", "work", "status", "merge"])
+    parser.add_argument("--task", choices=list(TASK_STORES), default="combined")
+    parser.add_argument("--queue", default=QUEUE_DB, help="SQLite queue file, on a filesystem all workers can reach")
+    parser.add_argument("--worker", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    args = parser.parse_args()
+
+    {"init": cmd_init, "work": cmd_work, "status": cmd_status, "merge": cmd_merge}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
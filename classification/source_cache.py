@@ -0,0 +1,140 @@
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import frascati_common
+from article_store import ensure_parquet, iter_articles
+from results_store import ResultsStore
+
+# Journal/source level memo for Frascati codes. Articles from the same Source almost always
+# get the same field, so once a source has MIN_ARTICLES labeled articles and one code holds at
+# least PURITY of them, frascati.py assigns that code directly instead of calling the model.
+# Mixed-field and unknown sources still go to the model, and every new model answer is added
+# to the counts, so the cache keeps improving during a run. The cache file is rebuilt whenever the
+# labels are newer than it (e.g. after combined.py or a scheduler.py merge added labels).
+#
+#   python source_cache.py [purity] [min_articles]    # rebuild from the existing labels and report
+
+SOURCE_CACHE_JSON = "frascati_sources.json"
+SOURCE_LABELS_JSONL = "frascati_source_labels.jsonl"   # GUIDs labeled from the cache, not counted in it
+PURITY = 0.9
+MIN_ARTICLES = 5
+
+
+def normalize_source(source) -> str:
+    if not source:
+        return ""
+    return re.sub(r"\s+", " ", str(source)).strip().casefold()
+
+
+class SourceLabelCache:
+    def __init__(self, purity: float = PURITY, min_articles: int = MIN_ARTICLES):
+        self.purity = purity
+        self.min_articles = min_articles
+        self.counts = {}   # normalized source -> Counter(code -> number of articles)
+
+    def update(self, source, code: str):
+        key = normalize_source(source)
+        if key and code:
+            self.counts.setdefault(key, Counter())[code] += 1
+
+    def lookup(self, source):
+        """The dominant code of this source, or None if the source is unknown or mixed."""
+        counts = self.counts.get(normalize_source(source))
+        if not counts:
+            return None
+        total = sum(counts.values())
+        if total < self.min_articles:
+            return None
+        code, n = counts.most_common(1)[0]
+        return code if n / total >= self.purity else None
+
+    @classmethod
+    def build(cls, articles, results: dict, exclude=(), **kwargs):
+        """Count codes per source from model labels (`results`: guid -> code), skipping `exclude`d GUIDs."""
+        cache = cls(**kwargs)
+        for article in articles:
+            guid = article.get("GUID")
+            if guid in results and guid not in exclude:
+                cache.update(article.get("Source"), results[guid])
+        return cache
+
+    def save(self, path: Path):
+        data = {"purity": self.purity, "min_articles": self.min_articles,
+                "counts": {k: dict(v) for k, v in self.counts.items()}}
+        with Path(path).open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: Path, purity: float = None, min_articles: int = None):
+        """Read a saved cache; purity and min_articles default to the values it was saved with."""
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        cache = cls(data.get("purity", PURITY) if purity is None else purity,
+                    data.get("min_articles", MIN_ARTICLES) if min_articles is None else min_articles)
+        cache.counts = {k: Counter(v) for k, v in data.get("counts", {}).items()}
+        return cache
+
+    def stats(self) -> dict:
+        pure = [k for k in self.counts if self.lookup(k) is not None]
+        covered = sum(sum(self.counts[k].values()) for k in pure)
+        total = sum(sum(c.values()) for c in self.counts.values())
+        return {"sources": len(self.counts), "pure_sources": len(pure),
+                "labeled_articles": total, "articles_in_pure_sources": covered}
+
+
+def build_from_results(purity: float = PURITY, min_articles: int = MIN_ARTICLES) -> SourceLabelCache:
+    """Rebuild the cache from frascati_results.jsonl, ignoring labels that did not come from the model."""
+    store = ResultsStore(Path(frascati_common.RESULTS_JSONL))
+    store.close()
+    exclude = set()
+    for path in (SOURCE_LABELS_JSONL, frascati_common.LOCAL_LABELS_JSONL):
+        if Path(path).exists():
+            other = ResultsStore(Path(path))
+            other.close()
+            exclude.update(other.index)
+    parquet = ensure_parquet(Path(frascati_common.INPUT_JSON))
+    return SourceLabelCache.build(iter_articles(parquet, ["Source"]), store.index, exclude,
+                                  purity=purity, min_articles=min_articles)
+
+
+def _labels_changed_since(path: Path) -> bool:
+    cached = path.stat().st_mtime_ns
+    for labels in (frascati_common.RESULTS_JSONL, SOURCE_LABELS_JSONL, frascati_common.LOCAL_LABELS_JSONL):
+        if Path(labels).exists() and Path(labels).stat().st_mtime_ns > cached:
+            return True
+    return False
+
+
+def load_or_build() -> SourceLabelCache:
+    """The saved cache, rebuilt (with its saved settings) if the labels changed after it was written."""
+    path = Path(SOURCE_CACHE_JSON)
+    if path.exists():
+        cache = SourceLabelCache.load(path)
+        if not _labels_changed_since(path):
+            return cache
+        cache = build_from_results(cache.purity, cache.min_articles)
+    else:
+        cache = build_from_results()
+    cache.save(path)
+    return cache
+
+
+def main():
+    purity = float(sys.argv[1]) if len(sys.argv) > 1 else PURITY
+    min_articles = int(sys.argv[2]) if len(sys.argv) > 2 else MIN_ARTICLES
+    cache = build_from_results(purity, min_articles)
+    cache.save(Path(SOURCE_CACHE_JSON))
+    s = cache.stats()
+    print(f"Sources with labels: {s['sources']}, dominated by one code (purity >= {purity}, "
+          f">= {min_articles} articles): {s['pure_sources']}")
+    if s["labeled_articles"]:
+        print(f"{s['articles_in_pure_sources']} of {s['labeled_articles']} labeled articles "
+              f"({100 * s['articles_in_pure_sources'] / s['labeled_articles']:.1f}%) are in such sources")
+    print(f"Cache written to: {SOURCE_CACHE_JSON}")
+
+
+if __name__ == "__main__":
+    main()
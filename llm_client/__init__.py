@@ -0,0 +1 @@
+# Shared helpers for the scripts that call the OpenAI / Azure OpenAI APIs.
@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+
+# Adaptive concurrency for the scripts that call the model (filter_abstract, labeler, frascati).
+#
+# AdaptiveLimiter decides how many requests may be in flight at once (AIMD):
+#   - every successful response raises the limit by about 1 per "window" of successes (additive increase)
+#   - a 429, timeout or overloaded (5xx) response cuts the limit in half (multiplicative decrease),
+#     at most once per typical response time so a burst of failures counts as one congestion signal
+#   - a Retry-After header pauses new requests until the time the server asked for
+# AdaptiveClient wraps an OpenAI / AzureOpenAI client, routes every call through the limiter and
+# retries throttled calls itself. run_concurrently feeds work items to a thread pool.
+
+INITIAL_CONCURRENCY = 2
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+MAX_RETRIES = 6
+LATENCY_WINDOW = 500   # number of recent latencies kept for percentiles
+
+CONGESTION = ("rate_limited", "timeout", "overloaded")
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: float = INITIAL_CONCURRENCY, minimum: int = MIN_CONCURRENCY,
+                 maximum: int = MAX_CONCURRENCY, increase: float = 1.0, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_cut = 0.0
+        self.latency_ewma = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {"ok": 0, "rate_limited": 0, "timeout": 0, "overloaded": 0, "error": 0}
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait(1.0)
+                else:
+                    self.in_flight += 1
+                    return
+
+    def has_capacity(self) -> bool:
+        """True if acquire() would not block right now."""
+        with self._cond:
+            return time.time() >= self.paused_until and self.in_flight < int(self.limit)
+
+    def release(self, outcome: str, latency: float = None, retry_after: float = None):
+        with self._cond:
+            now = time.time()
+            self.in_flight -= 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            if latency is not None:
+                self.latencies.append(latency)
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+            if outcome == "ok":
+                self.limit = min(self.maximum, self.limit + self.increase / max(self.limit, 1.0))
+            elif outcome in CONGESTION:
+                if now - self.last_cut > (self.latency_ewma or 1.0):
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.last_cut = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            lat = sorted(self.latencies)
+            return {
+                "concurrency": int(self.limit),
+                "in_flight": self.in_flight,
+                "latency_ewma": self.latency_ewma,
+                "latency_p50": lat[len(lat) // 2] if lat else None,
+                "latency_p95": lat[int(len(lat) * 0.95)] if lat else None,
+                **self.counts,
+            }
+
+
+def format_metrics(m: dict) -> str:
+    lat = f"{m['latency_p50']:.2f}s/{m['latency_p95']:.2f}s" if m["latency_p50"] is not None else "-"
+    return (f"concurrency {m['concurrency']} (in flight {m['in_flight']}), latency p50/p95 {lat}, "
+            f"429s {m['rate_limited']}, timeouts {m['timeout']}, errors {m['error'] + m['overloaded']}")
+
+
+def classify_error(e: Exception) -> str:
+    status = getattr(e, "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if "Timeout" in type(e).__name__:
+        return "timeout"
+    if status is not None and status >= 500:
+        return "overloaded"
+    if type(e).__name__ == "APIConnectionError":
+        return "overloaded"
+    return "error"
+
+
+def retry_after_seconds(e: Exception):
+    """Seconds from the Retry-After / retry-after-ms headers of a failed response, if any."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class AdaptiveClient:
+    """Wraps an OpenAI/AzureOpenAI client; all calls go through one AdaptiveLimiter."""
+
+    def __init__(self, client, limiter: AdaptiveLimiter = None, max_retries: int = MAX_RETRIES):
+        # we retry ourselves, so that every 429 is seen by the limiter
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+
+    def chat(self, **kwargs):
+        return self.call(self.client.chat.completions.create, **kwargs)
+
+    def call(self, fn, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            start = time.time()
+            try:
+                result = fn(**kwargs)
+            except Exception as e:
+                outcome = classify_error(e)
+                retry_after = retry_after_seconds(e)
+                self.limiter.release(outcome, time.time() - start, retry_after)
+                if outcome == "error" or attempt == self.max_retries:
+                    raise
+                if not retry_after:
+                    time.sleep(min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+                continue
+            self.limiter.release("ok", time.time() - start)
+            return result
+
+    def metrics(self) -> dict:
+        return self.limiter.metrics()
+
+
+def run_concurrently(fn, items, workers: int = MAX_CONCURRENCY):
+    """
+    Call fn(item) for every item on a thread pool and yield (item, result) as calls finish.
+    If fn raises, the exception is yielded as the result. Items are pulled lazily from the
+    iterable (in the caller's thread), so it can be a generator over a large file.
+    The real request rate is governed by the AdaptiveLimiter inside fn, not by `workers`.
+    """
+    items = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                while len(pending) < 2 * workers:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                    pending[pool.submit(fn, item)] = item
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    item = pending.pop(fut)
+                    try:
+                        yield item, fut.result()
+                    except Exception as e:
+                        yield item, e
+        finally:
+            for fut in pending:
+                fut.cancel()
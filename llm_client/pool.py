@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from openai import AzureOpenAI, OpenAI
+
+from llm_client import telemetry
+from llm_client.adaptive import AdaptiveClient, AdaptiveLimiter, classify_error, retry_after_seconds
+
+# Spreads chat completion requests over several deployments / API keys.
+#
+# Endpoints are listed in a JSON file (see endpoints.example.json):
+#   [{"name": "tu-azure", "type": "azure", "azure_endpoint": "...", "api_version": "2024-12-01-preview",
+#     "api_key_file": "...", "model": "IDS2025-Gross-gpt-4o-mini", "weight": 2},
+#    {"name": "openai", "type": "openai", "api_key_env": "OPENAI_API_KEY", "model": "gpt-4o-mini", "weight": 1},
+#    {"name": "local", "type": "openai", "base_url": "http://127.0.0.1:8000/v1", "api_key": "x", "model": "stub"}]
+#
+# - Requests go round the endpoints in smooth weighted round-robin order.
+# - Each endpoint has its own AdaptiveLimiter, so each deployment runs at its own quota.
+# - A failing endpoint is cooled down (for Retry-After on 429s, exponentially longer on repeated
+#   errors) and the request fails over to the next endpoint. Quota headers (x-ratelimit-remaining-*)
+#   are tracked and an endpoint with no requests left is skipped until its reset time.
+# - Endpoints whose limiter has no free slot are only picked when every endpoint is saturated.
+
+BASE_COOLDOWN = 2.0
+MAX_COOLDOWN = 300.0
+MAX_ROUNDS = 5   # how many times every endpoint may be tried for one request
+
+ENDPOINT_ERRORS = (401, 403, 404)   # misconfigured endpoint, fail over instead of giving up
+
+
+def _read_api_key(cfg: dict):
+    if cfg.get("api_key"):
+        return cfg["api_key"]
+    if cfg.get("api_key_env"):
+        return os.environ.get(cfg["api_key_env"])
+    if cfg.get("api_key_file"):
+        with open(cfg["api_key_file"], "r") as f:
+            return f.read().strip()
+    return None
+
+
+def _parse_duration(value: str):
+    """Reset times in rate limit headers look like "1s", "20ms" or "6m0s"."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total or None
+
+
+class Endpoint:
+    def __init__(self, name: str, client, model: str = None, weight: int = 1):
+        self.name = name
+        self.model = model
+        self.weight = weight
+        self.current_weight = 0
+        self.adaptive = AdaptiveClient(client, AdaptiveLimiter(), max_retries=0)
+        self.raw_create = self.adaptive.client.chat.completions.with_raw_response.create \
+            if hasattr(self.adaptive.client.chat.completions, "with_raw_response") else None
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, cfg: dict):
+        if cfg.get("type", "openai") == "azure":
+            client = AzureOpenAI(api_key=_read_api_key(cfg), api_version=cfg["api_version"],
+                                 azure_endpoint=cfg["azure_endpoint"])
+        else:
+            client = OpenAI(api_key=_read_api_key(cfg), base_url=cfg.get("base_url"))
+        return cls(cfg.get("name", cfg.get("model")), client, cfg.get("model"), int(cfg.get("weight", 1)))
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def create(self, **kwargs):
+        if self.model:
+            kwargs["model"] = self.model
+        if self.raw_create is None:
+            return self.adaptive.call(self.adaptive.client.chat.completions.create, **kwargs)
+        raw = self.adaptive.call(self.raw_create, **kwargs)
+        self._track_quota(raw.headers)
+        return raw.parse()
+
+    def _track_quota(self, headers):
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        tokens = headers.get("x-ratelimit-remaining-tokens")
+        self.remaining_requests = int(remaining) if remaining and remaining.isdigit() else None
+        self.remaining_tokens = int(tokens) if tokens and tokens.isdigit() else None
+        if self.remaining_requests == 0:
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0
+            self.cooldown_until = max(self.cooldown_until, time.time() + reset)
+
+    def metrics(self) -> dict:
+        return {
+            **self.adaptive.metrics(),
+            "weight": self.weight,
+            "healthy": self.available(time.time()),
+            "failures": self.failures,
+            "requests": self.requests,
+            "remaining_requests": self.remaining_requests,
+            "remaining_tokens": self.remaining_tokens,
+        }
+
+
+class ClientPool:
+    """Same chat() interface as AdaptiveClient, but over several endpoints."""
+
+    def __init__(self, endpoints: list[Endpoint], max_rounds: int = MAX_ROUNDS):
+        if not endpoints:
+            raise ValueError("ClientPool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.max_rounds = max_rounds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path: Path):
+        with Path(path).open("r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls([Endpoint.from_config(cfg) for cfg in config])
+
+    def _pick(self, exclude: set):
+        """Smooth weighted round-robin over available endpoints (nginx algorithm)."""
+        now = time.time()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.available(now) and e.name not in exclude]
+            if not candidates:
+                return None
+            # prefer endpoints whose limiter has a free slot, so a failover doesn't queue behind a full one
+            candidates = [e for e in candidates if e.adaptive.limiter.has_capacity()] or candidates
+            total = sum(e.weight for e in candidates)
+            for e in candidates:
+                e.current_weight += e.weight
+            best = max(candidates, key=lambda e: e.current_weight)
+            best.current_weight -= total
+            best.requests += 1
+            return best
+
+    def _mark_failure(self, endpoint: Endpoint, e: Exception):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.errors += 1
+            if classify_error(e) == "rate_limited":
+                cooldown = retry_after_seconds(e) or BASE_COOLDOWN
+            else:
+                cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (endpoint.failures - 1))
+            endpoint.cooldown_until = max(endpoint.cooldown_until, time.time() + cooldown)
+
+    def chat(self, **kwargs):
+        """One chat completion; every call is recorded by llm_client.telemetry."""
+        start = time.time()
+        attempts = 0
+        last_error = None
+        endpoint = None
+        for _ in range(self.max_rounds):
+            tried = set()
+            while True:
+                endpoint = self._pick(tried)
+                if endpoint is None:
+                    break
+                tried.add(endpoint.name)
+                attempts += 1
+                try:
+                    result = endpoint.create(**kwargs)
+                except Exception as e:
+                    status = getattr(e, "status_code", None)
+                    if classify_error(e) == "error" and status not in ENDPOINT_ERRORS:
+                        # a bad request fails the same way everywhere
+                        self._record(endpoint, kwargs, start, attempts, classify_error(e), error=e)
+                        raise
+                    print(f"Endpoint {endpoint.name} failed ({type(e).__name__}), failing over")
+                    self._mark_failure(endpoint, e)
+                    last_error = e
+                    continue
+                endpoint.failures = 0
+                self._record(endpoint, kwargs, start, attempts, "ok", usage=getattr(result, "usage", None))
+                return result
+            # every endpoint is cooling down, wait for the first one to come back
+            wait = min(e.cooldown_until for e in self.endpoints) - time.time()
+            time.sleep(min(max(wait, 0.1), MAX_COOLDOWN))
+        error = last_error or RuntimeError("No endpoint available")
+        self._record(endpoint, kwargs, start, attempts, classify_error(error), error=error)
+        raise error
+
+    def _record(self, endpoint, kwargs, start, attempts, outcome, usage=None, error=None):
+        telemetry.record_call(
+            endpoint=endpoint.name if endpoint else None,
+            model=(endpoint.model if endpoint and endpoint.model else kwargs.get("model")),
+            latency=time.time() - start,
+            retries=max(attempts - 1, 0),
+            outcome=outcome,
+            usage=usage,
+            error=f"{type(error).__name__}: {error}"[:200] if error else None,
+        )
+
+    def metrics(self) -> dict:
+        per_endpoint = {e.name: e.metrics() for e in self.endpoints}
+        totals = {}
+        for m in per_endpoint.values():
+            for k in ("concurrency", "in_flight", "ok", "rate_limited", "timeout", "overloaded", "error"):
+                totals[k] = totals.get(k, 0) + m[k]
+        p50 = [m["latency_p50"] for m in per_endpoint.values() if m["latency_p50"] is not None]
+        p95 = [m["latency_p95"] for m in per_endpoint.values() if m["latency_p95"] is not None]
+        return {
+            **totals,
+            "latency_p50": max(p50) if p50 else None,
+            "latency_p95": max(p95) if p95 else None,
+            "latency_ewma": None,
+            "endpoints": per_endpoint,
+        }
+
+
+def make_llm(config_path, client, model: str = None) -> ClientPool:
+    """The endpoint pool from config_path if that file exists, otherwise a pool of just `client`."""
+    if config_path and Path(config_path).exists():
+        pool = ClientPool.from_config(Path(config_path))
+        print(f"Using {len(pool.endpoints)} endpoints from {config_path}")
+        return pool
+    return ClientPool([Endpoint("default", client, model)])
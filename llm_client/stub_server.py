@@ -0,0 +1,111 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for an OpenAI / Azure OpenAI chat completions endpoint, for trying out the
+# client pool, the adaptive concurrency and the scripts without spending quota.
+#
+#   python -m llm_client.stub_server --port 8001 --rpm 120 --latency 0.3
+#
+# and point an endpoint at it: {"name": "stub1", "type": "openai", "base_url": "http://127.0.0.1:8001/v1",
+# "api_key": "x", "model": "stub"}. Any path ending in /chat/completions is answered, so Azure
+# style URLs work too. Requests over the --rpm budget get a 429 with Retry-After, and --fail-rate
+# makes a fraction of requests fail with a 503.
+
+DEFAULT_REPLY = '{"keyword": ["stub keyword"], "frascati": "1.2", "keep": true, "reason": "stub"}'
+FRASCATI_REPLY = "1.2"   # frascati.py asks for the bare code
+
+
+class StubState:
+    def __init__(self, rpm: int, latency: float, fail_rate: float, reply: str):
+        self.rpm = rpm
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.reply = reply
+        self.window_start = time.time()
+        self.window_count = 0
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """Returns (allowed, seconds until the next minute window, requests left)."""
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= 60:
+                self.window_start, self.window_count = now, 0
+            reset = 60 - (now - self.window_start)
+            if self.rpm and self.window_count >= self.rpm:
+                return False, reset, 0
+            self.window_count += 1
+            return True, reset, (self.rpm - self.window_count) if self.rpm else 1000
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.split("?")[0].endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+
+            allowed, reset, remaining = state.admit()
+            if not allowed:
+                self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": f"{reset:.0f}"})
+                return
+            time.sleep(state.latency * random.uniform(0.5, 1.5))
+            if random.random() < state.fail_rate:
+                self._send(503, {"error": {"message": "overloaded"}})
+                return
+
+            messages = request.get("messages", [])
+            system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+            reply = FRASCATI_REPLY if "categorization number only" in system else state.reply
+            prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+            self._send(200, {
+                "id": "stub-" + str(random.getrandbits(32)),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(reply) // 4,
+                          "total_tokens": prompt_chars // 4 + len(reply) // 4},
+            }, {"x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": f"{reset:.0f}s"})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response time in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="message content returned to every request")
+    args = parser.parse_args()
+
+    state = StubState(args.rpm, args.latency, args.fail_rate, args.reply)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Stub endpoint on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Per-call telemetry for every model request made through llm_client.pool.ClientPool.
+#
+# Every call appends one JSON line to llm_metrics.jsonl (or the file in $LLM_METRICS_JSONL):
+#   {"event": "call", "ts", "script", "article", "endpoint", "model", "prompt_tokens",
+#    "completion_tokens", "latency", "retries", "outcome", "error"}
+# and the scripts add {"event": "parse_error", "kind": "non-JSON" | "code not in CODES" | ...}
+# when an answer can't be used. Summary per script:
+#   python -m llm_client.telemetry llm_metrics.jsonl
+
+METRICS_JSONL = os.environ.get("LLM_METRICS_JSONL", "llm_metrics.jsonl")
+
+# USD per 1M tokens (input, output); the first key contained in the model/deployment name is used
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "stub": (0.0, 0.0),
+}
+DEFAULT_PRICE = (0.15, 0.60)
+
+SCRIPT = Path(sys.argv[0]).stem or "python"
+
+_local = threading.local()
+_sink = None
+_sink_lock = threading.Lock()
+
+
+class MetricsSink:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+def get_sink() -> MetricsSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = MetricsSink(Path(METRICS_JSONL))
+        return _sink
+
+
+def set_article(article_id):
+    """Tag the following records made by this thread with an article id."""
+    _local.article = article_id
+
+
+def _record(event: str, **fields):
+    get_sink().write({"event": event, "ts": time.time(), "script": SCRIPT,
+                      "article": getattr(_local, "article", None), **fields})
+
+
+def record_call(endpoint: str, model: str, latency: float, retries: int, outcome: str,
+                usage=None, error: str = None):
+    _record(
+        "call",
+        endpoint=endpoint,
+        model=model,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        latency=round(latency, 4),
+        retries=retries,
+        outcome=outcome,
+        error=error,
+    )
+
+
+def record_parse_failure(kind: str, content: str = None):
+    _record("parse_error", kind=kind, content=(content or "")[:200])
+
+
+def price_for(model: str):
+    model = (model or "").lower()
+    for key, price in PRICES.items():
+        if key in model:
+            return price
+    return DEFAULT_PRICE
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(path: Path) -> dict:
+    """Per-script throughput, latency, cost and error rates from a metrics file."""
+    scripts = defaultdict(lambda: {"calls": 0, "ok": 0, "retries": 0, "latencies": [], "articles": set(),
+                                   "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+                                   "first": None, "last": None, "outcomes": defaultdict(int),
+                                   "parse_errors": defaultdict(int)})
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                r = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            s = scripts[r.get("script")]
+            ts = r.get("ts")
+            s["first"] = ts if s["first"] is None else min(s["first"], ts)
+            s["last"] = ts if s["last"] is None else max(s["last"], ts)
+            if r.get("event") == "parse_error":
+                s["parse_errors"][r.get("kind")] += 1
+                continue
+            s["calls"] += 1
+            s["outcomes"][r.get("outcome")] += 1
+            s["retries"] += r.get("retries") or 0
+            if r.get("article") is not None:
+                s["articles"].add(r["article"])
+            if r.get("outcome") == "ok":
+                s["ok"] += 1
+                s["latencies"].append(r.get("latency") or 0.0)
+            pt, ct = r.get("prompt_tokens") or 0, r.get("completion_tokens") or 0
+            s["prompt_tokens"] += pt
+            s["completion_tokens"] += ct
+            price_in, price_out = price_for(r.get("model"))
+            s["cost"] += (pt * price_in + ct * price_out) / 1e6
+
+    summary = {}
+    for script, s in scripts.items():
+        minutes = max((s["last"] - s["first"]) / 60, 1e-9) if s["first"] is not None else None
+        n_articles = len(s["articles"])
+        parse_errors = sum(s["parse_errors"].values())
+        summary[script] = {
+            "calls": s["calls"],
+            "articles": n_articles,
+            "calls_per_minute": s["calls"] / minutes if minutes else None,
+            "articles_per_minute": n_articles / minutes if minutes else None,
+            "latency_p50": _percentile(s["latencies"], 0.5),
+            "latency_p95": _percentile(s["latencies"], 0.95),
+            "prompt_tokens": s["prompt_tokens"],
+            "completion_tokens": s["completion_tokens"],
+            "cost": s["cost"],
+            "cost_per_1k_articles": 1000 * s["cost"] / n_articles if n_articles else None,
+            "error_rate": 1 - s["ok"] / s["calls"] if s["calls"] else 0.0,
+            "retries_per_call": s["retries"] / s["calls"] if s["calls"] else 0.0,
+            "parse_error_rate": parse_errors / s["ok"] if s["ok"] else 0.0,
+            "outcomes": dict(s["outcomes"]),
+            "parse_errors": dict(s["parse_errors"]),
+        }
+    return summary
+
+
+def _fmt(value, spec: str, missing: str = "-"):
+    return missing if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize LLM call metrics per script.")
+    parser.add_argument("path", nargs="?", default=METRICS_JSONL)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(Path(args.path))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    for script, s in sorted(summary.items()):
+        print(f"== {script}")
+        print(f"  calls {s['calls']}, articles {s['articles']}, "
+              f"{_fmt(s['calls_per_minute'], '.1f')} calls/min, {_fmt(s['articles_per_minute'], '.1f')} articles/min")
+        print(f"  latency p50 {_fmt(s['latency_p50'], '.2f')}s, p95 {_fmt(s['latency_p95'], '.2f')}s")
+        print(f"  tokens in {s['prompt_tokens']}, out {s['completion_tokens']}, cost ${s['cost']:.4f}, "
+              f"${_fmt(s['cost_per_1k_articles'], '.4f')} per 1k articles")
+        print(f"  error rate {100 * s['error_rate']:.2f}%, {s['retries_per_call']:.2f} retries/call, "
+              f"parse errors {100 * s['parse_error_rate']:.2f}% {s['parse_errors'] or ''}")
+        print(f"  outcomes {s['outcomes']}")
+
+
+if __name__ == "__main__":
+    main()